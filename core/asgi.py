@@ -2,6 +2,10 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+ASGI deployments serve the native async views unless PROPERTY_ASYNC_VIEWS
+says otherwise. To run it with uvicorn::
+
+    uvicorn core.asgi:application --workers 4
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -12,5 +16,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault('PROPERTY_ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
@@ -0,0 +1,26 @@
+"""
+URL configuration for ASGI deployments, selected by ``PROPERTY_ASYNC_VIEWS``
+
+Autocomplete, listing and detail pages are served by native async views;
+every other route is shared with ``core.urls``.
+"""
+
+from django.conf import settings
+from django.conf.urls.static import static
+from django.urls import include, path
+from property import views
+from property.urls import app_name, async_urlpatterns
+from .urls import common_urlpatterns
+
+urlpatterns = [
+    *common_urlpatterns,
+    path("api/autocomplete/", views.async_autocomplete, name="autocomplete"),
+    path("properties/", include((async_urlpatterns, app_name))),
+]
+
+
+if settings.DEBUG:
+    urlpatterns += static(
+        settings.MEDIA_URL,
+        document_root=settings.MEDIA_ROOT,
+    )
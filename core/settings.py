@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,7 +43,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "property.profiling.ProfilingMiddleware",
+    "property.routers.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # Answers conditional requests for cached pages (and ETags any other
+    # response by its content)
+    "django.middleware.http.ConditionalGetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -51,11 +57,21 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-ROOT_URLCONF = "core.urls"
+# Native async autocomplete, listing and detail views (property/views/
+# asynchronous.py). core/asgi.py turns this on, so ASGI servers such as
+# uvicorn serve them on the event loop; WSGI servers keep the sync views.
+PROPERTY_ASYNC_VIEWS = os.environ.get("PROPERTY_ASYNC_VIEWS", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+ROOT_URLCONF = "core.async_urls" if PROPERTY_ASYNC_VIEWS else "core.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates reporting render times to the profiling middleware
+        "BACKEND": "property.profiling.ProfiledDjangoTemplates",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -74,12 +90,107 @@ WSGI_APPLICATION = "core.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# DATABASE_PROFILE=production tunes SQLite for concurrent traffic: WAL and
+# the PRAGMAs below, persistent connections and immediate transactions.
+DATABASE_PROFILE = os.environ.get("DATABASE_PROFILE", "development")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+    },
+    # The same file through separate connections that run with
+    # PRAGMA query_only; stands in for a replica until there are real ones
+    "readonly": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+# DATABASE_REPLICAS=/path/a.sqlite3,/path/b.sqlite3 adds replica1, replica2...
+# (copies kept up to date by e.g. LiteFS) and reads go to them instead
+DATABASE_REPLICAS = [
+    path for path in os.environ.get("DATABASE_REPLICAS", "").split(",") if path
+]
+for number, path in enumerate(DATABASE_REPLICAS, start=1):
+    DATABASES[f"replica{number}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": path,
+        "TEST": {"MIRROR": "default"},
     }
+
+DATABASE_ROUTERS = ["property.routers.ReplicaRouter"]
+
+# Aliases that serve reads of PROPERTY_REPLICA_MODELS, picked at random;
+# the primary serves them when none is available
+PROPERTY_READ_DATABASES = [
+    f"replica{number}" for number in range(1, len(DATABASE_REPLICAS) + 1)
+] or ["readonly"]
+PROPERTY_REPLICA_MODELS = [
+    "property.Property",
+    "property.Location",
+    "property.Image",
+    "property.MapCell",
+]
+
+# After a request writes one of those models, the client reads from the
+# primary for this long (property.routers.ReplicaPinningMiddleware)
+PROPERTY_REPLICA_PIN_COOKIE = "primary_db"
+PROPERTY_REPLICA_PIN_SECONDS = 15
+
+# A replica that refuses connections is skipped for this long
+PROPERTY_REPLICA_RETRY_SECONDS = 30
+
+# PRAGMAs run on every new SQLite connection (property/database.py) when
+# PROPERTY_SQLITE_TUNING is on. In WAL mode readers never block the writer
+# nor the writer readers, and synchronous=NORMAL only risks the last commits
+# on power loss, never corruption.
+PROPERTY_SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+    "cache_size": -65536,  # KiB per connection
+    "mmap_size": 268435456,
+    "temp_store": "memory",
 }
+PROPERTY_SQLITE_TUNING = DATABASE_PROFILE == "production"
+
+if DATABASE_PROFILE == "production":
+    for database in DATABASES.values():
+        database.update(CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True)
+    # Take the write lock at BEGIN: a deferred transaction that writes after
+    # reading fails at once with "database is locked" in WAL mode instead of
+    # waiting for busy_timeout
+    DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE"}
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Redis when REDIS_URL is set (needs the redis package), a file cache shared
+# by all local processes when CACHE_DIR is set, per-process memory otherwise.
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+elif os.environ.get("CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
 
 
 # Password validation
@@ -121,3 +232,116 @@ STATIC_URL = "/static/"
 
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
+
+# Property images are content-addressed (property/storage.py): an upload is
+# stored once under its SHA-256 and shared by every image with those bytes
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    "property_images": {"BACKEND": "property.storage.ContentAddressedStorage"},
+}
+
+
+# Property app
+
+# Serve location autocomplete from the per-process in-memory index
+# (property/autocomplete.py) instead of querying the database per keystroke.
+PROPERTY_AUTOCOMPLETE_INDEX = True
+
+# Once another process (web worker, task worker, command) has changed
+# locations or their counts, an index at least this many seconds old is
+# rebuilt on its next lookup; younger ones keep answering until then.
+PROPERTY_AUTOCOMPLETE_REFRESH_SECONDS = 30
+
+# Pagination of the property list: "offset" (numbered pages) or "cursor"
+# (keyset pagination on created_at/id with next/previous links). A request
+# carrying a ``cursor`` parameter always uses cursor pagination.
+PROPERTY_LIST_PAGINATION = "offset"
+
+# Seconds anonymous home/list/detail pages are served from the cache (0
+# disables it), and seconds a rendered property card is kept. Writes to
+# properties, images and locations invalidate both at once.
+PROPERTY_PAGE_CACHE_TIMEOUT = 300
+PROPERTY_CARD_CACHE_TIMEOUT = 3600
+
+# Cache-Control max-age of the list and detail pages for browsers and CDNs
+# (private and revalidated for signed-in users), and of autocomplete
+# suggestions. Pages send ETag/Last-Modified, so revalidating costs a few
+# index lookups and a 304.
+PROPERTY_PAGE_MAX_AGE = 60
+PROPERTY_AUTOCOMPLETE_MAX_AGE = 300
+
+# Count cache hits and misses (python manage.py cache_stats)
+PROPERTY_CACHE_STATS = True
+
+# Seconds facet counts (and list totals) are cached per filter combination;
+# property writes invalidate them early
+PROPERTY_FACET_CACHE_TIMEOUT = 300
+
+# Full-text search backend for listings. The FTS5 backend needs SQLite;
+# "property.search.database.DatabaseSearchBackend" works on any database.
+PROPERTY_SEARCH_BACKEND = "property.search.sqlite.SQLiteFTS5Backend"
+
+# Radius search on the listing (?near=lat,lng&radius=km): the radius used
+# when none is given and the largest accepted
+PROPERTY_GEO_DEFAULT_RADIUS_KM = 5
+PROPERTY_GEO_MAX_RADIUS_KM = 100
+
+# Most clusters /api/map/ returns for a bounding box; points are grouped by
+# the finest geohash prefix that keeps them under this
+PROPERTY_MAP_MAX_CLUSTERS = 256
+
+# Similar listings stored per property by "python manage.py
+# rebuild_similar_properties" (property/similarity.py, needs NumPy). The
+# detail page shows the first available ones; description terms count
+# towards similarity when PROPERTY_SIMILARITY_TEXT is on.
+PROPERTY_SIMILARITY_NEIGHBOURS = 6
+PROPERTY_SIMILARITY_TEXT = False
+
+# Widths and formats of generated image renditions (property/renditions.py).
+# Formats the installed Pillow cannot encode are skipped; JPEG is always made.
+PROPERTY_IMAGE_RENDITION_WIDTHS = (320, 640, 1024)
+PROPERTY_IMAGE_RENDITION_FORMATS = ("avif", "webp", "jpeg")
+
+# Queue new uploads for rendering once their transaction commits; otherwise
+# leave them to "python manage.py generate_renditions"
+PROPERTY_IMAGE_RENDITIONS_ON_UPLOAD = True
+
+# Resumable bulk image uploads (property/uploads.py, /api/uploads/): chunks
+# stream to partial files in PROPERTY_UPLOAD_DIR 64 KB at a time, so memory
+# stays flat whatever the file size. Limits are per file, per chunk request
+# and per committed batch; abandoned uploads are deleted by gc_media after
+# PROPERTY_UPLOAD_EXPIRY_SECONDS.
+PROPERTY_UPLOAD_DIR = BASE_DIR / "uploads"
+PROPERTY_UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+PROPERTY_UPLOAD_MAX_CHUNK = 8 * 1024 * 1024
+PROPERTY_UPLOAD_MAX_BATCH = 100
+PROPERTY_UPLOAD_EXPIRY_SECONDS = 24 * 3600
+
+# Background tasks (django.tasks, property/tasks.py) are stored in the
+# database and run by "python manage.py run_workers" (property/queue.py):
+# "images" for upload processing, "imports" for feeds, "default" for
+# maintenance. The ImmediateBackend with the same QUEUES runs them in the
+# calling process instead, without workers.
+TASKS = {
+    "default": {
+        "BACKEND": "property.queue.DatabaseBackend",
+        "QUEUES": ["default", "images", "imports"],
+        "OPTIONS": {
+            "VISIBILITY_TIMEOUT": 300,
+            "MAX_ATTEMPTS": 3,
+            "RETRY_DELAY": 10,
+            "POLL_INTERVAL": 1.0,
+        },
+    }
+}
+
+# Request profiling (property/profiling.py): query count, DB, template and
+# total time per URL name, with percentiles over the last
+# PROPERTY_PROFILING_WINDOW requests at /admin/profiling/. Server-Timing
+# headers expose the numbers to browsers, so they are on in DEBUG only.
+PROPERTY_PROFILING = True
+PROPERTY_PROFILING_WINDOW = 1000
+PROPERTY_SERVER_TIMING = DEBUG
@@ -20,11 +20,50 @@ from django.urls import path, include
 from property import views
 from django.conf import settings
 from django.conf.urls.static import static
-from property.views import LocationAutocompleteAPIView
+from property.views import (
+    CacheStatsAPIView,
+    LocationAutocompleteAPIView,
+    PropertyDetailAPIView,
+    PropertyImagesAPIView,
+    PropertyListAPIView,
+    PropertyMapAPIView,
+    PropertySearchAPIView,
+    TaskStatsAPIView,
+    UploadSessionAPIView,
+    UploadSessionListAPIView,
+)
 
-urlpatterns = [
+# Routes shared with core.async_urls
+common_urlpatterns = [
+    path("admin/profiling/", views.profiling_report, name="profiling"),
+    path("admin/export/", views.property_export, name="property_export"),
     path("admin/", admin.site.urls),
     path("", views.home, name="home"),
+    path("api/search/", PropertySearchAPIView.as_view(), name="search"),
+    path("api/properties/", PropertyListAPIView.as_view(), name="property_api"),
+    path(
+        "api/properties/<int:pk>/",
+        PropertyDetailAPIView.as_view(),
+        name="property_detail_api",
+    ),
+    path(
+        "api/properties/<int:pk>/images/",
+        PropertyImagesAPIView.as_view(),
+        name="property_images_api",
+    ),
+    path("api/uploads/", UploadSessionListAPIView.as_view(), name="upload_sessions"),
+    path(
+        "api/uploads/<uuid:pk>/",
+        UploadSessionAPIView.as_view(),
+        name="upload_session",
+    ),
+    path("api/map/", PropertyMapAPIView.as_view(), name="property_map"),
+    path("api/cache-stats/", CacheStatsAPIView.as_view(), name="cache_stats"),
+    path("api/task-stats/", TaskStatsAPIView.as_view(), name="task_stats"),
+]
+
+urlpatterns = [
+    *common_urlpatterns,
     # Autocomplete endpoint
     # path("autocomplete/", views.autocomplete_location, name="autocomplete"),
     path(
@@ -2,9 +2,39 @@
 Admin configuration for Property app models
 """
 
+from collections import Counter
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models import Count, Q
+from django.forms import BaseModelFormSet
+from django.forms.models import BaseInlineFormSet
 from django.utils.html import format_html
-from .models import Location, Property, Image
+from .models import Location, Property, Image, QueuedTask
+from .search import get_search_backend
+
+
+class OnePrimaryImageMixin:
+    """Reject a formset that makes two images of a listing primary"""
+
+    def clean(self):
+        super().clean()
+        primaries = Counter(
+            form.instance.property_id
+            for form in self.forms
+            if form.cleaned_data.get("is_primary")
+            and not (self.can_delete and self._should_delete_form(form))
+        )
+        if any(count > 1 for count in primaries.values()):
+            raise ValidationError("A property can only have one primary image.")
+
+
+class ImageInlineFormSet(OnePrimaryImageMixin, BaseInlineFormSet):
+    pass
+
+
+class ImageChangelistFormSet(OnePrimaryImageMixin, BaseModelFormSet):
+    pass
 
 
 class ImageInline(admin.TabularInline):
@@ -13,6 +43,7 @@ class ImageInline(admin.TabularInline):
     """
 
     model = Image
+    formset = ImageInlineFormSet
     extra = 1
     fields = ["image", "caption", "is_primary", "order", "image_preview"]
     readonly_fields = ["image_preview"]
@@ -34,15 +65,19 @@ class LocationAdmin(admin.ModelAdmin):
     Admin interface for Location model
     """
 
-    list_display = ["id", "name", "city", "state", "country", "property_count"]
+    list_display = [
+        "id",
+        "name",
+        "city",
+        "state",
+        "country",
+        "property_count",
+        "available_property_count",
+    ]
     list_filter = ["city", "state", "country"]
     search_fields = ["name", "city", "state"]
     ordering = ["name"]
-
-    def property_count(self, obj):
-        return obj.properties.count()
-
-    property_count.short_description = "Properties"
+    readonly_fields = ["property_count", "available_property_count"]
 
 
 @admin.register(Property)
@@ -64,10 +99,16 @@ class PropertyAdmin(admin.ModelAdmin):
         "created_at",
         "updated_at",
     ]
+    list_select_related = ["location"]
     list_filter = ["property_type", "status", "location__city"]
-    search_fields = ["title", "description", "location__name"]
+    search_fields = ["title", "description", "location__name", "external_id"]
     list_editable = ["status"]
-    readonly_fields = ["created_at", "updated_at", "primary_image_preview"]
+    readonly_fields = [
+        "external_id",
+        "created_at",
+        "updated_at",
+        "primary_image_preview",
+    ]
 
     fieldsets = (
         (
@@ -83,21 +124,56 @@ class PropertyAdmin(admin.ModelAdmin):
             "Timestamps",
             {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
         ),
+        ("Feed", {"fields": ("external_id",), "classes": ("collapse",)}),
     )
 
     inlines = [ImageInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(image_count=Count("images"))
+
+    def save_formset(self, request, form, formset, change):
+        """
+        Save the gallery's order, primary and captions in one bulk update;
+        only new and replaced files are saved one by one, for their uploads
+        """
+        if formset.model is not Image:
+            return super().save_formset(request, form, formset, change)
+        formset.save(commit=False)
+        for image in formset.deleted_objects:
+            image.delete()
+        Image.objects.save_gallery(
+            image for image, fields in formset.changed_objects if "image" not in fields
+        )
+        for image, fields in formset.changed_objects:
+            if "image" in fields:
+                image.save()
+        for image in formset.new_objects:
+            image.save()
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the full-text index instead of LIKE scans"""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        condition = Q(external_id=search_term)
+        matches = get_search_backend().matches(search_term)
+        if matches is not None:
+            condition |= Q(pk__in=matches)
+        return queryset.filter(condition), False
+
     def image_count(self, obj):
-        return obj.images.count()
+        return obj.image_count
 
     image_count.short_description = "Images"
+    image_count.admin_order_field = "image_count"
 
     def primary_image_preview(self, obj):
-        primary = obj.primary_image
-        if primary:
+        url = obj.primary_image_url
+        if url:
             return format_html(
                 '<img src="{}" style="max-height: 200px; max-width: 300px;" />',
-                primary.image.url,
+                url,
             )
         return "No images uploaded"
 
@@ -122,6 +198,24 @@ class ImageAdmin(admin.ModelAdmin):
     search_fields = ["property__title", "caption"]
     list_editable = ["is_primary", "order"]
 
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault("formset", ImageChangelistFormSet)
+        return super().get_changelist_formset(request, **kwargs)
+
+    def changelist_view(self, request, extra_context=None):
+        # Edited rows are collected by save_model and saved in one batch
+        request.gallery_images = []
+        with transaction.atomic(using=router.db_for_write(Image)):
+            response = super().changelist_view(request, extra_context)
+            Image.objects.save_gallery(request.gallery_images)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        if change and hasattr(request, "gallery_images"):
+            request.gallery_images.append(obj)
+        else:
+            super().save_model(request, obj, form, change)
+
     def image_preview(self, obj):
         if obj.image:
             return format_html(
@@ -131,3 +225,29 @@ class ImageAdmin(admin.ModelAdmin):
         return "No image"
 
     image_preview.short_description = "Preview"
+
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the background task queue
+    """
+
+    list_display = [
+        "id",
+        "task_path",
+        "queue_name",
+        "status",
+        "attempts",
+        "enqueued_at",
+        "started_at",
+        "finished_at",
+    ]
+    list_filter = ["status", "queue_name", "task_path"]
+    date_hierarchy = "enqueued_at"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
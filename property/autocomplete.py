@@ -0,0 +1,292 @@
+"""
+Autocomplete Index Module
+In-memory n-gram index answering location autocomplete lookups
+"""
+
+import bisect
+import heapq
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from django.conf import settings
+from .cache import LOCATIONS, bump_version, namespace_version
+
+# Postings are kept for bigrams and trigrams; single characters are common
+# enough that walking the ranking finds matches almost immediately.
+MIN_GRAM = 2
+MAX_GRAM = 3
+
+FIELD_SEPARATOR = "\x00"
+
+
+@dataclass
+class LocationEntry:
+    """
+    Serializable snapshot of a location held by the index.
+    """
+
+    id: int
+    name: str
+    city: str
+    state: str
+    country: str
+    full_address: str
+    property_count: int = 0
+
+    @property
+    def rank_key(self):
+        return (-self.property_count, self.name.lower(), self.id)
+
+
+def _grams(text):
+    grams = set()
+    for size in range(MIN_GRAM, MAX_GRAM + 1):
+        for start in range(len(text) - size + 1):
+            grams.add(text[start : start + size])
+    return grams
+
+
+class LocationAutocompleteIndex:
+    """
+    Per-process substring index over location name, city and country.
+
+    Matching follows the ``icontains`` semantics of the ORM lookup it
+    replaces, and results are ordered by property count. Locations without
+    properties are never returned.
+
+    Writes in this process update the index in place; every write also bumps
+    the shared ``LOCATIONS`` cache version, and an index built from an older
+    version (written by another web process, a worker or a command) is
+    rebuilt once it is ``PROPERTY_AUTOCOMPLETE_REFRESH_SECONDS`` old.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = False
+        self._version = None
+        self._built_at = 0.0
+        self._entries = {}
+        self._texts = {}
+        self._postings = defaultdict(list)
+        self._ranked = []
+
+    @property
+    def is_built(self):
+        return self._built
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "locations": len(self._entries),
+                "ranked": len(self._ranked),
+                "grams": len(self._postings),
+                "postings": sum(len(ids) for ids in self._postings.values()),
+            }
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt from the database on next use."""
+        with self._lock:
+            self._reset()
+
+    def build(self, entries=None, version=None):
+        """
+        (Re)build the index from ``entries`` or from the database, as of the
+        ``LOCATIONS`` ``version`` (read before loading when not given).
+        """
+        if version is None:
+            version = namespace_version(LOCATIONS)
+        if entries is None:
+            entries = self._load_entries()
+        with self._lock:
+            self._reset()
+            for entry in entries:
+                self._insert(entry)
+            self._ranked.sort()
+            self._built = True
+            self._version = version
+            self._built_at = time.monotonic()
+
+    def is_current(self, version):
+        """
+        Whether searches at the ``LOCATIONS`` ``version`` can be answered
+        without (re)building the index
+        """
+        if not self._built:
+            return False
+        return (
+            version == self._version
+            or time.monotonic() - self._built_at
+            < settings.PROPERTY_AUTOCOMPLETE_REFRESH_SECONDS
+        )
+
+    def ensure_built(self, version=None):
+        if version is None:
+            version = namespace_version(LOCATIONS)
+        if not self.is_current(version):
+            self.build(version=version)
+
+    def search(self, query, limit=5, version=None):
+        """
+        Return up to ``limit`` entries matching ``query``, most properties
+        first. ``version`` is the current ``LOCATIONS`` version, when the
+        caller has read it already (async views, with the async cache API).
+        """
+        query = query.strip().lower()
+        if not query or FIELD_SEPARATOR in query:
+            return []
+        self.ensure_built(version)
+
+        with self._lock:
+            if len(query) < MIN_GRAM:
+                return self._walk_ranked(query, limit)
+
+            candidates = self._candidates(query)
+            if candidates is None:
+                return []
+
+            # Scanning the postings costs one check per candidate, walking the
+            # ranking costs roughly limit * total / candidates checks.
+            if len(candidates) ** 2 > limit * len(self._ranked):
+                return self._walk_ranked(query, limit)
+
+            keys = (
+                self._entries[location_id].rank_key
+                for location_id in candidates
+                if self._entries[location_id].property_count > 0
+                and query in self._texts[location_id]
+            )
+            return [self._entries[key[-1]] for key in heapq.nsmallest(limit, keys)]
+
+    # Incremental maintenance, called from signal handlers once the write
+    # has committed
+
+    def upsert_location(self, entry):
+        with self._lock:
+            if self._built:
+                previous = self._entries.get(entry.id)
+                if previous is not None:
+                    entry.property_count = previous.property_count
+                    self._remove(previous)
+                self._insert(entry)
+            self._publish()
+
+    def remove_location(self, location_id):
+        with self._lock:
+            if self._built:
+                entry = self._entries.get(location_id)
+                if entry is not None:
+                    self._remove(entry)
+            self._publish()
+
+    def adjust_count(self, location_id, delta):
+        with self._lock:
+            entry = self._entries.get(location_id) if self._built else None
+            if entry is not None:
+                self._unrank(entry)
+                entry.property_count = max(entry.property_count + delta, 0)
+                self._rank(entry)
+            self._publish()
+
+    # Internals; callers hold the lock
+
+    def _publish(self):
+        """
+        Tell other processes about a change applied here. This index stays
+        current unless another process changed the version in between.
+        """
+        version = bump_version(LOCATIONS)
+        if self._built and self._version == version - 1:
+            self._version = version
+
+    def _reset(self):
+        self._built = False
+        self._entries = {}
+        self._texts = {}
+        self._postings = defaultdict(list)
+        self._ranked = []
+
+    def _load_entries(self):
+        from .models import Location
+
+        for location in Location.objects.order_by().iterator(chunk_size=5000):
+            yield entry_for_location(location, location.property_count)
+
+    def _insert(self, entry):
+        text = FIELD_SEPARATOR.join(
+            [entry.name.lower(), entry.city.lower(), entry.country.lower()]
+        )
+        self._entries[entry.id] = entry
+        self._texts[entry.id] = text
+        for gram in _grams_for_text(text):
+            self._postings[gram].append(entry.id)
+        if self._built:
+            self._rank(entry)
+        elif entry.property_count > 0:
+            self._ranked.append(entry.rank_key)
+
+    def _remove(self, entry):
+        self._unrank(entry)
+        for gram in _grams_for_text(self._texts.pop(entry.id)):
+            postings = self._postings[gram]
+            postings.remove(entry.id)
+            if not postings:
+                del self._postings[gram]
+        del self._entries[entry.id]
+
+    def _rank(self, entry):
+        if entry.property_count > 0:
+            bisect.insort(self._ranked, entry.rank_key)
+
+    def _unrank(self, entry):
+        if entry.property_count > 0:
+            key = entry.rank_key
+            position = bisect.bisect_left(self._ranked, key)
+            if position < len(self._ranked) and self._ranked[position] == key:
+                del self._ranked[position]
+
+    def _candidates(self, query):
+        """Shortest posting list among the query's grams, or None if any is empty."""
+        gram_size = min(len(query), MAX_GRAM)
+        shortest = None
+        for start in range(len(query) - gram_size + 1):
+            postings = self._postings.get(query[start : start + gram_size])
+            if not postings:
+                return None
+            if shortest is None or len(postings) < len(shortest):
+                shortest = postings
+        return shortest
+
+    def _walk_ranked(self, query, limit):
+        results = []
+        for key in self._ranked:
+            if query in self._texts[key[-1]]:
+                results.append(self._entries[key[-1]])
+                if len(results) == limit:
+                    break
+        return results
+
+
+def _grams_for_text(text):
+    grams = set()
+    for field in text.split(FIELD_SEPARATOR):
+        grams |= _grams(field)
+    return grams
+
+
+def entry_for_location(location, property_count=0):
+    return LocationEntry(
+        id=location.pk,
+        name=location.name,
+        city=location.city,
+        state=location.state,
+        country=location.country,
+        full_address=location.full_address,
+        property_count=property_count,
+    )
+
+
+location_index = LocationAutocompleteIndex()
@@ -0,0 +1,28 @@
+"""
+Benchmark scenarios for the Property app
+Run with: python manage.py benchmark <scenario> [options]
+
+Each scenario module defines ``help``, ``add_arguments(parser)`` and
+``run(command, options)``; ``run`` returns a dict of results, which
+``--json <path>`` writes out for ``benchmark compare``.
+"""
+
+SCENARIOS = {
+    "autocomplete": "property.benchmarks.autocomplete",
+    "compare": "property.benchmarks.compare",
+    "dataset": "property.benchmarks.dataset",
+    "deployments": "property.benchmarks.deployments",
+    "export": "property.benchmarks.export",
+    "geo": "property.benchmarks.geo",
+    "import": "property.benchmarks.imports",
+    "parallel_import": "property.benchmarks.parallel_import",
+    "pagination": "property.benchmarks.pagination",
+    "replay": "property.benchmarks.replay",
+    "search": "property.benchmarks.search",
+    "serializers": "property.benchmarks.serializers",
+    "similarity": "property.benchmarks.similarity",
+    "sqlite_stress": "property.benchmarks.sqlite_stress",
+    "tasks": "property.benchmarks.tasks",
+    "trace": "property.benchmarks.trace",
+    "uploads": "property.benchmarks.uploads",
+}
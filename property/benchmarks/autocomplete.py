@@ -0,0 +1,67 @@
+"""
+Autocomplete benchmark: in-memory index versus the ORM query
+"""
+
+import random
+from django.test import RequestFactory, override_settings
+from property.autocomplete import location_index
+from property.views import LocationAutocompleteAPIView
+from .data import create_locations, create_properties
+from .utils import format_summary, scratch_data, summarize, time_calls
+
+help = "Compare autocomplete lookups served from the index and from the ORM"
+
+
+def add_arguments(parser):
+    parser.add_argument("--locations", type=int, default=100_000)
+    parser.add_argument("--properties", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def sample_queries(locations, count, seed):
+    """Keystroke-style prefixes and substrings of real names and cities"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        location = rng.choice(locations)
+        text = rng.choice([location.name, location.city, location.country])
+        start = rng.randrange(0, max(len(text) - 1, 1))
+        queries.append(text[start : start + rng.randint(1, 6)])
+    return queries
+
+
+def run(command, options):
+    view = LocationAutocompleteAPIView.as_view()
+    factory = RequestFactory()
+
+    def lookup(query):
+        view(factory.get("/api/autocomplete/", {"q": query}))
+
+    results = {}
+    with scratch_data():
+        command.stdout.write(
+            f"Generating {options['locations']} locations and "
+            f"{options['properties']} properties..."
+        )
+        locations = create_locations(options["locations"], options["seed"])
+        create_properties(locations, options["properties"], options["seed"])
+        queries = [(q,) for q in sample_queries(locations, options["queries"], options["seed"])]
+
+        location_index.invalidate()
+        build = time_calls(location_index.build, [()])[0]
+        results["index_build_ms"] = round(build, 1)
+        results["index"] = summarize(
+            time_calls(location_index.search, queries)
+        )
+        with override_settings(PROPERTY_AUTOCOMPLETE_INDEX=True):
+            results["view_index"] = summarize(time_calls(lookup, queries))
+        with override_settings(PROPERTY_AUTOCOMPLETE_INDEX=False):
+            results["view_orm"] = summarize(time_calls(lookup, queries))
+        location_index.invalidate()
+
+    command.stdout.write(f"Index build: {results['index_build_ms']} ms")
+    command.stdout.write(format_summary("index.search", results["index"]))
+    command.stdout.write(format_summary("view (index)", results["view_index"]))
+    command.stdout.write(format_summary("view (orm)", results["view_orm"]))
+    return results
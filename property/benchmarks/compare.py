@@ -0,0 +1,61 @@
+"""
+Compare two JSON result files written by ``benchmark <scenario> --json``
+"""
+
+import json
+
+help = "Compare the numeric results of two benchmark runs"
+
+# Results where a larger number is an improvement
+HIGHER_IS_BETTER = ("requests_per_second", "rows_per_second", "hit_rate")
+
+
+def add_arguments(parser):
+    parser.add_argument("baseline", help="JSON results of the baseline run")
+    parser.add_argument("candidate", help="JSON results of the run to compare")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=5.0,
+        help="Percent change reported as a regression or improvement (default: 5)",
+    )
+
+
+def flatten(results, prefix=""):
+    """``{"a.b.c": number}`` for the numeric leaves of nested results"""
+    values = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        results = json.load(f)
+    # Run metadata such as the concurrency is not a result
+    results.pop("meta", None)
+    return flatten(results)
+
+
+def run(command, options):
+    baseline = load(options["baseline"])
+    candidate = load(options["candidate"])
+    threshold = options["threshold"]
+    changes = {}
+    for path in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[path], candidate[path]
+        change = (after - before) / before * 100 if before else 0.0
+        changes[path] = {"baseline": before, "candidate": after, "change": change}
+        better = path.endswith(HIGHER_IS_BETTER) == (change > 0)
+        line = f"{path:<44} {before:>12,.3f} {after:>12,.3f} {change:>+8.1f}%"
+        if abs(change) < threshold or not path.endswith(("_ms", *HIGHER_IS_BETTER)):
+            command.stdout.write(line)
+        elif better:
+            command.stdout.write(command.style.SUCCESS(line))
+        else:
+            command.stdout.write(command.style.ERROR(line))
+    return changes
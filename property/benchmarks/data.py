@@ -0,0 +1,350 @@
+"""
+Seeded synthetic data for benchmarks
+"""
+
+import csv
+import random
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection
+from property import geo
+from property.models import Image, Location, Property
+
+PREFIXES = [
+    "North",
+    "South",
+    "East",
+    "West",
+    "Old",
+    "New",
+    "Upper",
+    "Lower",
+    "Green",
+    "Lake",
+    "River",
+    "Hill",
+    "Park",
+    "Bay",
+    "Harbor",
+    "Market",
+    "Garden",
+    "Stone",
+]
+SUFFIXES = [
+    "side",
+    "field",
+    "wood",
+    "view",
+    "gate",
+    "ford",
+    "haven",
+    "point",
+    "ridge",
+    "brook",
+    "dale",
+    "court",
+    "square",
+    "heights",
+    "village",
+    "district",
+]
+CITIES = [
+    "New York",
+    "Los Angeles",
+    "Chicago",
+    "Houston",
+    "Phoenix",
+    "Dhaka",
+    "Chittagong",
+    "Sylhet",
+    "London",
+    "Manchester",
+    "Toronto",
+    "Vancouver",
+    "Sydney",
+    "Melbourne",
+    "Berlin",
+    "Munich",
+    "Paris",
+    "Lyon",
+    "Madrid",
+    "Barcelona",
+    "Tokyo",
+    "Osaka",
+    "Singapore",
+    "Dubai",
+    "Lisbon",
+]
+COUNTRIES = {
+    "New York": "USA",
+    "Los Angeles": "USA",
+    "Chicago": "USA",
+    "Houston": "USA",
+    "Phoenix": "USA",
+    "Dhaka": "Bangladesh",
+    "Chittagong": "Bangladesh",
+    "Sylhet": "Bangladesh",
+    "London": "UK",
+    "Manchester": "UK",
+    "Toronto": "Canada",
+    "Vancouver": "Canada",
+    "Sydney": "Australia",
+    "Melbourne": "Australia",
+    "Berlin": "Germany",
+    "Munich": "Germany",
+    "Paris": "France",
+    "Lyon": "France",
+    "Madrid": "Spain",
+    "Barcelona": "Spain",
+    "Tokyo": "Japan",
+    "Osaka": "Japan",
+    "Singapore": "Singapore",
+    "Dubai": "UAE",
+    "Lisbon": "Portugal",
+}
+# City centres; generated locations are scattered within ~20 km of them
+CENTRES = {
+    "New York": (40.7128, -74.0060),
+    "Los Angeles": (34.0522, -118.2437),
+    "Chicago": (41.8781, -87.6298),
+    "Houston": (29.7604, -95.3698),
+    "Phoenix": (33.4484, -112.0740),
+    "Dhaka": (23.8103, 90.4125),
+    "Chittagong": (22.3569, 91.7832),
+    "Sylhet": (24.8949, 91.8687),
+    "London": (51.5074, -0.1278),
+    "Manchester": (53.4808, -2.2426),
+    "Toronto": (43.6532, -79.3832),
+    "Vancouver": (49.2827, -123.1207),
+    "Sydney": (-33.8688, 151.2093),
+    "Melbourne": (-37.8136, 144.9631),
+    "Berlin": (52.5200, 13.4050),
+    "Munich": (48.1351, 11.5820),
+    "Paris": (48.8566, 2.3522),
+    "Lyon": (45.7640, 4.8357),
+    "Madrid": (40.4168, -3.7038),
+    "Barcelona": (41.3874, 2.1686),
+    "Tokyo": (35.6762, 139.6503),
+    "Osaka": (34.6937, 135.5023),
+    "Singapore": (1.3521, 103.8198),
+    "Dubai": (25.2048, 55.2708),
+    "Lisbon": (38.7223, -9.1393),
+}
+TITLES = [
+    "Modern Apartment",
+    "Family House",
+    "Cozy Studio",
+    "Luxury Villa",
+    "Penthouse Suite",
+    "Garden Cottage",
+    "Office Space",
+    "Retail Unit",
+    "Townhouse",
+    "Loft Conversion",
+]
+
+
+def location_name(rng, number):
+    return f"{rng.choice(PREFIXES)}{rng.choice(SUFFIXES)} {number}"
+
+
+def create_locations(count, seed=0, batch_size=5000):
+    """Bulk insert ``count`` unique locations with coordinates and return them"""
+    rng = random.Random(seed)
+    locations = []
+    for number in range(count):
+        city = rng.choice(CITIES)
+        centre_latitude, centre_longitude = CENTRES[city]
+        latitude = centre_latitude + rng.gauss(0, 0.08)
+        longitude = centre_longitude + rng.gauss(0, 0.1)
+        locations.append(
+            Location(
+                name=location_name(rng, number),
+                city=city,
+                country=COUNTRIES[city],
+                latitude=latitude,
+                longitude=longitude,
+                geohash=geo.encode(latitude, longitude),
+            )
+        )
+    return Location.objects.bulk_create(locations, batch_size=batch_size)
+
+
+def create_properties(locations, count, seed=0, batch_size=5000):
+    """
+    Bulk insert ``count`` properties spread over ``locations`` with a skewed
+    (Pareto-like) distribution, so a few locations hold most listings.
+    Location counters are reconciled afterwards.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(locations))]
+    assigned = rng.choices(locations, weights=weights, k=count)
+    properties = [
+        Property(
+            title=rng.choice(TITLES),
+            description="Generated benchmark listing",
+            property_type=rng.choice(Property.PROPERTY_TYPES)[0],
+            status="available" if rng.random() < 0.8 else "rented",
+            location=location,
+            price=Decimal(rng.randrange(50_000, 2_000_000, 1000)),
+            bedrooms=rng.randint(0, 6),
+            bathrooms=rng.randint(1, 4),
+        )
+        for location in assigned
+    ]
+    for listing in properties:
+        listing.copy_coordinates(listing.location)
+    properties = Property.objects.bulk_create(properties, batch_size=batch_size)
+    Location.objects.reconcile_property_counts()
+    return properties
+
+
+# Images per listing and how often each count occurs: a few listings have
+# no photos, most have a handful, some a full gallery
+IMAGE_COUNT_WEIGHTS = {
+    0: 8,
+    1: 10,
+    2: 6,
+    3: 6,
+    4: 12,
+    5: 14,
+    6: 12,
+    8: 12,
+    12: 12,
+    20: 8,
+}
+
+
+def load_samples():
+    """``(fieldnames, rows)`` of ``sample_properties_data.csv``"""
+    with open(settings.BASE_DIR / "sample_properties_data.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+
+def sample_image_names():
+    """Stored names of the sample photos shipped in ``media/property_images``"""
+    directory = settings.MEDIA_ROOT / "property_images"
+    names = sorted(path.name for path in directory.glob("*.jpg"))
+    return [f"property_images/{name}" for name in names] or [
+        "property_images/missing.jpg"
+    ]
+
+
+def create_catalogue(count, seed=0, batch_size=5000, with_images=True, log=None):
+    """
+    Bulk insert a realistic catalogue: ``count`` listings cycled from the
+    sample CSV with jittered prices, spread over ``count // 25`` locations
+    with a skewed distribution, and a gallery per listing drawn from
+    ``IMAGE_COUNT_WEIGHTS`` that points at the sample photos. Derived data
+    (counters, search index, creation times) is rebuilt afterwards.
+    """
+    from property.search import get_search_backend
+
+    rng = random.Random(seed)
+    _, samples = load_samples()
+    locations = create_locations(max(count // 25, 50), seed)
+    weights = [1 / (rank + 1) for rank in range(len(locations))]
+    image_names = sample_image_names()
+    image_counts = list(IMAGE_COUNT_WEIGHTS)
+    image_weights = list(IMAGE_COUNT_WEIGHTS.values())
+
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        listings = []
+        for number, location in enumerate(
+            rng.choices(locations, weights=weights, k=size), start
+        ):
+            sample = samples[number % len(samples)]
+            listings.append(
+                Property(
+                    title=f"{sample['title']} #{number}",
+                    description=sample["description"],
+                    property_type=sample["property_type"],
+                    status=sample["status"],
+                    location=location,
+                    price=int(float(sample["price"]) * rng.uniform(0.8, 1.2)),
+                    bedrooms=int(sample["bedrooms"]),
+                    bathrooms=int(float(sample["bathrooms"])),
+                )
+            )
+        for listing in listings:
+            listing.copy_coordinates(listing.location)
+        listings = Property.objects.bulk_create(listings)
+        if with_images:
+            images = [
+                Image(
+                    property=listing,
+                    image=rng.choice(image_names),
+                    order=order,
+                    is_primary=order == 0,
+                )
+                for listing in listings
+                for order in range(rng.choices(image_counts, weights=image_weights)[0])
+            ]
+            Image.objects.bulk_create(images, batch_size=batch_size)
+        if log:
+            log(start + size)
+
+    spread_created_at()
+    Location.objects.reconcile_property_counts()
+    get_search_backend().rebuild()
+    return locations
+
+
+def write_scaled_csv(path, rows, seed=0, locations=500, id_prefix="FEED-"):
+    """
+    Write ``rows`` properties to ``path`` by cycling through
+    ``sample_properties_data.csv`` with jittered prices, a skewed spread
+    over ``locations`` generated locations and sequential external ids.
+    """
+    rng = random.Random(seed)
+    sample_fields, samples = load_samples()
+    fieldnames = [
+        "external_id",
+        *sample_fields,
+        "location",
+        "city",
+        "state",
+        "country",
+    ]
+
+    pool = []
+    for number in range(locations):
+        city = rng.choice(CITIES)
+        pool.append((location_name(rng, number), city, "", COUNTRIES[city]))
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(fieldnames)
+        for number in range(rows):
+            sample = samples[number % len(samples)]
+            price = int(float(sample["price"]) * rng.uniform(0.8, 1.2))
+            writer.writerow(
+                [
+                    f"{id_prefix}{number}",
+                    f"{sample['title']} #{number}",
+                    sample["description"],
+                    sample["property_type"],
+                    sample["status"],
+                    price,
+                    sample["bedrooms"],
+                    sample["bathrooms"],
+                    *rng.choices(pool, weights=weights)[0],
+                ]
+            )
+    return path
+
+
+def spread_created_at(minutes_apart=1):
+    """
+    Give bulk-created properties distinct creation times (``auto_now_add``
+    stamps a whole batch with the same instant). SQLite only.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Property._meta.db_table} "
+            "SET created_at = datetime('2020-01-01', '+' || (id * %s) || ' minutes')",
+            [minutes_apart],
+        )
@@ -0,0 +1,74 @@
+"""
+Benchmark dataset: a seeded catalogue written to its own SQLite file
+"""
+
+import os
+import time
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from property.models import Image, Location, Property
+from .data import create_catalogue
+from .utils import use_database
+
+help = "Generate a seeded catalogue of 10k/100k/1m properties in a new SQLite file"
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def size(value):
+    if value.lower() in SIZES:
+        return SIZES[value.lower()]
+    return int(value)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--size",
+        type=size,
+        default="10k",
+        help="Number of properties: 10k, 100k, 1m or any integer (default: 10k)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output",
+        help="SQLite file to create (default: bench-<size>.sqlite3)",
+    )
+    parser.add_argument("--no-images", action="store_true")
+    parser.add_argument(
+        "--force", action="store_true", help="Replace an existing output file"
+    )
+
+
+def run(command, options):
+    path = options["output"] or f"bench-{options['size']}.sqlite3"
+    if os.path.exists(path):
+        if not options["force"]:
+            raise CommandError(f"{path} exists; pass --force to replace it")
+        os.remove(path)
+
+    started = time.perf_counter()
+    with use_database(path):
+        call_command("migrate", verbosity=0)
+        command.stdout.write(f"Generating {options['size']:,} properties in {path}...")
+        with transaction.atomic():
+            create_catalogue(
+                options["size"],
+                options["seed"],
+                with_images=not options["no_images"],
+                log=lambda done: command.stdout.write(f"  {done:,} properties"),
+            )
+        results = {
+            "path": path,
+            "seed": options["seed"],
+            "properties": Property.objects.count(),
+            "locations": Location.objects.count(),
+            "images": Image.objects.count(),
+            "seconds": round(time.perf_counter() - started, 1),
+        }
+
+    command.stdout.write(
+        f"{results['properties']:,} properties, {results['locations']:,} locations "
+        f"and {results['images']:,} images in {results['seconds']}s"
+    )
+    return results
@@ -0,0 +1,56 @@
+"""
+Deployment benchmark: throughput of WSGI with sync views, ASGI with sync
+views and ASGI with native async views as concurrent connections grow
+"""
+
+from .replay import replay_trace, settings_for
+from .trace import read_trace
+from .utils import use_database
+
+help = "Compare WSGI and ASGI deployments over a trace at several concurrency levels"
+
+# (server, views)
+DEPLOYMENTS = [("wsgi", "sync"), ("asgi", "sync"), ("asgi", "async")]
+
+
+def levels(value):
+    return [int(level) for level in value.split(",")]
+
+
+def add_arguments(parser):
+    parser.add_argument("--database", required=True, help="Benchmark SQLite file")
+    parser.add_argument("--trace", default="trace.jsonl", help="JSONL request trace")
+    parser.add_argument(
+        "--concurrency",
+        type=levels,
+        default="1,4,16,64",
+        help="Comma-separated concurrency levels (default: 1,4,16,64)",
+    )
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--cold", action="store_true")
+
+
+def run(command, options):
+    entries = list(read_trace(options["trace"]))
+    results = {}
+    with use_database(options["database"]):
+        for server, views in DEPLOYMENTS:
+            name = f"{server}-{views}"
+            results[name] = {}
+            with settings_for(views, options["cold"]):
+                for level in options["concurrency"]:
+                    report = replay_trace(
+                        entries, server, level, options["warmup"], options["host"]
+                    )
+                    results[name][f"c{level}"] = {
+                        **report["total"],
+                        "endpoints": report["endpoints"],
+                    }
+                    total = report["total"]
+                    command.stdout.write(
+                        f"{name:<12} c={level:<4} {total['requests_per_second']:>8} req/s "
+                        f"p50={total['p50_ms']:.1f}ms p95={total['p95_ms']:.1f}ms "
+                        f"errors={total['errors']}"
+                    )
+    return results
@@ -0,0 +1,103 @@
+"""
+Export benchmark: throughput and peak memory of the streaming CSV/NDJSON
+export over a generated dataset (see ``benchmark dataset``)
+"""
+
+import os
+import resource
+import threading
+import time
+from django.core.management.base import CommandError
+from property.exporters import DEFAULT_CHUNK_SIZE, FORMATS, PropertyExport
+from property.models import Property
+from .utils import use_database
+
+help = "Stream every listing to CSV and NDJSON, plain and gzipped, and track RSS"
+
+
+def add_arguments(parser):
+    parser.add_argument("--database", required=True, help="Benchmark SQLite file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--max-rss-mb",
+        type=float,
+        help="Fail if resident memory grows by more than this during an export",
+    )
+
+
+def rss_bytes():
+    """Current resident set size; Linux only, else the peak so far"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RSSSampler(threading.Thread):
+    """Track the peak resident set size while the block runs"""
+
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_bytes()
+        self.finished = threading.Event()
+
+    def run(self):
+        while not self.finished.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finished.set()
+        self.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+def export(format, compress, chunk_size):
+    stream = PropertyExport(Property.objects.all(), format, compress, chunk_size)
+    size = 0
+    before = rss_bytes()
+    started = time.perf_counter()
+    with RSSSampler() as sampler, open(os.devnull, "wb") as output:
+        for block in stream:
+            size += len(block)
+            output.write(block)
+    seconds = time.perf_counter() - started
+    return {
+        "rows": stream.rows,
+        "seconds": round(seconds, 2),
+        "rows_per_s": round(stream.rows / seconds) if seconds else 0,
+        "mb": round(size / 2**20, 1),
+        "rss_before_mb": round(before / 2**20, 1),
+        "rss_peak_mb": round(sampler.peak / 2**20, 1),
+        "rss_growth_mb": round((sampler.peak - before) / 2**20, 1),
+    }
+
+
+def run(command, options):
+    results = {}
+    with use_database(options["database"]):
+        for format in FORMATS:
+            for compress in [False, True]:
+                name = format + (".gz" if compress else "")
+                command.stdout.write(f"Exporting {name}...")
+                results[name] = export(format, compress, options["chunk_size"])
+
+    for name, result in results.items():
+        command.stdout.write(
+            f"{name:<12} " + " ".join(f"{key}={value}" for key, value in result.items())
+        )
+    limit = options["max_rss_mb"]
+    if limit is not None:
+        over = [
+            name for name, result in results.items() if result["rss_growth_mb"] > limit
+        ]
+        if over:
+            raise CommandError(
+                f"RSS grew by more than {limit} MB exporting {', '.join(over)}"
+            )
+    return results
@@ -0,0 +1,102 @@
+"""
+Geo benchmark: radius, bounding-box and map-cluster queries over generated
+locations scattered around the sample cities
+"""
+
+import random
+from django.db.models import F
+from django.test import RequestFactory
+from property.models import Location, Property
+from property.views import PropertyMapAPIView
+from .data import CENTRES, create_locations, create_properties
+from .utils import format_summary, scratch_data, summarize, time_calls
+
+help = "Time radius, bounding-box and map-cluster queries on geohash ranges"
+
+
+def add_arguments(parser):
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--properties", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def sample_points(count, seed):
+    """Points near the city centres, where the listings are"""
+    rng = random.Random(seed)
+    centres = list(CENTRES.values())
+    points = []
+    for _ in range(count):
+        latitude, longitude = rng.choice(centres)
+        points.append((latitude + rng.gauss(0, 0.05), longitude + rng.gauss(0, 0.05)))
+    return points
+
+
+def run(command, options):
+    results = {}
+    points = sample_points(options["queries"], options["seed"])
+    with scratch_data():
+        command.stdout.write(
+            f"Generating {options['points']:,} locations and "
+            f"{options['properties']:,} properties..."
+        )
+        locations = create_locations(options["points"], options["seed"])
+        create_properties(locations, options["properties"], options["seed"])
+        # Every point shows on the map, as if it had listings
+        Location.objects.filter(property_count=0).update(property_count=F("id") % 5 + 1)
+
+        for radius in [1, 5, 20]:
+
+            def locations_near(latitude, longitude, radius=radius):
+                list(Location.objects.near(latitude, longitude, radius)[:50])
+
+            results[f"locations_near_{radius}km"] = summarize(
+                time_calls(locations_near, points)
+            )
+
+        for radius in [1, 5, 20]:
+
+            def listings_page(latitude, longitude, radius=radius):
+                listings = Property.objects.within_radius(latitude, longitude, radius)
+                listings.count()
+                list(
+                    listings.nearest_first(latitude, longitude).select_related(
+                        "location"
+                    )[:20]
+                )
+
+            results[f"listings_near_{radius}km"] = summarize(
+                time_calls(listings_page, points)
+            )
+
+        def bbox(latitude, longitude):
+            list(
+                Location.objects.within_bbox(
+                    latitude - 0.02, longitude - 0.03, latitude + 0.02, longitude + 0.03
+                ).values_list("pk", "latitude", "longitude")
+            )
+
+        results["bbox_city_block"] = summarize(time_calls(bbox, points))
+
+        factory = RequestFactory()
+        view = PropertyMapAPIView.as_view()
+        for name, (lat_span, lng_span) in {
+            "map_city": (0.2, 0.3),
+            "map_region": (2.0, 3.0),
+        }.items():
+
+            def map_clusters(latitude, longitude):
+                south, west = latitude - lat_span, longitude - lng_span
+                north, east = latitude + lat_span, longitude + lng_span
+                view(factory.get("/", {"bbox": f"{south},{west},{north},{east}"}))
+
+            results[name] = summarize(time_calls(map_clusters, points))
+
+        world = factory.get("/", {"bbox": "-90,-180,90,180"})
+        results["map_world"] = summarize(
+            time_calls(lambda: view(world), [()] * min(options["queries"], 20))
+        )
+
+    for name, summary in results.items():
+        command.stdout.write(format_summary(name, summary))
+    return results
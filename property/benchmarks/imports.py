@@ -0,0 +1,76 @@
+"""
+Import benchmark: per-row import_properties versus --bulk mode
+"""
+
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from property.models import Property
+from .data import write_scaled_csv
+from .utils import scratch_database, time_calls
+
+help = "Compare the per-row and bulk CSV import paths on a generated feed"
+
+
+def add_arguments(parser):
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument(
+        "--legacy-rows",
+        type=int,
+        default=5_000,
+        help="Rows fed to the per-row path; its throughput is extrapolated",
+    )
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def import_file(path, **options):
+    call_command("import_properties", path, stdout=StringIO(), **options)
+
+
+def run(command, options):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="property-import-") as directory:
+        legacy_csv = os.path.join(directory, "legacy.csv")
+        bulk_csv = os.path.join(directory, "bulk.csv")
+        command.stdout.write(f"Generating {options['rows']:,} rows...")
+        write_scaled_csv(legacy_csv, options["legacy_rows"], options["seed"])
+        write_scaled_csv(bulk_csv, options["rows"], options["seed"])
+
+        for label, path, rows, import_options in [
+            ("legacy", legacy_csv, options["legacy_rows"], {}),
+            (
+                "bulk",
+                bulk_csv,
+                options["rows"],
+                {"bulk": True, "batch_size": options["batch_size"]},
+            ),
+        ]:
+            with scratch_database():
+                (elapsed_ms,) = time_calls(
+                    lambda: import_file(path, **import_options), [()]
+                )
+                imported = Property.objects.count()
+            seconds = elapsed_ms / 1000
+            results[label] = {
+                "rows": rows,
+                "imported": imported,
+                "seconds": round(seconds, 2),
+                "rows_per_second": round(rows / seconds, 1),
+                "projected_seconds_for_rows": round(
+                    options["rows"] / (rows / seconds), 1
+                ),
+            }
+            command.stdout.write(
+                f"{label:<8} {rows:>10,} rows in {seconds:8.2f}s "
+                f"({rows / seconds:>10,.0f} rows/s, "
+                f"~{results[label]['projected_seconds_for_rows']:,.0f}s "
+                f"for {options['rows']:,} rows)"
+            )
+
+    results["speedup"] = round(
+        results["bulk"]["rows_per_second"] / results["legacy"]["rows_per_second"], 1
+    )
+    command.stdout.write(f"Bulk mode speedup: {results['speedup']}x")
+    return results
@@ -0,0 +1,63 @@
+"""
+Pagination benchmark: OFFSET pages versus keyset (cursor) pages by depth
+"""
+
+from property.models import Property
+from property.pagination import CountedPaginator, KeysetPaginator
+from .data import create_locations, create_properties, spread_created_at
+from .utils import format_summary, scratch_data, summarize, time_calls
+
+help = "Compare first and deep page latency for offset and cursor pagination"
+
+PER_PAGE = 9
+
+
+def add_arguments(parser):
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--pages",
+        type=int,
+        nargs="+",
+        default=[1, 100, 10_000],
+        help="Page numbers to measure (default: 1 100 10000)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def listing_queryset():
+    return Property.objects.select_related("location").with_primary_image()
+
+
+def offset_page(number):
+    paginator = CountedPaginator(listing_queryset().order_by("-created_at"), PER_PAGE)
+    list(paginator.get_page(number))
+    return paginator.count
+
+
+def cursor_page(cursor):
+    list(KeysetPaginator(listing_queryset(), PER_PAGE).get_page(cursor))
+
+
+def run(command, options):
+    results = {"rows": options["rows"], "pages": {}}
+    with scratch_data():
+        command.stdout.write(f"Generating {options['rows']:,} properties...")
+        locations = create_locations(1000, options["seed"])
+        create_properties(locations, options["rows"], options["seed"])
+        spread_created_at()
+
+        ordered = Property.objects.order_by("-created_at", "-pk")
+        for number in options["pages"]:
+            if number > 1:
+                boundary = ordered[(number - 1) * PER_PAGE - 1]
+                cursor = KeysetPaginator.encode_cursor("next", boundary)
+            else:
+                cursor = None
+            repeat = [()] * options["repeat"]
+            offset = summarize(time_calls(lambda: offset_page(number), repeat))
+            keyset = summarize(time_calls(lambda: cursor_page(cursor), repeat))
+            results["pages"][number] = {"offset": offset, "cursor": keyset}
+            command.stdout.write(format_summary(f"offset page {number}", offset))
+            command.stdout.write(format_summary(f"cursor page {number}", keyset))
+    return results
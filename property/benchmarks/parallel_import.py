@@ -0,0 +1,78 @@
+"""
+Parallel import benchmark: rows/sec as the worker count scales
+"""
+
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from property.models import Property
+from .data import write_scaled_csv
+from .utils import scratch_database, time_calls
+
+help = "Measure import_properties throughput for several --workers values"
+
+
+def worker_counts(value):
+    return [int(count) for count in value.split(",")]
+
+
+def add_arguments(parser):
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument(
+        "--workers",
+        type=worker_counts,
+        default=[1, 2, 4, 8],
+        help="Comma separated worker counts (default: 1,2,4,8)",
+    )
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--shard-size", type=int, default=8, help="MiB")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def timed_import(path, options, workers):
+    (elapsed_ms,) = time_calls(
+        lambda: call_command(
+            "import_properties",
+            path,
+            bulk=True,
+            workers=workers,
+            batch_size=options["batch_size"],
+            shard_size=options["shard_size"],
+            stdout=StringIO(),
+        ),
+        [()],
+    )
+    return elapsed_ms / 1000
+
+
+def run(command, options):
+    rows = options["rows"]
+    results = {"cpus": os.cpu_count(), "runs": []}
+    with tempfile.TemporaryDirectory(prefix="property-import-") as directory:
+        path = os.path.join(directory, "feed.csv")
+        command.stdout.write(f"Generating {rows:,} rows...")
+        write_scaled_csv(path, rows, options["seed"])
+
+        command.stdout.write(
+            f"{'workers':>7} {'insert rows/s':>14} {'upsert rows/s':>14}"
+        )
+        for workers in options["workers"]:
+            with scratch_database():
+                insert_seconds = timed_import(path, options, workers)
+                # Same feed again: every row now matches an external_id
+                upsert_seconds = timed_import(path, options, workers)
+                assert Property.objects.count() == rows
+            run = {
+                "workers": workers,
+                "insert_seconds": round(insert_seconds, 2),
+                "insert_rows_per_second": round(rows / insert_seconds, 1),
+                "upsert_seconds": round(upsert_seconds, 2),
+                "upsert_rows_per_second": round(rows / upsert_seconds, 1),
+            }
+            results["runs"].append(run)
+            command.stdout.write(
+                f"{workers:>7} {run['insert_rows_per_second']:>14,.0f} "
+                f"{run['upsert_rows_per_second']:>14,.0f}"
+            )
+    return results
@@ -0,0 +1,260 @@
+"""
+Trace replay: fire the requests of a trace at the WSGI or ASGI application
+in-process, with concurrency, and report per-endpoint latency and req/s
+"""
+
+import asyncio
+import platform
+import sqlite3
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import django
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from property.profiling import profiles
+from .trace import read_trace
+from .utils import format_summary, summarize, use_database
+
+help = "Replay a request trace against the in-process WSGI or ASGI application"
+
+
+def add_arguments(parser):
+    parser.add_argument("--database", required=True, help="Benchmark SQLite file")
+    parser.add_argument("--trace", default="trace.jsonl", help="JSONL request trace")
+    parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=200,
+        help="Replay this many leading requests unmeasured first (default: 200)",
+    )
+    parser.add_argument(
+        "--views",
+        choices=["sync", "async"],
+        help=(
+            "Serve the sync views (core.urls) or the native async views "
+            "(core.async_urls); defaults to what the deployment uses: async "
+            "under ASGI, sync under WSGI"
+        ),
+    )
+    parser.add_argument("--host", default="localhost", help="Host header to send")
+    parser.add_argument(
+        "--cold",
+        action="store_true",
+        help="Disable the page and card caches for the run",
+    )
+
+
+class WSGIClient:
+    """Calls a WSGI application directly with a minimal environ"""
+
+    def __init__(self, host):
+        self.application = get_wsgi_application()
+        self.host = host
+
+    def environ(self, entry):
+        return {
+            "REQUEST_METHOD": entry["method"],
+            "SCRIPT_NAME": "",
+            "PATH_INFO": entry["path"],
+            "QUERY_STRING": entry["query"],
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": self.host,
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(),
+            "wsgi.errors": BytesIO(),
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+
+    def request(self, entry):
+        """Return ``(status, latency_ms)`` once the body has been consumed"""
+        status = []
+        started = time.perf_counter()
+        body = self.application(
+            self.environ(entry), lambda line, headers: status.append(line)
+        )
+        try:
+            for _ in body:
+                pass
+        finally:
+            # Closing the response fires request_finished, like a real server
+            body.close()
+        return int(status[0].split()[0]), (time.perf_counter() - started) * 1000
+
+    def replay(self, entries, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(self.request, entries))
+
+
+class ASGIClient:
+    """Calls an ASGI application directly with a minimal HTTP scope"""
+
+    def __init__(self, host):
+        self.application = get_asgi_application()
+        self.host = host
+
+    def scope(self, entry):
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": entry["method"],
+            "scheme": "http",
+            "path": entry["path"],
+            "raw_path": entry["path"].encode(),
+            "query_string": entry["query"].encode(),
+            "root_path": "",
+            "headers": [(b"host", self.host.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": (self.host, 80),
+        }
+
+    async def request(self, entry):
+        status = []
+        disconnect = asyncio.Event()
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # The handler listens for disconnects until the response is sent
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        started = time.perf_counter()
+        await self.application(self.scope(entry), receive, send)
+        return status[0], (time.perf_counter() - started) * 1000
+
+    def replay(self, entries, concurrency):
+        async def replay_all():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def limited(entry):
+                async with semaphore:
+                    return await self.request(entry)
+
+            return await asyncio.gather(*(limited(entry) for entry in entries))
+
+        return asyncio.run(replay_all())
+
+
+CLIENTS = {"wsgi": WSGIClient, "asgi": ASGIClient}
+
+URLCONFS = {"sync": "core.urls", "async": "core.async_urls"}
+
+
+def report(entries, results, seconds):
+    samples = defaultdict(list)
+    errors = Counter()
+    statuses = Counter()
+    for entry, (status, latency) in zip(entries, results):
+        samples[entry["name"]].append(latency)
+        statuses[str(status)] += 1
+        if status >= 400:
+            errors[entry["name"]] += 1
+
+    endpoints = {}
+    for name, latencies in sorted(samples.items()):
+        endpoints[name] = {
+            **summarize(latencies),
+            "errors": errors[name],
+            "requests_per_second": round(len(latencies) / seconds, 1),
+        }
+    return {
+        "total": {
+            **summarize([latency for _, latency in results]),
+            "errors": sum(errors.values()),
+            "seconds": round(seconds, 3),
+            "requests_per_second": round(len(results) / seconds, 1),
+        },
+        "endpoints": endpoints,
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def replay_trace(entries, server, concurrency, warmup=0, host="localhost"):
+    """
+    Replay ``entries`` through a fresh ``server`` ("wsgi" or "asgi") client,
+    the first ``warmup`` of them unmeasured, and return the report of the
+    rest with the server-side profiles. The caller picks the database and
+    URLconf.
+    """
+    warmup, measured = entries[:warmup], entries[warmup:]
+    if not measured:
+        measured, warmup = warmup, []
+    cache.clear()
+    client = CLIENTS[server](host)
+    client.replay(warmup, concurrency)
+    profiles.reset()
+    started = time.perf_counter()
+    results = client.replay(measured, concurrency)
+    seconds = time.perf_counter() - started
+    results = report(measured, results, seconds)
+    results["server"] = profiles.summary()
+    return results
+
+
+def settings_for(views, cold=False):
+    overrides = {"ROOT_URLCONF": URLCONFS[views]}
+    if cold:
+        overrides.update(PROPERTY_PAGE_CACHE_TIMEOUT=0, PROPERTY_CARD_CACHE_TIMEOUT=0)
+    return override_settings(**overrides)
+
+
+def run(command, options):
+    entries = list(read_trace(options["trace"]))
+    views = options["views"] or ("async" if options["server"] == "asgi" else "sync")
+    command.stdout.write(
+        f"Replaying {len(entries)} requests ({options['warmup']} warm-up) over "
+        f"{options['server'].upper()} ({views} views) with concurrency "
+        f"{options['concurrency']}..."
+    )
+    with use_database(options["database"]), settings_for(views, options["cold"]):
+        results = replay_trace(
+            entries,
+            options["server"],
+            options["concurrency"],
+            options["warmup"],
+            options["host"],
+        )
+    results["meta"] = {
+        "trace": options["trace"],
+        "database": options["database"],
+        "server": options["server"],
+        "views": views,
+        "concurrency": options["concurrency"],
+        "warmup": options["warmup"],
+        "cold": options["cold"],
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "sqlite": sqlite3.sqlite_version,
+    }
+
+    for name, summary in results["endpoints"].items():
+        command.stdout.write(
+            f"{format_summary(name, summary)} "
+            f"errors={summary['errors']} {summary['requests_per_second']} req/s"
+        )
+    total = results["total"]
+    command.stdout.write(
+        f"{format_summary('total', total)} errors={total['errors']} "
+        f"{total['requests_per_second']} req/s"
+    )
+    return results
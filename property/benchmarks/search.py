@@ -0,0 +1,60 @@
+"""
+Search benchmark: FTS5 index versus icontains scans
+"""
+
+import random
+from property.models import Property
+from property.search import search_properties
+from property.search.database import DatabaseSearchBackend
+from property.search.sqlite import SQLiteFTS5Backend
+from .data import CITIES, TITLES, create_locations, create_properties
+from .utils import format_summary, scratch_data, summarize, time_calls
+
+help = "Compare ranked full-text search with the icontains fallback"
+
+
+def add_arguments(parser):
+    parser.add_argument("--locations", type=int, default=10_000)
+    parser.add_argument("--properties", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def sample_queries(count, seed):
+    """One or two words taken from listing titles and cities"""
+    rng = random.Random(seed)
+    words = [word for text in TITLES + CITIES for word in text.split()]
+    return [" ".join(rng.sample(words, rng.choice([1, 1, 2]))) for _ in range(count)]
+
+
+def run(command, options):
+    limit = options["limit"]
+    results = {}
+    with scratch_data():
+        command.stdout.write(
+            f"Generating {options['locations']} locations and "
+            f"{options['properties']} properties..."
+        )
+        locations = create_locations(options["locations"], options["seed"])
+        create_properties(locations, options["properties"], options["seed"])
+        queries = [(q,) for q in sample_queries(options["queries"], options["seed"])]
+
+        backends = {"fts5": SQLiteFTS5Backend(), "icontains": DatabaseSearchBackend()}
+        build = time_calls(backends["fts5"].rebuild, [()])[0]
+        results["index_build_ms"] = round(build, 1)
+        for name, backend in backends.items():
+            results[name] = summarize(
+                time_calls(lambda query: backend.search(query, limit), queries)
+            )
+
+        # Full page query: ids from the index joined back to the listings
+        def listing_page(query):
+            list(search_properties(Property.objects.all(), query, limit=limit))
+
+        results["fts5_page"] = summarize(time_calls(listing_page, queries))
+
+    command.stdout.write(f"Index build: {results['index_build_ms']} ms")
+    for name in ["fts5", "icontains", "fts5_page"]:
+        command.stdout.write(format_summary(name, results[name]))
+    return results
@@ -0,0 +1,176 @@
+"""
+Serializer benchmark: the property API serializers, full and sparse, against
+a hand-written ``values()`` fast path producing the same payload, and the
+detail endpoint's full versus conditional (304) responses
+"""
+
+import time
+from collections import defaultdict
+from django.core.files.storage import default_storage
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.fields import DateTimeField
+from property.models import Image, Property
+from property.serializers import PropertyDetailSerializer
+from property.views import PropertyDetailAPIView
+from .data import create_catalogue
+from .utils import format_summary, scratch_data, summarize, time_calls
+
+help = "Compare DRF serializer and values() throughput for the property API"
+
+SPARSE_FIELDS = ["id", "title", "price", "primary_image_url"]
+
+LOCATION_FIELDS = ["id", "name", "city", "state", "country", "latitude", "longitude"]
+
+# Copied from the row as they are
+PLAIN_FIELDS = {
+    "id",
+    "external_id",
+    "title",
+    "description",
+    "property_type",
+    "status",
+    "bedrooms",
+    "bathrooms",
+}
+
+
+def add_arguments(parser):
+    parser.add_argument("--properties", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def serializer_page(pks, fields=None):
+    view = PropertyDetailAPIView()
+    listings = view.get_queryset(fields).filter(pk__in=pks).order_by("pk")
+    return PropertyDetailSerializer(listings, many=True, fields=fields).data
+
+
+def values_page(pks, fields=None):
+    """The serializer's payload built by hand from ``values()`` rows"""
+    fields = fields or list(PropertyDetailSerializer().fields)
+    columns = ["price", "location_id", "created_at", "updated_at", *PLAIN_FIELDS]
+    if "location" in fields:
+        columns += [f"location__{name}" for name in LOCATION_FIELDS]
+    rows = Property.objects.filter(pk__in=pks).order_by("pk").values(*columns)
+
+    galleries = defaultdict(list)
+    if "images" in fields or "primary_image_url" in fields:
+        images = Image.objects.filter(property__in=pks).values(
+            "id",
+            "property_id",
+            "image",
+            "caption",
+            "is_primary",
+            "order",
+            "uploaded_at",
+        )
+        for image in images:
+            galleries[image["property_id"]].append(image)
+
+    to_datetime = DateTimeField().to_representation
+    url = default_storage.url
+    results = []
+    for row in rows:
+        gallery = galleries[row["id"]]
+        data = {}
+        for name in fields:
+            if name in PLAIN_FIELDS:
+                data[name] = row[name]
+            elif name == "price":
+                data[name] = f"${row['price']:,.2f}"
+            elif name in ("created_at", "updated_at"):
+                data[name] = to_datetime(row[name])
+            elif name == "location":
+                data[name] = row["location_id"] and {
+                    key: row[f"location__{key}"] for key in LOCATION_FIELDS
+                }
+            elif name == "images":
+                data[name] = [
+                    {
+                        "id": image["id"],
+                        "url": url(image["image"]),
+                        "caption": image["caption"],
+                        "is_primary": image["is_primary"],
+                        "order": image["order"],
+                    }
+                    for image in gallery
+                ]
+            elif name == "primary_image_url":
+                primary = min(
+                    gallery,
+                    key=lambda image: (
+                        not image["is_primary"],
+                        image["order"],
+                        -image["uploaded_at"].timestamp(),
+                    ),
+                    default=None,
+                )
+                data[name] = primary and url(primary["image"])
+            elif name == "url":
+                data[name] = reverse("property:property_detail", args=[row["id"]])
+        results.append(data)
+    return results
+
+
+def throughput(build, pages, fields):
+    started = time.perf_counter()
+    rows = sum(len(build(pks, fields)) for pks in pages)
+    seconds = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(rows / seconds),
+    }
+
+
+def run(command, options):
+    results = {}
+    with scratch_data():
+        command.stdout.write(f"Generating {options['properties']:,} properties...")
+        create_catalogue(options["properties"], options["seed"])
+        pks = list(Property.objects.order_by("pk").values_list("pk", flat=True))
+        size = options["page_size"]
+        pages = [pks[start : start + size] for start in range(0, len(pks), size)]
+
+        for fields in [None, SPARSE_FIELDS]:
+            serialized = [dict(row) for row in serializer_page(pages[0], fields)]
+            if values_page(pages[0], fields) != serialized:
+                raise AssertionError("values() fast path differs from the serializer")
+
+        for label, fields in [("full", None), ("sparse", SPARSE_FIELDS)]:
+            command.stdout.write(f"Serializing {len(pks):,} listings ({label})...")
+            results[f"serializer_{label}"] = throughput(serializer_page, pages, fields)
+            results[f"values_{label}"] = throughput(values_page, pages, fields)
+
+        view = PropertyDetailAPIView.as_view()
+        factory = RequestFactory()
+        sample = [(pk,) for pk in pks[:: max(1, len(pks) // options["requests"])]]
+        etags = {}
+
+        def full(pk):
+            response = view(factory.get(f"/api/properties/{pk}/"), pk=pk)
+            response.render()
+            etags[pk] = response["ETag"]
+
+        def conditional(pk):
+            request = factory.get(
+                f"/api/properties/{pk}/", HTTP_IF_NONE_MATCH=etags[pk]
+            )
+            if view(request, pk=pk).status_code != 304:
+                raise AssertionError(f"{pk} was not answered with 304")
+
+        results["detail_200"] = summarize(time_calls(full, sample))
+        results["detail_304"] = summarize(time_calls(conditional, sample))
+
+    for name, result in results.items():
+        if "rows" in result:
+            command.stdout.write(
+                f"{name:<24} rows={result['rows']} seconds={result['seconds']} "
+                f"rows/s={result['rows_per_s']}"
+            )
+        else:
+            command.stdout.write(format_summary(name, result))
+    return results
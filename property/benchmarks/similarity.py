@@ -0,0 +1,94 @@
+"""
+Similarity benchmark: full and incremental builds of the similar listings
+table over generated listings, and the detail page's neighbour lookup
+"""
+
+import random
+import time
+from django.db.models import F
+from django.utils import timezone
+from property import similarity
+from property.models import Property, PropertyNeighbours
+from .data import create_locations, create_properties
+from .utils import format_summary, scratch_data, summarize, time_calls
+
+help = "Time full and incremental similar-listing builds and their lookup"
+
+
+def add_arguments(parser):
+    parser.add_argument("--properties", type=int, default=1_000_000)
+    parser.add_argument("--locations", type=int, default=20_000)
+    parser.add_argument(
+        "--changes", type=int, default=1000, help="Listings edited before the update"
+    )
+    parser.add_argument("--neighbours", type=int, default=6)
+    parser.add_argument("--text", action="store_true", help="Compare descriptions")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def timed(results, name, func, *args):
+    started = time.perf_counter()
+    value = func(*args)
+    results[name] = round(time.perf_counter() - started, 3)
+    return value
+
+
+def run(command, options):
+    similarity._require_numpy()
+    count = options["neighbours"]
+    rng = random.Random(options["seed"])
+    results = {}
+    with scratch_data():
+        command.stdout.write(
+            f"Generating {options['locations']:,} locations and "
+            f"{options['properties']:,} properties..."
+        )
+        locations = create_locations(options["locations"], options["seed"])
+        create_properties(locations, options["properties"], options["seed"])
+
+        command.stdout.write("Full build...")
+        PropertyNeighbours.objects.all().delete()
+        full = {}
+        built_at = timezone.now()
+        data = timed(full, "load_s", similarity.load, options["text"])
+        positions = list(range(len(data.ids)))
+        found = timed(
+            full, "neighbours_s", similarity.neighbours, data, positions, count
+        )
+        timed(full, "save_s", similarity._save, found, built_at, False)
+        full["total_s"] = round(sum(full.values()), 3)
+        full["listings"] = len(found)
+        results["full_build"] = full
+
+        command.stdout.write(f"Editing {options['changes']:,} listings...")
+        changed = rng.sample(data.ids.tolist(), min(options["changes"], len(data.ids)))
+        del data, found
+        Property.objects.filter(pk__in=changed).update(
+            price=F("price") * 1.1, updated_at=timezone.now()
+        )
+        incremental = {}
+        incremental["recomputed"] = timed(
+            incremental, "total_s", similarity.update, count, options["text"]
+        )
+        results["incremental_update"] = incremental
+
+        sample = [
+            (pk,) for pk in rng.sample(changed, min(options["queries"], len(changed)))
+        ]
+
+        def lookup(pk):
+            listing = Property.objects.select_related("neighbours").get(pk=pk)
+            Property.objects.select_related("location").with_primary_image().similar_to(
+                listing
+            )
+
+        results["detail_lookup"] = summarize(time_calls(lookup, sample))
+
+    for name in ["full_build", "incremental_update"]:
+        command.stdout.write(
+            f"{name:<24} "
+            + " ".join(f"{key}={value}" for key, value in results[name].items())
+        )
+    command.stdout.write(format_summary("detail_lookup", results["detail_lookup"]))
+    return results
@@ -0,0 +1,154 @@
+"""
+SQLite concurrency stress: reader and writer threads on one database file,
+with the development profile (rollback journal, deferred transactions) and
+the production profile (WAL and the tuning PRAGMAs, immediate transactions)
+"""
+
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.test.utils import override_settings
+from property.models import Location, Property
+from .utils import format_summary, summarize, use_database
+
+help = "Lock errors and latency of concurrent reads and writes per SQLite profile"
+
+PROFILES = ("development", "production")
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--database", required=True, help="Benchmark SQLite file (copied per run)"
+    )
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument(
+        "--hold-ms",
+        type=float,
+        default=5.0,
+        help="Time each write transaction stays open, like an admin save",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+
+@contextmanager
+def database_profile(profile):
+    """Apply ``profile``'s tuning and transaction mode to new connections"""
+    options = connections.settings["default"].setdefault("OPTIONS", {})
+    previous = options.get("transaction_mode")
+    if profile == "production":
+        options["transaction_mode"] = "IMMEDIATE"
+    else:
+        options.pop("transaction_mode", None)
+    try:
+        with override_settings(PROPERTY_SQLITE_TUNING=profile == "production"):
+            yield
+    finally:
+        connections.close_all()
+        if previous is None:
+            options.pop("transaction_mode", None)
+        else:
+            options["transaction_mode"] = previous
+
+
+def copy_database(source, target):
+    """Consistent copy of ``source``, even if it is in WAL mode"""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+        dst.execute("PRAGMA journal_mode = delete")
+
+
+class Worker(threading.Thread):
+    def __init__(self, action, deadline, seed):
+        super().__init__()
+        self.action = action
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.samples = []
+        self.errors = 0
+
+    def run(self):
+        try:
+            while time.perf_counter() < self.deadline:
+                started = time.perf_counter()
+                try:
+                    self.action(self.rng)
+                except OperationalError:
+                    self.errors += 1
+                    continue
+                self.samples.append((time.perf_counter() - started) * 1000)
+        finally:
+            connections.close_all()
+
+
+def stress(readers, writers, seconds, hold_ms, seed):
+    property_ids = list(Property.objects.values_list("pk", flat=True))
+    location_ids = list(Location.objects.values_list("pk", flat=True))
+
+    def read(rng):
+        # A list page: count plus the first cards of one location
+        listings = Property.objects.filter(location_id=rng.choice(location_ids))
+        listings.count()
+        list(listings.select_related("location").order_by("-created_at")[:9])
+
+    def write(rng):
+        # Like an admin save: read the row, then write inside the transaction
+        with transaction.atomic():
+            listing = Property.objects.get(pk=rng.choice(property_ids))
+            Property.objects.filter(pk=listing.pk).update(price=F("price") + 1)
+            time.sleep(hold_ms / 1000)
+            Location.objects.filter(pk=rng.choice(location_ids)).update(
+                updated_at=F("updated_at")
+            )
+
+    deadline = time.perf_counter() + seconds
+    workers = [Worker(read, deadline, seed + n) for n in range(readers)] + [
+        Worker(write, deadline, seed + readers + n) for n in range(writers)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    results = {}
+    for kind, group in [("reads", workers[:readers]), ("writes", workers[readers:])]:
+        samples = [sample for worker in group for sample in worker.samples]
+        results[kind] = {
+            **summarize(samples),
+            "errors": sum(worker.errors for worker in group),
+            "per_second": round(len(samples) / seconds, 1),
+        }
+    return results
+
+
+def run(command, options):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="property-stress-") as directory:
+        for profile in PROFILES:
+            path = Path(directory) / f"{profile}.sqlite3"
+            copy_database(options["database"], path)
+            with use_database(path), database_profile(profile):
+                command.stdout.write(
+                    f"{profile}: {options['readers']} readers, "
+                    f"{options['writers']} writers for {options['seconds']}s..."
+                )
+                results[profile] = stress(
+                    options["readers"],
+                    options["writers"],
+                    options["seconds"],
+                    options["hold_ms"],
+                    options["seed"],
+                )
+            for kind, summary in results[profile].items():
+                command.stdout.write(
+                    f"{format_summary(f'{profile} {kind}', summary)} "
+                    f"errors={summary['errors']} {summary['per_second']}/s"
+                )
+    return results
@@ -0,0 +1,150 @@
+"""
+Task queue benchmark: admin save latency of a listing with a new photo when
+its renditions are rendered in the request (the immediate backend, as before
+the queue) and when they are queued, then how fast one worker drains the
+queue and how quickly tasks are enqueued
+"""
+
+import io
+import tempfile
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.tasks import task
+from django.test import Client, override_settings
+from django.urls import reverse
+from PIL import Image as PILImage
+from property.models import Property, QueuedTask
+from property.queue import Worker, queue_stats
+from .utils import format_summary, scratch_database, summarize, time_calls
+
+help = "Compare admin save latency with inline and queued image processing"
+
+IMMEDIATE = {
+    "default": {
+        "BACKEND": "django.tasks.backends.immediate.ImmediateBackend",
+        "QUEUES": settings.TASKS["default"]["QUEUES"],
+    }
+}
+
+
+@task
+def noop():
+    """Does nothing, to measure the queue's own overhead"""
+
+
+def add_arguments(parser):
+    parser.add_argument("--saves", type=int, default=20)
+    parser.add_argument(
+        "--photo",
+        type=int,
+        nargs=2,
+        default=[2400, 1600],
+        metavar=("WIDTH", "HEIGHT"),
+        help="Size of the uploaded photo (default: 2400 1600)",
+    )
+    parser.add_argument("--tasks", type=int, default=1000)
+
+
+def photo(size):
+    buffer = io.BytesIO()
+    PILImage.effect_noise(tuple(size), 64).convert("RGB").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def admin_save(client, content):
+    """Save a new listing's change form with one photo in the inline"""
+    listing = Property.objects.create(
+        title="Benchmark listing",
+        description="Listing saved through the admin",
+        price=1000,
+        bedrooms=2,
+        bathrooms=1,
+    )
+    data = {
+        "title": listing.title,
+        "description": listing.description,
+        "property_type": "house",
+        "status": "available",
+        "location": "",
+        "price": "1000",
+        "bedrooms": "2",
+        "bathrooms": "1",
+        "images-TOTAL_FORMS": "1",
+        "images-INITIAL_FORMS": "0",
+        "images-MIN_NUM_FORMS": "0",
+        "images-MAX_NUM_FORMS": "1000",
+        "images-0-id": "",
+        "images-0-property": str(listing.pk),
+        "images-0-image": SimpleUploadedFile("photo.jpg", content, "image/jpeg"),
+        "images-0-caption": "",
+        "images-0-is_primary": "on",
+        "images-0-order": "0",
+    }
+    url = reverse("admin:property_property_change", args=[listing.pk])
+    response = client.post(url, data)
+    if response.status_code != 302:
+        raise AssertionError(f"Admin save failed with {response.status_code}")
+
+
+def run(command, options):
+    results = {}
+    content = photo(options["photo"])
+    media_root = tempfile.TemporaryDirectory()
+    with (
+        media_root,
+        scratch_database(),
+        override_settings(MEDIA_ROOT=media_root.name, ALLOWED_HOSTS=["testserver"]),
+    ):
+        client = Client()
+        client.force_login(
+            get_user_model().objects.create_superuser("bench", "", "bench")
+        )
+        saves = [(client, content)] * options["saves"]
+        admin_save(client, content)
+
+        command.stdout.write("Saving listings with renditions in the request...")
+        with override_settings(TASKS=IMMEDIATE):
+            results["admin_save_inline"] = summarize(time_calls(admin_save, saves))
+        command.stdout.write("Saving listings with renditions queued...")
+        QueuedTask.objects.all().delete()
+        results["admin_save_queued"] = summarize(time_calls(admin_save, saves))
+
+        started = time.perf_counter()
+        rendered = Worker(queues=["images"]).run(burst=True)
+        seconds = time.perf_counter() - started
+        results["renditions_worker"] = {
+            "tasks": rendered,
+            "seconds": round(seconds, 3),
+            "tasks_per_s": round(rendered / seconds, 1),
+        }
+
+        command.stdout.write(f"Enqueueing and running {options['tasks']} tasks...")
+        results["enqueue"] = summarize(
+            time_calls(noop.enqueue, [()] * options["tasks"])
+        )
+        started = time.perf_counter()
+        drained = Worker(queues=["default"]).run(burst=True)
+        seconds = time.perf_counter() - started
+        results["noop_worker"] = {
+            "tasks": drained,
+            "seconds": round(seconds, 3),
+            "tasks_per_s": round(drained / seconds, 1),
+        }
+        results["queues"] = queue_stats()
+
+    for name, result in results.items():
+        if "count" in result:
+            command.stdout.write(format_summary(name, result))
+        elif name != "queues":
+            command.stdout.write(
+                f"{name:<24} tasks={result['tasks']} seconds={result['seconds']} "
+                f"tasks/s={result['tasks_per_s']}"
+            )
+    for name, stats in results["queues"].items():
+        command.stdout.write(
+            f"queue {name:<18} "
+            + " ".join(f"{key}={value}" for key, value in stats.items())
+        )
+    return results
@@ -0,0 +1,115 @@
+"""
+Request traces: one JSON object per line, replayed by the ``replay`` scenario
+
+    {"name": "list", "method": "GET", "path": "/properties/", "query": "page=2"}
+
+``name`` groups requests in reports, ``query`` is an encoded query string
+and ``method`` defaults to GET. This scenario samples a trace from a
+benchmark dataset: detail pages and locations are picked with skewed
+popularity, autocomplete queries are keystroke prefixes of location names.
+"""
+
+import json
+import random
+from urllib.parse import urlencode
+from django.urls import reverse
+from property.models import Location, Property
+from .utils import use_database
+
+help = "Write a seeded request trace (JSONL) sampled from a benchmark dataset"
+
+# Share of each endpoint in generated traces
+MIX = {"home": 10, "list": 35, "detail": 35, "autocomplete": 20}
+
+
+def read_trace(path):
+    """Yield the trace entries of the JSONL file at ``path``"""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                entry.setdefault("method", "GET")
+                entry.setdefault("query", "")
+                entry.setdefault("name", entry["path"])
+            except (ValueError, KeyError, AttributeError) as error:
+                raise ValueError(
+                    f"{path}:{line_number}: invalid trace entry"
+                ) from error
+            yield entry
+
+
+def write_trace(path, entries):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def add_arguments(parser):
+    parser.add_argument("--database", required=True, help="Benchmark SQLite file")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="trace.jsonl")
+
+
+def sample_entries(count, seed):
+    rng = random.Random(seed)
+    property_ids = list(Property.objects.order_by("pk").values_list("pk", flat=True))
+    locations = list(
+        Location.objects.filter(property_count__gt=0)
+        .order_by("-property_count")
+        .values_list("pk", "name", "city")
+    )
+    # Popularity falls off with rank, like real listing traffic
+    property_weights = [1 / (rank + 1) ** 0.8 for rank in range(len(property_ids))]
+    location_weights = [1 / (rank + 1) for rank in range(len(locations))]
+    shuffled_ids = property_ids[:]
+    rng.shuffle(shuffled_ids)
+
+    names = list(MIX)
+    for _ in range(count):
+        name = rng.choices(names, weights=list(MIX.values()))[0]
+        params = {}
+        if name == "home":
+            path = reverse("home")
+        elif name == "detail":
+            pk = rng.choices(shuffled_ids, weights=property_weights)[0]
+            path = reverse("property:property_detail", args=[pk])
+        elif name == "autocomplete":
+            path = reverse("autocomplete")
+            _, location_name, city = rng.choices(locations, weights=location_weights)[0]
+            text = rng.choice([location_name, city])
+            params["q"] = text[: rng.randint(1, min(len(text), 6))]
+        else:
+            path = reverse("property:property_list")
+            kind = rng.choices(
+                ["pages", "location", "facets", "search"], [40, 30, 15, 15]
+            )[0]
+            if kind == "location":
+                params["location"] = rng.choices(locations, weights=location_weights)[
+                    0
+                ][0]
+            elif kind == "facets":
+                params["type"] = rng.choice(["house", "apartment", "commercial"])
+                params["min_bedrooms"] = rng.randint(1, 4)
+            elif kind == "search":
+                params["q"] = rng.choice(
+                    ["villa", "modern apartment", "garden", "office"]
+                )
+            page = rng.choices([1, 2, 3, 4, 5], [50, 20, 15, 10, 5])[0]
+            if page > 1:
+                params["page"] = page
+        yield {"name": name, "method": "GET", "path": path, "query": urlencode(params)}
+
+
+def run(command, options):
+    with use_database(options["database"]):
+        entries = list(sample_entries(options["requests"], options["seed"]))
+    write_trace(options["output"], entries)
+    counts = {name: sum(e["name"] == name for e in entries) for name in MIX}
+    command.stdout.write(
+        f"Wrote {len(entries)} requests to {options['output']}: "
+        + ", ".join(f"{name} {count}" for name, count in counts.items())
+    )
+    return {"path": options["output"], "requests": len(entries), "mix": counts}
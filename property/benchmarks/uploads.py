@@ -0,0 +1,175 @@
+"""
+Resumable upload benchmark: streams a batch of large photos (500 MB by
+default) through the chunk endpoint as a server would, reading each request
+body from its socket, commits the batch and reports the traced memory peak
+of the whole run against a cap
+"""
+
+import io
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, override_settings
+from django.test.client import ClientHandler
+from django.urls import reverse
+from PIL import Image as PILImage
+from property.models import Property
+from .utils import scratch_database
+
+help = "Measure memory while uploading a large image batch in chunks"
+
+MB = 1024 * 1024
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--total-mb", type=int, default=500, help="Batch size (default: 500)"
+    )
+    parser.add_argument(
+        "--file-mb", type=int, default=10, help="Size of each photo (default: 10)"
+    )
+    parser.add_argument(
+        "--chunk-mb",
+        type=int,
+        default=settings.PROPERTY_UPLOAD_MAX_CHUNK // MB,
+        help="Bytes per chunk request (default: PROPERTY_UPLOAD_MAX_CHUNK)",
+    )
+    parser.add_argument(
+        "--memory-cap-mb",
+        type=float,
+        default=8,
+        help="Most traced memory the run may allocate (default: 8)",
+    )
+
+
+def write_photo(path, size):
+    """A JPEG padded with random bytes to ``size``, written 1 MB at a time"""
+    buffer = io.BytesIO()
+    PILImage.effect_noise((256, 256), 64).convert("RGB").save(buffer, "JPEG")
+    with open(path, "wb") as file:
+        file.write(buffer.getvalue())
+        remaining = size - buffer.tell()
+        while remaining > 0:
+            file.write(os.urandom(min(MB, remaining)))
+            remaining -= MB
+
+
+def put_chunk(handler, environ, url, file, first, length, total):
+    """PUT a chunk whose body the handler reads from ``file``, like a socket"""
+    file.seek(first)
+    response = handler(
+        {
+            **environ,
+            "REQUEST_METHOD": "PUT",
+            "PATH_INFO": url,
+            "QUERY_STRING": "",
+            "CONTENT_TYPE": "application/octet-stream",
+            "CONTENT_LENGTH": str(length),
+            "HTTP_CONTENT_RANGE": f"bytes {first}-{first + length - 1}/{total}",
+            "wsgi.input": file,
+        }
+    )
+    if response.status_code != 200:
+        raise AssertionError(f"Chunk failed with {response.status_code}")
+
+
+def run(command, options):
+    chunk = options["chunk_mb"] * MB
+    count = max(options["total_mb"] // options["file_mb"], 1)
+    size = options["file_mb"] * MB
+    directory = tempfile.TemporaryDirectory()
+    with (
+        directory,
+        scratch_database(),
+        override_settings(
+            MEDIA_ROOT=Path(directory.name) / "media",
+            PROPERTY_UPLOAD_DIR=Path(directory.name) / "uploads",
+            PROPERTY_UPLOAD_MAX_CHUNK=chunk,
+            PROPERTY_UPLOAD_MAX_SIZE=size,
+            ALLOWED_HOSTS=["testserver"],
+        ),
+    ):
+        command.stdout.write(f"Writing {count} photos of {options['file_mb']} MB...")
+        sources = []
+        for number in range(count):
+            sources.append(Path(directory.name) / f"photo-{number}.jpg")
+            write_photo(sources[-1], size)
+
+        client = Client()
+        client.force_login(
+            get_user_model().objects.create_superuser("bench", "", "bench")
+        )
+        listing = Property.objects.create(
+            title="Benchmark listing", price=1000, bedrooms=2, bathrooms=1
+        )
+        handler = ClientHandler(enforce_csrf_checks=False)
+        environ = client._base_environ()
+
+        command.stdout.write(
+            f"Uploading {count * size // MB} MB in {chunk // MB} MB chunks..."
+        )
+        tracemalloc.start()
+        started = time.perf_counter()
+        ids = []
+        for source in sources:
+            upload = client.post(
+                reverse("upload_sessions"),
+                {"property": listing.pk, "filename": source.name, "size": size},
+            ).json()
+            ids.append(upload["id"])
+            with open(source, "rb") as file:
+                for first in range(0, size, chunk):
+                    put_chunk(
+                        handler,
+                        environ,
+                        upload["url"],
+                        file,
+                        first,
+                        min(chunk, size - first),
+                        size,
+                    )
+        upload_seconds = time.perf_counter() - started
+        _, upload_peak = tracemalloc.get_traced_memory()
+
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        response = client.post(
+            reverse("property_images_api", args=[listing.pk]),
+            {"uploads": ids},
+            content_type="application/json",
+        )
+        commit_seconds = time.perf_counter() - started
+        _, commit_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if response.status_code != 201:
+            raise AssertionError(f"Commit failed with {response.status_code}")
+
+    peak = max(upload_peak, commit_peak) / MB
+    results = {
+        "files": count,
+        "megabytes": count * size // MB,
+        "chunk_mb": chunk // MB,
+        "upload_seconds": round(upload_seconds, 2),
+        "upload_mb_per_s": round(count * size / MB / upload_seconds, 1),
+        "commit_seconds": round(commit_seconds, 2),
+        "upload_peak_mb": round(upload_peak / MB, 2),
+        "commit_peak_mb": round(commit_peak / MB, 2),
+        "max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "memory_cap_mb": options["memory_cap_mb"],
+        "within_cap": peak <= options["memory_cap_mb"],
+    }
+    for name, value in results.items():
+        command.stdout.write(f"{name:<16} {value}")
+    if not results["within_cap"]:
+        command.stderr.write(
+            f"Traced memory peaked at {peak:.2f} MB, over the "
+            f"{options['memory_cap_mb']} MB cap"
+        )
+    return results
@@ -0,0 +1,116 @@
+"""
+Shared helpers for benchmark scenarios
+"""
+
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from django.db import connections, transaction
+from property.profiling import percentile
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def scratch_data(using="default"):
+    """
+    Run the block in a transaction that is always rolled back, so generated
+    benchmark data never reaches the working database.
+    """
+    try:
+        with transaction.atomic(using=using):
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def summarize(samples_ms):
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples_ms)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 4) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50), 4),
+        "p95_ms": round(percentile(ordered, 0.95), 4),
+        "p99_ms": round(percentile(ordered, 0.99), 4),
+        "max_ms": round(ordered[-1], 4) if ordered else 0.0,
+    }
+
+
+def time_calls(func, args_list):
+    """Call ``func`` once per item of ``args_list`` and return the latencies in ms"""
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def format_summary(label, summary):
+    return (
+        f"{label:<24} n={summary['count']:<6} mean={summary['mean_ms']:.3f}ms "
+        f"p50={summary['p50_ms']:.3f}ms p95={summary['p95_ms']:.3f}ms "
+        f"p99={summary['p99_ms']:.3f}ms"
+    )
+
+
+def same_file_aliases(alias="default"):
+    """``alias`` and the aliases opening the same database file, e.g. ``readonly``"""
+    name = connections.settings[alias]["NAME"]
+    return [
+        other
+        for other, settings_dict in connections.settings.items()
+        if other == alias or settings_dict["NAME"] == name
+    ]
+
+
+@contextmanager
+def scratch_database(alias="default"):
+    """
+    Point ``alias`` at a freshly migrated temporary SQLite file for the
+    duration of the block. Unlike ``scratch_data`` writes really commit, so
+    per-transaction costs such as fsync are measured.
+    """
+    connection = connections[alias]
+    directory = tempfile.mkdtemp(prefix="property-bench-")
+    test_settings = connection.settings_dict["TEST"]
+    previous_test_name = test_settings.get("NAME")
+    test_settings["NAME"] = os.path.join(directory, "bench.sqlite3")
+    mirrors = [other for other in same_file_aliases(alias) if other != alias]
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        with use_database(test_settings["NAME"], *mirrors):
+            yield test_settings["NAME"]
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings["NAME"] = previous_test_name
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def use_database(path, *aliases):
+    """
+    Point ``aliases`` (by default ``default`` and the aliases sharing its
+    file) at the SQLite file ``path`` for the duration of the block, in
+    every thread. The file is created by ``migrate`` if needed.
+    """
+    aliases = aliases or same_file_aliases()
+    previous = {alias: connections.settings[alias]["NAME"] for alias in aliases}
+    connections.close_all()
+    for alias in aliases:
+        connections.settings[alias]["NAME"] = str(path)
+    try:
+        yield path
+    finally:
+        connections.close_all()
+        for alias, name in previous.items():
+            connections.settings[alias]["NAME"] = name
@@ -0,0 +1,318 @@
+"""
+Cache Helpers Module
+Versioned cache namespaces: bumping a namespace's version orphans every key
+built under it, so writes invalidate derived data without tracking keys
+"""
+
+import time
+from calendar import timegm
+from datetime import datetime
+from functools import wraps
+from hashlib import md5
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+
+# Namespace of everything derived from the properties table (facet counts)
+PROPERTIES = "properties"
+
+# Namespace of rendered HTML: full pages and property cards, which also show
+# images and locations
+PAGES = "pages"
+
+# Version of the locations and their counters, which each process's in-memory
+# autocomplete index compares with the version it was built from
+LOCATIONS = "locations"
+
+# Names of the caches whose hits and misses are counted
+STATS = ("page", "card", "facets")
+
+
+def _version_key(namespace):
+    return f"property:version:{namespace}"
+
+
+def namespace_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # A fresh clock-based version never revives keys from before an
+        # eviction of the version itself
+        cache.add(_version_key(namespace), time.time_ns(), None)
+        version = cache.get(_version_key(namespace), 0)
+    return version
+
+
+async def anamespace_version(namespace):
+    """``namespace_version`` for async code"""
+    version = await cache.aget(_version_key(namespace))
+    if version is None:
+        await cache.aadd(_version_key(namespace), time.time_ns(), None)
+        version = await cache.aget(_version_key(namespace), 0)
+    return version
+
+
+def cache_is_shared():
+    """
+    Whether other processes see this one's namespace bumps: false for the
+    per-process local memory cache
+    """
+    return not isinstance(caches["default"], LocMemCache)
+
+
+def bump_namespace(*namespaces):
+    for namespace in namespaces:
+        bump_version(namespace)
+
+
+def bump_version(namespace):
+    """Bump ``namespace`` and return its new version"""
+    try:
+        return cache.incr(_version_key(namespace))
+    except ValueError:
+        version = time.time_ns()
+        cache.set(_version_key(namespace), version, None)
+        return version
+
+
+def _versioned_key(namespace, version, parts):
+    digest = md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f"property:{namespace}:{version}:{digest}"
+
+
+def namespaced_key(namespace, *parts):
+    return _versioned_key(namespace, namespace_version(namespace), parts)
+
+
+async def anamespaced_key(namespace, *parts):
+    """``namespaced_key`` for async code"""
+    return _versioned_key(namespace, await anamespace_version(namespace), parts)
+
+
+async def anamespaced_keys(namespace, parts_list):
+    """Keys of several ``parts`` tuples, reading the version once"""
+    version = await anamespace_version(namespace)
+    return [_versioned_key(namespace, version, parts) for parts in parts_list]
+
+
+# Hit/miss counters, kept in the cache itself so every process adds to them
+
+
+def _stat_key(name, outcome):
+    return f"property:stats:{name}:{outcome}"
+
+
+def record_access(name, hit, count=1):
+    if not settings.PROPERTY_CACHE_STATS or not count:
+        return
+    key = _stat_key(name, "hits" if hit else "misses")
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, count, None)
+
+
+async def arecord_access(name, hit, count=1):
+    """``record_access`` for async code"""
+    if not settings.PROPERTY_CACHE_STATS or not count:
+        return
+    key = _stat_key(name, "hits" if hit else "misses")
+    await cache.aadd(key, 0, None)
+    try:
+        await cache.aincr(key, count)
+    except ValueError:
+        await cache.aset(key, count, None)
+
+
+def cache_stats():
+    """``{name: {"hits", "misses", "hit_ratio"}}`` for every counted cache"""
+    keys = [
+        _stat_key(name, outcome) for name in STATS for outcome in ("hits", "misses")
+    ]
+    values = cache.get_many(keys)
+    stats = {}
+    for name in STATS:
+        hits = values.get(_stat_key(name, "hits"), 0)
+        misses = values.get(_stat_key(name, "misses"), 0)
+        total = hits + misses
+        stats[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many(
+        [_stat_key(name, outcome) for name in STATS for outcome in ("hits", "misses")]
+    )
+
+
+def _page_cacheable(request, user):
+    return (
+        settings.PROPERTY_PAGE_CACHE_TIMEOUT
+        and request.method in ("GET", "HEAD")
+        and not user.is_authenticated
+    )
+
+
+def _storable(response):
+    return (
+        response.status_code == 200 and not response.streaming and not response.cookies
+    )
+
+
+def cache_anonymous_page(view):
+    """
+    Cache the full response of ``view`` for anonymous GET requests, keyed on
+    the absolute URL under the ``PAGES`` namespace, and report the outcome
+    in an ``X-Cache`` header. Responses setting cookies are not cached.
+    Async views are wrapped in an async wrapper.
+    """
+    if iscoroutinefunction(view):
+        return _cache_anonymous_async_page(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _page_cacheable(request, request.user):
+            return view(request, *args, **kwargs)
+
+        key = namespaced_key(PAGES, "page", request.build_absolute_uri())
+        response = cache.get(key)
+        if response is not None:
+            record_access("page", hit=True)
+            response["X-Cache"] = "HIT"
+            return response
+
+        record_access("page", hit=False)
+        response = view(request, *args, **kwargs)
+        if _storable(response):
+            cache.set(key, response, settings.PROPERTY_PAGE_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
+
+
+def _cache_anonymous_async_page(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # auser() also loads the session, so nothing later touches the
+        # session store synchronously
+        if not _page_cacheable(request, await request.auser()):
+            return await view(request, *args, **kwargs)
+
+        key = await anamespaced_key(PAGES, "page", request.build_absolute_uri())
+        response = await cache.aget(key)
+        if response is not None:
+            await arecord_access("page", hit=True)
+            response["X-Cache"] = "HIT"
+            return response
+
+        await arecord_access("page", hit=False)
+        response = await view(request, *args, **kwargs)
+        if _storable(response):
+            await cache.aset(key, response, settings.PROPERTY_PAGE_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
+
+
+# Conditional GET: pages answer If-None-Match/If-Modified-Since from the
+# timestamps they are built from, before rendering
+
+
+def page_validators(stamps):
+    """
+    ``(etag, last_modified)`` of a page built from ``stamps``, a tuple of
+    ids, counts and datetimes that changes whenever the page would: a weak
+    ETag hashing all of them and the latest datetime as a timestamp
+    """
+    digest = md5(repr(stamps).encode(), usedforsecurity=False).hexdigest()
+    times = [stamp for stamp in stamps if isinstance(stamp, datetime)]
+    last_modified = timegm(max(times).utctimetuple()) if times else None
+    return f'W/"{digest}"', last_modified
+
+
+def _conditional_response(request, stamps):
+    if stamps is None:
+        return None, None
+    etag, last_modified = page_validators(stamps)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return response, (etag, last_modified)
+
+
+def _patch_page_headers(response, validators, user):
+    if validators is not None and response.status_code in (200, 304):
+        etag, last_modified = validators
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+    if response.status_code in (200, 304):
+        # Shared caches may keep what anonymous visitors see; signed-in
+        # users' copies stay in their browser and are revalidated each time
+        if user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=settings.PROPERTY_PAGE_MAX_AGE
+            )
+    patch_vary_headers(response, ["Cookie"])
+    return response
+
+
+def conditional_page(validators):
+    """
+    Answer conditional GET requests for the decorated view with 304 Not
+    Modified before it runs. ``validators(request, *args, **kwargs)``
+    returns the stamps of the data the page shows (see
+    ``page_validators``), or None to skip the check, e.g. for a missing
+    listing; it is awaited for async views. Responses get the ETag,
+    Last-Modified, Cache-Control and Vary headers. Apply it inside
+    ``cache_anonymous_page`` so cached pages keep their validators.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                stamps = await validators(request, *args, **kwargs)
+                response, page = _conditional_response(request, stamps)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _patch_page_headers(response, page, await request.auser())
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            stamps = validators(request, *args, **kwargs)
+            response, page = _conditional_response(request, stamps)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _patch_page_headers(response, page, request.user)
+
+        return wrapper
+
+    return decorator
+
+
+def cache_publicly(response, max_age):
+    """Let browsers and shared caches keep ``response`` for ``max_age`` seconds"""
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
@@ -0,0 +1,26 @@
+"""
+SQLite Connection Setup
+Applies the tuning PRAGMAs and marks read-only aliases as each connection
+is created
+"""
+
+from django.conf import settings
+
+
+def sqlite_pragmas(alias):
+    """PRAGMAs for a new SQLite connection to ``alias``, in order"""
+    pragmas = {}
+    if settings.PROPERTY_SQLITE_TUNING:
+        pragmas.update(settings.PROPERTY_SQLITE_PRAGMAS)
+    if alias in settings.PROPERTY_READ_DATABASES:
+        pragmas["query_only"] = "on"
+    return pragmas
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """``connection_created`` receiver"""
+    if connection.vendor != "sqlite":
+        return
+    # On the raw connection, so the PRAGMAs never count against a request
+    for name, value in sqlite_pragmas(connection.alias).items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
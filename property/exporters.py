@@ -0,0 +1,162 @@
+"""
+Streaming export of properties to CSV or NDJSON
+Rows are read with ``values_list().iterator()`` in chunks and written out in
+buffered blocks, optionally gzipped, so memory stays flat however many
+listings are exported
+"""
+
+import csv
+import io
+import zlib
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from . import geo
+from .filters import PropertyFilterForm
+from .models import Property
+
+# Output column -> lookup. The CSV reads back with import_properties.
+COLUMNS = {
+    "id": "pk",
+    "external_id": "external_id",
+    "title": "title",
+    "description": "description",
+    "property_type": "property_type",
+    "status": "status",
+    "price": "price",
+    "bedrooms": "bedrooms",
+    "bathrooms": "bathrooms",
+    "location": "location__name",
+    "city": "location__city",
+    "state": "location__state",
+    "country": "location__country",
+    "latitude": "location__latitude",
+    "longitude": "location__longitude",
+    "primary_image": "primary_image_path",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Rows fetched from the database per round trip
+DEFAULT_CHUNK_SIZE = 2000
+
+# Encoded output is handed on in blocks of about this many bytes
+BLOCK_SIZE = 64 * 1024
+
+
+def filtered_properties(params):
+    """
+    Properties matching the list page's filter parameters (``type``,
+    ``status``, ``min_price``, ``max_price``, ``min_bedrooms``, ``location``
+    and ``near``/``radius``). Unlike the pages, invalid values raise
+    ``ValidationError`` instead of being ignored, so an export never
+    silently widens.
+    """
+    form = PropertyFilterForm(params)
+    if not form.is_valid():
+        raise ValidationError({field: errors for field, errors in form.errors.items()})
+    properties = form.filter(Property.objects.all())
+
+    location = (params.get("location") or "").strip()
+    if location:
+        if not location.isdigit():
+            raise ValidationError({"location": ["Enter a location id."]})
+        properties = properties.filter(location_id=location)
+
+    if params.get("near"):
+        near = geo.parse_near(
+            params,
+            settings.PROPERTY_GEO_DEFAULT_RADIUS_KM,
+            settings.PROPERTY_GEO_MAX_RADIUS_KM,
+        )
+        if near is None:
+            raise ValidationError({"near": ["Enter latitude,longitude."]})
+        properties = properties.within_radius(*near)
+    return properties
+
+
+def _value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+class PropertyExport:
+    """
+    Iterate over the encoded export of ``properties`` in ``format`` ("csv"
+    or "ndjson") as bytes blocks; ``rows`` counts the listings written so
+    far
+    """
+
+    def __init__(
+        self, properties, format="csv", compress=False, chunk_size=DEFAULT_CHUNK_SIZE
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown export format: {format}")
+        self.properties = properties
+        self.format = format
+        self.compress = compress
+        self.chunk_size = chunk_size
+        self.rows = 0
+
+    @property
+    def content_type(self):
+        return "application/gzip" if self.compress else FORMATS[self.format]
+
+    @property
+    def filename(self):
+        return f"properties.{self.format}" + (".gz" if self.compress else "")
+
+    def values(self):
+        """Row tuples in ``COLUMNS`` order, by id, a chunk at a time"""
+        rows = (
+            self.properties.with_primary_image()
+            .order_by("pk")
+            .values_list(*COLUMNS.values())
+            .iterator(chunk_size=self.chunk_size)
+        )
+        image = list(COLUMNS).index("primary_image")
+        for row in rows:
+            self.rows += 1
+            row = [_value(value) for value in row]
+            if row[image]:
+                row[image] = default_storage.url(row[image])
+            yield row
+
+    def lines(self):
+        """Encoded text blocks of about ``BLOCK_SIZE`` bytes"""
+        buffer = io.StringIO()
+        if self.format == "csv":
+            writer = csv.writer(buffer)
+            write = writer.writerow
+            writer.writerow(COLUMNS)
+        else:
+            encoder = DjangoJSONEncoder()
+            columns = list(COLUMNS)
+
+            def write(row):
+                buffer.write(encoder.encode(dict(zip(columns, row))))
+                buffer.write("\n")
+
+        for row in self.values():
+            write(row)
+            if buffer.tell() >= BLOCK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    def __iter__(self):
+        if not self.compress:
+            yield from self.lines()
+            return
+        # wbits 31: gzip container, so the output is a .gz file
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for block in self.lines():
+            if compressed := compressor.compress(block):
+                yield compressed
+        yield compressor.flush()
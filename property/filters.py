@@ -0,0 +1,360 @@
+"""
+Property Filters Module
+Filters the property list by type, status, price and bedrooms, and counts
+the listings behind every facet value
+"""
+
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from .cache import (
+    PAGES,
+    PROPERTIES,
+    anamespaced_key,
+    arecord_access,
+    namespaced_key,
+    record_access,
+)
+from .models import Location, Property
+
+# (min, max) price ranges, max exclusive
+PRICE_BUCKETS = [
+    (None, 100_000),
+    (100_000, 250_000),
+    (250_000, 500_000),
+    (500_000, 1_000_000),
+    (1_000_000, None),
+]
+
+# "N+ bedrooms" thresholds
+BEDROOM_BUCKETS = [1, 2, 3, 4]
+
+
+def price_label(low, high):
+    if low is None:
+        return f"Under ${high:,}"
+    if high is None:
+        return f"${low:,}+"
+    return f"${low:,} - ${high:,}"
+
+
+def price_condition(low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+class PropertyFilterForm(forms.Form):
+    """
+    Validates the filter query parameters; invalid values are ignored
+    rather than failing the page.
+    """
+
+    type = forms.ChoiceField(choices=Property.PROPERTY_TYPES, required=False)
+    status = forms.ChoiceField(choices=Property.STATUS_CHOICES, required=False)
+    min_price = forms.DecimalField(min_value=0, required=False)
+    max_price = forms.DecimalField(min_value=0, required=False)
+    min_bedrooms = forms.IntegerField(min_value=0, required=False)
+
+    def conditions(self):
+        """Active filters as ``{facet: Q}``"""
+        self.is_valid()
+        data = getattr(self, "cleaned_data", {})
+        conditions = {}
+        if data.get("type"):
+            conditions["property_type"] = Q(property_type=data["type"])
+        if data.get("status"):
+            conditions["status"] = Q(status=data["status"])
+        if data.get("min_price") is not None or data.get("max_price") is not None:
+            conditions["price"] = price_condition(
+                data.get("min_price"), data.get("max_price")
+            )
+        if data.get("min_bedrooms"):
+            conditions["bedrooms"] = Q(bedrooms__gte=data["min_bedrooms"])
+        return conditions
+
+    def filter(self, queryset):
+        return queryset.filter(*self.conditions().values())
+
+
+def facet_buckets():
+    """
+    ``{facet: [(value, label, condition, params)]}``, where ``params`` are
+    the query parameters selecting that value.
+    """
+    return {
+        "property_type": [
+            (value, label, Q(property_type=value), {"type": value})
+            for value, label in Property.PROPERTY_TYPES
+        ],
+        "status": [
+            (value, label, Q(status=value), {"status": value})
+            for value, label in Property.STATUS_CHOICES
+        ],
+        "bedrooms": [
+            (str(beds), f"{beds}+", Q(bedrooms__gte=beds), {"min_bedrooms": beds})
+            for beds in BEDROOM_BUCKETS
+        ],
+        "price": [
+            (
+                f"{'' if low is None else low}-{'' if high is None else high}",
+                price_label(low, high),
+                price_condition(low, high),
+                {"min_price": low, "max_price": high},
+            )
+            for low, high in PRICE_BUCKETS
+        ],
+    }
+
+
+def _facet_queries(queryset, conditions):
+    """
+    ``(facets, queryset, aggregates)`` per group of facets sharing the same
+    filters; the group without an excluded filter also counts the total.
+    """
+    buckets = facet_buckets()
+    groups = {}
+    for facet in buckets:
+        groups.setdefault(facet if facet in conditions else None, []).append(facet)
+
+    for excluded, facets in groups.items():
+        aggregates = {
+            f"{facet}__{index}": Count("pk", filter=condition)
+            for facet in facets
+            for index, (_, _, condition, _) in enumerate(buckets[facet])
+        }
+        if excluded is None:
+            aggregates["total"] = Count("pk")
+        group = queryset.filter(
+            *[q for facet, q in conditions.items() if facet != excluded]
+        ).order_by()
+        yield facets, group, aggregates
+
+
+def _collect_counts(counts, facets, values):
+    buckets = facet_buckets()
+    for facet in facets:
+        for index, (value, _, _, _) in enumerate(buckets[facet]):
+            counts[facet][value] = values[f"{facet}__{index}"]
+
+
+def count_facets(queryset, conditions):
+    """
+    Count listings per facet value. Each facet is counted with every filter
+    applied except its own, so the alternatives to a selected value stay
+    visible. Facets sharing the same filters are counted in one aggregate
+    query: at most one query per active filter plus one.
+    """
+    counts = {facet: {} for facet in facet_buckets()}
+    total = None
+    for facets, group, aggregates in _facet_queries(queryset, conditions):
+        values = group.aggregate(**aggregates)
+        _collect_counts(counts, facets, values)
+        total = values.get("total", total)
+
+    if total is None:
+        total = queryset.filter(*conditions.values()).order_by().count()
+    return {"total": total, "counts": counts}
+
+
+async def acount_facets(queryset, conditions):
+    """``count_facets`` with the async ORM"""
+    counts = {facet: {} for facet in facet_buckets()}
+    total = None
+    for facets, group, aggregates in _facet_queries(queryset, conditions):
+        values = await group.aaggregate(**aggregates)
+        _collect_counts(counts, facets, values)
+        total = values.get("total", total)
+
+    if total is None:
+        total = await queryset.filter(*conditions.values()).order_by().acount()
+    return {"total": total, "counts": counts}
+
+
+def _facets_key_parts(queryset, conditions):
+    sql, params = queryset.order_by().query.sql_with_params()
+    return (
+        "facets",
+        sql,
+        params,
+        sorted((facet, str(q)) for facet, q in conditions.items()),
+    )
+
+
+def _facets_key(queryset, conditions):
+    return namespaced_key(PROPERTIES, *_facets_key_parts(queryset, conditions))
+
+
+def cached_facets(queryset, conditions, timeout=None):
+    """
+    ``count_facets`` cached per filter combination; any property write
+    bumps the namespace version and so invalidates every combination.
+    """
+    if queryset.query.is_empty():
+        # Nothing to count, e.g. a search without matches
+        return count_facets(queryset, conditions)
+    if timeout is None:
+        timeout = settings.PROPERTY_FACET_CACHE_TIMEOUT
+    key = _facets_key(queryset, conditions)
+    facets = cache.get(key)
+    record_access("facets", hit=facets is not None)
+    if facets is None:
+        facets = count_facets(queryset, conditions)
+        cache.set(key, facets, timeout)
+    return facets
+
+
+async def acached_facets(queryset, conditions, timeout=None):
+    """``cached_facets`` for async views"""
+    if queryset.query.is_empty():
+        return await acount_facets(queryset, conditions)
+    if timeout is None:
+        timeout = settings.PROPERTY_FACET_CACHE_TIMEOUT
+    key = await anamespaced_key(PROPERTIES, *_facets_key_parts(queryset, conditions))
+    facets = await cache.aget(key)
+    await arecord_access("facets", hit=facets is not None)
+    if facets is None:
+        facets = await acount_facets(queryset, conditions)
+        await cache.aset(key, facets, timeout)
+    return facets
+
+
+def with_location_counts(facets, location, conditions):
+    """
+    ``facets`` of the listings at ``location`` with the total and status
+    counts read from the location's materialized counters, which property
+    writes keep current, when no facet filter applies; the other buckets
+    stay as cached
+    """
+    if conditions:
+        return facets
+    available = location.available_property_count
+    return {
+        **facets,
+        "total": location.property_count,
+        "counts": {
+            **facets["counts"],
+            "status": {
+                "available": available,
+                "rented": location.property_count - available,
+            },
+        },
+    }
+
+
+def _stamps_key(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    return namespaced_key(PAGES, "stamps", sql, params)
+
+
+async def _astamps_key(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    return await anamespaced_key(PAGES, "stamps", sql, params)
+
+
+def count_stamps(queryset):
+    """
+    Stamps (see ``cache.page_validators``) of a listing page showing
+    ``queryset``: its latest ``updated_at`` and its size, which deletions
+    change, and the latest location update. The latest updates are index
+    lookups.
+    """
+    queryset = queryset.order_by()
+    return (
+        queryset.aggregate(updated=Max("updated_at"))["updated"],
+        queryset.count(),
+        Location.objects.aggregate(updated=Max("updated_at"))["updated"],
+    )
+
+
+async def acount_stamps(queryset):
+    """``count_stamps`` for async views"""
+    queryset = queryset.order_by()
+    return (
+        (await queryset.aaggregate(updated=Max("updated_at")))["updated"],
+        await queryset.acount(),
+        (await Location.objects.aaggregate(updated=Max("updated_at")))["updated"],
+    )
+
+
+def cached_stamps(queryset, timeout=None):
+    """
+    ``count_stamps`` cached like the facet counts, under the ``PAGES``
+    namespace that image and location writes bump too
+    """
+    if queryset.query.is_empty():
+        return count_stamps(queryset)
+    if timeout is None:
+        timeout = settings.PROPERTY_FACET_CACHE_TIMEOUT
+    key = _stamps_key(queryset)
+    stamps = cache.get(key)
+    if stamps is None:
+        stamps = count_stamps(queryset)
+        cache.set(key, stamps, timeout)
+    return stamps
+
+
+async def acached_stamps(queryset, timeout=None):
+    """``cached_stamps`` for async views"""
+    if queryset.query.is_empty():
+        return await acount_stamps(queryset)
+    if timeout is None:
+        timeout = settings.PROPERTY_FACET_CACHE_TIMEOUT
+    key = await _astamps_key(queryset)
+    stamps = await cache.aget(key)
+    if stamps is None:
+        stamps = await acount_stamps(queryset)
+        await cache.aset(key, stamps, timeout)
+    return stamps
+
+
+FACET_LABELS = {
+    "property_type": "Type",
+    "status": "Status",
+    "bedrooms": "Bedrooms",
+    "price": "Price",
+}
+
+
+def _bound(value):
+    return "" if value is None else format(value.normalize(), "f")
+
+
+def facet_links(facets, form):
+    """
+    Facets shaped for templates: ``[(label, [{label, count, params,
+    selected}])]``. The params of a selected value clear it.
+    """
+    form.is_valid()
+    data = getattr(form, "cleaned_data", {})
+    selected = {
+        "property_type": data.get("type") or None,
+        "status": data.get("status") or None,
+        "bedrooms": str(data["min_bedrooms"]) if data.get("min_bedrooms") else None,
+        "price": (
+            f"{_bound(data.get('min_price'))}-{_bound(data.get('max_price'))}"
+            if data.get("min_price") is not None or data.get("max_price") is not None
+            else None
+        ),
+    }
+    return [
+        (
+            FACET_LABELS[facet],
+            [
+                {
+                    "label": label,
+                    "count": facets["counts"][facet].get(value, 0),
+                    "selected": value == selected[facet],
+                    "params": (
+                        dict.fromkeys(params) if value == selected[facet] else params
+                    ),
+                }
+                for value, label, _, params in buckets
+            ],
+        )
+        for facet, buckets in facet_buckets().items()
+    ]
@@ -0,0 +1,185 @@
+"""
+Geospatial helpers
+Geohash encoding, bounding-box coverings for geohash range scans, distances
+and parsing of ``near``/``bbox`` query parameters
+"""
+
+import math
+from django.db.models import Q
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+PRECISION = 12
+
+EARTH_RADIUS_KM = 6371.0088
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """Geohash of a point"""
+    south, north, west, east = -90.0, 90.0, -180.0, 180.0
+    code = []
+    bits = value = 0
+    even = True
+    while len(code) < precision:
+        if even:
+            middle = (west + east) / 2
+            value = value * 2 + (longitude >= middle)
+            west, east = (middle, east) if longitude >= middle else (west, middle)
+        else:
+            middle = (south + north) / 2
+            value = value * 2 + (latitude >= middle)
+            south, north = (middle, north) if latitude >= middle else (south, middle)
+        even = not even
+        bits += 1
+        if bits == 5:
+            code.append(BASE32[value])
+            bits = value = 0
+    return "".join(code)
+
+
+def cell_size(precision):
+    """``(height, width)`` in degrees of a geohash cell"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180 / 2**lat_bits, 360 / 2**lng_bits
+
+
+def _cells(south, west, north, east, precision):
+    height, width = cell_size(precision)
+    rows = range(int((south + 90) // height), int((north + 90) // height) + 1)
+    columns = range(int((west + 180) // width), int((east + 180) // width) + 1)
+    return rows, columns
+
+
+def covering(south, west, north, east, max_cells=16):
+    """
+    The geohashes, at the finest precision needing at most ``max_cells``
+    cells, of the cells that cover a bounding box
+    """
+    precision = 1
+    for candidate in range(PRECISION, 0, -1):
+        rows, columns = _cells(south, west, north, east, candidate)
+        if len(rows) * len(columns) <= max_cells:
+            precision = candidate
+            break
+    height, width = cell_size(precision)
+    rows, columns = _cells(south, west, north, east, precision)
+    return sorted(
+        {
+            encode(
+                min((row + 0.5) * height - 90, 90.0),
+                min((column + 0.5) * width - 180, 180.0),
+                precision,
+            )
+            for row in rows
+            for column in columns
+        }
+    )
+
+
+def successor(code):
+    """The geohash after ``code`` at its precision, or None after the last one"""
+    for position in range(len(code) - 1, -1, -1):
+        index = BASE32.index(code[position])
+        if index < len(BASE32) - 1:
+            return (
+                code[:position] + BASE32[index + 1] + "0" * (len(code) - 1 - position)
+            )
+    return None
+
+
+def prefix_ranges(codes):
+    """Sorted geohash prefixes as ``(low, high)`` ranges, adjacent ones merged"""
+    ranges = []
+    for code in codes:
+        if ranges and ranges[-1][1] == code:
+            ranges[-1][1] = successor(code)
+        else:
+            ranges.append([code, successor(code)])
+    return [tuple(bounds) for bounds in ranges]
+
+
+def bbox_condition(south, west, north, east, prefix=""):
+    """
+    ``Q`` matching locations inside a bounding box: geohash range scans on
+    the indexed ``geohash`` column narrow it to a few cells, then the
+    coordinates are compared exactly. ``prefix`` reaches a related location,
+    e.g. ``"location__"``. Boxes crossing the antimeridian are not supported.
+    """
+    cells = Q()
+    for low, high in prefix_ranges(covering(south, west, north, east)):
+        cell = Q(**{f"{prefix}geohash__gte": low})
+        if high is not None:
+            cell &= Q(**{f"{prefix}geohash__lt": high})
+        cells |= cell
+    return cells & Q(
+        **{
+            f"{prefix}latitude__range": (south, north),
+            f"{prefix}longitude__range": (west, east),
+        }
+    )
+
+
+def bbox_around(latitude, longitude, radius_km):
+    """``(south, west, north, east)`` of the box around a circle"""
+    delta_lat = radius_km / KM_PER_DEGREE
+    delta_lng = radius_km / (
+        KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+    )
+    return (
+        max(latitude - delta_lat, -90.0),
+        max(longitude - delta_lng, -180.0),
+        min(latitude + delta_lat, 90.0),
+        min(longitude + delta_lng, 180.0),
+    )
+
+
+def haversine_km(latitude1, longitude1, latitude2, longitude2):
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(longitude2 - longitude1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _floats(value, count):
+    try:
+        numbers = [float(part) for part in value.split(",")]
+    except (AttributeError, ValueError):
+        return None
+    if len(numbers) != count or not all(map(math.isfinite, numbers)):
+        return None
+    return numbers
+
+
+def parse_near(params, default_radius_km, max_radius_km):
+    """
+    ``(latitude, longitude, radius_km)`` from ``near=lat,lng&radius=km``
+    query parameters, or None when absent or invalid
+    """
+    point = _floats(params.get("near"), 2)
+    if point is None:
+        return None
+    latitude, longitude = point
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    radius = _floats(params.get("radius", str(default_radius_km)), 1)
+    if radius is None or radius[0] <= 0:
+        return None
+    return latitude, longitude, min(radius[0], max_radius_km)
+
+
+def parse_bbox(value):
+    """``(south, west, north, east)`` from ``south,west,north,east``, or None"""
+    bbox = _floats(value, 4)
+    if bbox is None:
+        return None
+    south, west, north, east = bbox
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        return None
+    return south, west, north, east
@@ -0,0 +1,389 @@
+"""
+Bulk import of properties from CSV feeds
+Streams rows, validates them in batches and writes each batch in one transaction
+"""
+
+import csv
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from .autocomplete import location_index
+from .cache import LOCATIONS, PAGES, PROPERTIES, bump_namespace
+from .models import FeedCard, Location, Property, PropertyNeighbours
+from .search import get_search_backend
+
+REQUIRED_COLUMNS = [
+    "title",
+    "description",
+    "property_type",
+    "status",
+    "price",
+    "bedrooms",
+    "bathrooms",
+]
+
+# Columns overwritten when an upsert matches an existing external_id
+UPSERT_FIELDS = [*REQUIRED_COLUMNS, "location", "updated_at"]
+
+DEFAULT_SHARD_SIZE = 8 * 1024 * 1024
+
+# Optional columns used to resolve (or create) the property's location
+LOCATION_COLUMNS = {
+    "location": "name",
+    "city": "city",
+    "state": "state",
+    "country": "country",
+}
+
+
+def read_csv_feed(file):
+    """
+    Check the header of an open CSV file and return ``(fieldnames, rows)``,
+    where ``rows`` lazily yields ``(line_number, row)`` pairs.
+    """
+    reader = csv.DictReader(file)
+    fieldnames = reader.fieldnames or []
+    if not all(column in fieldnames for column in REQUIRED_COLUMNS):
+        raise ValueError(f'CSV must contain columns: {", ".join(REQUIRED_COLUMNS)}')
+
+    def rows():
+        for row in reader:
+            yield reader.line_num, row
+
+    return fieldnames, rows()
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _clean_fields(model, row, columns):
+    values = {}
+    errors = {}
+    for column, field_name in columns.items():
+        model_field = model._meta.get_field(field_name)
+        raw = (row.get(column) or "").strip()
+        if not raw and model_field.has_default():
+            values[field_name] = model_field.get_default()
+            continue
+        try:
+            values[field_name] = model_field.clean(raw, None)
+        except ValidationError as error:
+            errors[column] = error.messages
+    if errors:
+        raise ValidationError(errors)
+    return values
+
+
+def clean_row(row):
+    """
+    Validate a CSV row with the model fields' own validation.
+    Returns ``(property_values, location_key)``; ``location_key`` is None
+    when the row carries no location.
+    """
+    values = _clean_fields(
+        Property, row, {column: column for column in REQUIRED_COLUMNS}
+    )
+    external_id = (row.get("external_id") or "").strip()
+    if external_id:
+        values.update(_clean_fields(Property, row, {"external_id": "external_id"}))
+    if not (row.get("location") or "").strip():
+        return values, None
+    location = _clean_fields(Location, row, LOCATION_COLUMNS)
+    return values, (
+        location["name"],
+        location["city"],
+        location["state"],
+        location["country"],
+    )
+
+
+def validate_batch(batch):
+    """
+    Split ``(line_number, row)`` pairs into cleaned rows and rejects, the
+    latter as ``(line_number, row, error_message)``.
+    """
+    valid = []
+    rejects = []
+    for line_number, row in batch:
+        try:
+            valid.append(clean_row(row))
+        except ValidationError as error:
+            rejects.append((line_number, row, format_errors(error)))
+    return valid, rejects
+
+
+def _rebatch(valid, rejects, size):
+    yield valid[:size], rejects
+    for start in range(size, len(valid), size):
+        yield valid[start : start + size], []
+
+
+def shard_ranges(path, shard_size):
+    """
+    Split the data lines of a CSV file into byte ranges of roughly
+    ``shard_size`` bytes, each ending on a newline. Records must not contain
+    embedded newlines. Returns ``(header_line, ranges)``.
+    """
+    total = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as file:
+        header = file.readline()
+        start = file.tell()
+        while start < total:
+            file.seek(min(start + shard_size, total))
+            if file.tell() < total:
+                file.readline()
+            end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return header.decode("utf-8"), ranges
+
+
+def parse_shard(path, header, start, end):
+    """
+    Worker entry point: parse and validate one byte range. Line numbers in
+    the result are relative to the shard; the line count is returned so the
+    writer can make them absolute.
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        text = file.read(end - start).decode("utf-8")
+    reader = csv.DictReader(io.StringIO(header + text))
+    valid, rejects = validate_batch((reader.line_num, row) for row in reader)
+    return valid, rejects, text.count("\n")
+
+
+def _setup_worker():
+    import django
+
+    django.setup()
+
+
+def parse_shards(path, workers, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Yield ``(valid, rejects)`` per shard in file order, with absolute line
+    numbers, while at most ``2 * workers`` shards are in flight.
+    """
+    header, ranges = shard_ranges(path, shard_size)
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    pending = deque()
+    lines_before = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        ranges = iter(ranges)
+        while True:
+            while len(pending) < 2 * workers and (shard := next(ranges, None)):
+                pending.append(pool.submit(parse_shard, path, header, *shard))
+            if not pending:
+                break
+            valid, rejects, line_count = pending.popleft().result()
+            # Shard line numbers count the header as line 1, like the file's
+            yield valid, [
+                (lines_before + line_number, row, error)
+                for line_number, row, error in rejects
+            ]
+            lines_before += line_count
+
+
+def format_errors(error):
+    if hasattr(error, "message_dict"):
+        return "; ".join(
+            f"{column}: {' '.join(messages)}"
+            for column, messages in error.message_dict.items()
+        )
+    return " ".join(error.messages)
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    updated: int = 0
+    rejected: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    location_ids: set = field(default_factory=set)
+
+    @property
+    def rows(self):
+        return self.imported + self.rejected
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class RejectWriter:
+    """CSV writer for rejected rows, opened lazily on the first reject"""
+
+    def __init__(self, path, fieldnames):
+        self.path = path
+        self.fieldnames = list(fieldnames) + ["line", "error"]
+        self._file = None
+        self._writer = None
+
+    def write(self, line_number, row, error):
+        if self.path is None:
+            return
+        if self._writer is None:
+            self._file = open(self.path, "w", encoding="utf-8", newline="")
+            self._writer = csv.DictWriter(
+                self._file, fieldnames=self.fieldnames, extrasaction="ignore"
+            )
+            self._writer.writeheader()
+        self._writer.writerow({**row, "line": line_number, "error": error})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class BulkPropertyImporter:
+    """
+    Imports validated rows with ``bulk_create``, one transaction per batch.
+
+    Rows carrying an ``external_id`` are upserted on that key; when a key
+    repeats within a feed the last row in file order wins. Locations are
+    resolved by ``(name, city, country)`` and created in bulk when missing.
+    Since ``bulk_create`` bypasses signals, each batch is indexed for search
+    and gets its feed cards explicitly, and location counters are reconciled
+    and the autocomplete index, cached facet counts and pages are dropped
+    once the import finishes.
+    When similar listings are in use, their update is queued as a task.
+    """
+
+    def __init__(self, batch_size=1000, rejects=None, on_batch=None):
+        self.batch_size = batch_size
+        self.rejects = rejects
+        self.on_batch = on_batch
+        self._location_ids = {}
+
+    def run(self, rows):
+        """Import ``(line_number, row)`` pairs in the current process"""
+        return self._import(
+            validate_batch(batch) for batch in batched(rows, self.batch_size)
+        )
+
+    def run_parallel(self, path, workers, shard_size=DEFAULT_SHARD_SIZE):
+        """
+        Parse and validate byte-range shards of the CSV file at ``path`` in
+        a pool of ``workers`` processes; this process remains the only writer
+        and applies shard results in file order.
+        """
+        return self._import(
+            chunk
+            for valid, rejects in parse_shards(path, workers, shard_size)
+            for chunk in _rebatch(valid, rejects, self.batch_size)
+        )
+
+    def _import(self, validated_batches):
+        result = ImportResult()
+        started = time.perf_counter()
+        for valid, rejects in validated_batches:
+            result.rejected += len(rejects)
+            if self.rejects is not None:
+                for line_number, row, error in rejects:
+                    self.rejects.write(line_number, row, error)
+            if valid:
+                self.write(valid, result)
+            result.batches += 1
+            result.seconds = time.perf_counter() - started
+            if self.on_batch:
+                self.on_batch(result)
+
+        self.finish(result.location_ids)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def write(self, valid, result):
+        """Insert or upsert one batch of cleaned rows in a transaction"""
+        with transaction.atomic():
+            self._resolve_locations({key for _, key in valid if key})
+            keyed = {}
+            plain = []
+            for values, key in valid:
+                listing = Property(location_id=self._location_ids.get(key), **values)
+                if listing.external_id:
+                    keyed.pop(listing.external_id, None)
+                    keyed[listing.external_id] = listing
+                else:
+                    plain.append(listing)
+
+            if keyed:
+                existing = list(
+                    Property.objects.filter(external_id__in=keyed).values_list(
+                        "location_id", flat=True
+                    )
+                )
+                result.location_ids.update(filter(None, existing))
+                result.updated += len(existing)
+                Property.objects.bulk_create(
+                    keyed.values(),
+                    update_conflicts=True,
+                    unique_fields=["external_id"],
+                    update_fields=UPSERT_FIELDS,
+                )
+            Property.objects.bulk_create(plain)
+            Property.objects.filter(
+                pk__in=[listing.pk for listing in [*keyed.values(), *plain]]
+            ).sync_coordinates()
+            get_search_backend().index_properties(
+                listing.pk for listing in [*keyed.values(), *plain]
+            )
+            FeedCard.objects.refresh(
+                listing.pk for listing in [*keyed.values(), *plain]
+            )
+
+        result.imported += len(valid)
+        result.location_ids.update(
+            listing.location_id
+            for listing in [*keyed.values(), *plain]
+            if listing.location_id
+        )
+
+    def finish(self, location_ids):
+        """Bring derived data back in sync after the bulk writes"""
+        for chunk in batched(sorted(location_ids), 500):
+            Location.objects.filter(pk__in=chunk).reconcile_property_counts()
+        location_index.invalidate()
+        bump_namespace(PROPERTIES, PAGES, LOCATIONS)
+        if PropertyNeighbours.objects.exists():
+            from .tasks import update_similar_properties
+
+            update_similar_properties.enqueue()
+
+    def _resolve_locations(self, keys):
+        missing = keys - self._location_ids.keys()
+        if not missing:
+            return
+        self._load_locations(missing)
+        to_create = {
+            key: Location(name=key[0], city=key[1], state=key[2], country=key[3])
+            for key in missing
+            if key not in self._location_ids
+        }
+        if to_create:
+            Location.objects.bulk_create(to_create.values(), ignore_conflicts=True)
+            self._load_locations(to_create.keys())
+
+    def _load_locations(self, keys):
+        wanted = {(name, city, country) for name, city, _, country in keys}
+        by_identity = {
+            (name, city, country): pk
+            for name, city, country, pk in Location.objects.filter(
+                name__in={name for name, _, _ in wanted}
+            ).values_list("name", "city", "country", "pk")
+            if (name, city, country) in wanted
+        }
+        for key in keys:
+            pk = by_identity.get((key[0], key[1], key[3]))
+            if pk is not None:
+                self._location_ids[key] = pk
@@ -0,0 +1,45 @@
+"""
+Management command to build the location autocomplete index
+Usage: python manage.py autocomplete_index [--query <text> ...]
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from property.autocomplete import location_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the in-memory location autocomplete index and report its size. "
+        "Web processes build their own copy lazily on the first lookup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--query",
+            action="append",
+            default=[],
+            help="Run a lookup against the fresh index (may be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        location_index.build()
+        elapsed = (time.perf_counter() - started) * 1000
+
+        stats = location_index.stats()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {stats['locations']} locations "
+                f"({stats['ranked']} with properties, {stats['grams']} grams, "
+                f"{stats['postings']} postings) in {elapsed:.1f} ms"
+            )
+        )
+
+        for query in options["query"]:
+            started = time.perf_counter()
+            results = location_index.search(query)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f"\n{query!r}: {len(results)} results in {elapsed:.3f} ms")
+            for entry in results:
+                self.stdout.write(f"  {entry.full_address} ({entry.property_count})")
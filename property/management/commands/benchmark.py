@@ -0,0 +1,32 @@
+"""
+Management command to run benchmark scenarios
+Usage: python manage.py benchmark <scenario> [options] [--json results.json]
+"""
+
+import importlib
+import json
+from django.core.management.base import BaseCommand
+from property.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Run a benchmark scenario against generated data"
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="scenario", required=True)
+        for name, module_path in SCENARIOS.items():
+            module = importlib.import_module(module_path)
+            subparser = subparsers.add_parser(name, help=module.help)
+            module.add_arguments(subparser)
+            subparser.add_argument(
+                "--json", dest="json_path", help="Write the results to this JSON file"
+            )
+
+    def handle(self, *args, **options):
+        module = importlib.import_module(SCENARIOS[options["scenario"]])
+        results = module.run(self, options)
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump({"scenario": options["scenario"], **results}, f, indent=2)
+                f.write("\n")
+            self.stdout.write(f"Results written to {options['json_path']}")
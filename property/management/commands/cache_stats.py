@@ -0,0 +1,35 @@
+"""
+Management command to show cache hit/miss counters
+Usage: python manage.py cache_stats [--reset]
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from property.cache import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show hit/miss counters of the page, card and facet caches. With the "
+        "local-memory cache every process counts separately; use a file or "
+        "Redis cache (CACHE_DIR / REDIS_URL) to see the counters of a server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Reset the counters to zero"
+        )
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Cache counters reset"))
+            return
+
+        backend = settings.CACHES["default"]["BACKEND"].rsplit(".", 1)[-1]
+        self.stdout.write(f"Cache backend: {backend}")
+        for name, stats in cache_stats().items():
+            self.stdout.write(
+                f"{name:<8} hits={stats['hits']:<8} misses={stats['misses']:<8} "
+                f"hit ratio={stats['hit_ratio']:.1%}"
+            )
@@ -0,0 +1,48 @@
+"""
+Management command to delete image files no listing uses any more
+Usage: python manage.py gc_media [--grace <hours>] [--dry-run]
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from property.storage import collect_garbage
+from property.uploads import purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the references of content-addressed image files, then delete "
+        "the files (and renditions) no image has used for the grace period, "
+        "including files left by failed uploads, and abandoned resumable "
+        "uploads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=float,
+            default=24,
+            help="Hours a file must have been unreferenced (default: 24)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        if options["grace"] < 0:
+            raise CommandError("--grace must not be negative")
+        stats = collect_garbage(
+            timedelta(hours=options["grace"]), dry_run=options["dry_run"]
+        )
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        if not options["dry_run"]:
+            expired = purge_expired()
+            self.stdout.write(f"Deleted {expired} expired upload sessions")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {stats['blobs']} unreferenced and {stats['orphans']} "
+                f"orphaned files ({stats['bytes']} bytes)"
+            )
+        )
@@ -0,0 +1,108 @@
+"""
+Management command to generate sized renditions of property images
+Usage: python manage.py generate_renditions [--workers N] [--force]
+"""
+
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from property.cache import PAGES, bump_namespace
+from property.importers import batched
+from property.models import FeedCard, Image
+from property.renditions import available_formats, render_images
+
+RESULT_FIELDS = ["width", "height", "renditions", "renditions_generated_at"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate resized renditions for images that have none yet. Progress is "
+        "saved after every batch, so an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes rendering images (default: number of CPUs)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Images saved per transaction (default: 50)",
+        )
+        parser.add_argument("--limit", type=int, help="Stop after this many images")
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Mark every image as pending first, e.g. after changing widths",
+        )
+
+    def handle(self, *args, **options):
+        for option in ["workers", "batch_size"]:
+            if options[option] < 1:
+                raise CommandError(
+                    f"--{option.replace('_', '-')} must be a positive integer"
+                )
+        if options["force"]:
+            Image.objects.update(renditions_generated_at=None)
+
+        pending = Image.objects.filter(renditions_generated_at__isnull=True).exclude(
+            image=""
+        )
+        total = pending.count()
+        if options["limit"] is not None:
+            total = min(total, options["limit"])
+        self.stdout.write(
+            f"Rendering {total} images as {', '.join(available_formats())} "
+            f"with {options['workers']} workers"
+        )
+
+        # Materialize the job list so the pending query is not open while
+        # batches are written
+        jobs = list(pending.order_by("pk").values_list("pk", "image")[:total])
+        started = time.perf_counter()
+        done = failed = 0
+        for batch in batched(
+            render_images(jobs, options["workers"]), options["batch_size"]
+        ):
+            images = []
+            for image_id, result, error in batch:
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f"Image {image_id}: {error}"))
+                    continue
+                width, height, renditions = result
+                images.append(
+                    Image(
+                        pk=image_id,
+                        width=width,
+                        height=height,
+                        renditions=renditions,
+                        renditions_generated_at=timezone.now(),
+                    )
+                )
+            with transaction.atomic():
+                Image.objects.bulk_update(images, RESULT_FIELDS)
+            # bulk_update bypasses the signals that refresh the feed cards
+            # and invalidate cached pages
+            FeedCard.objects.refresh(
+                Image.objects.filter(pk__in=[image.pk for image in images]).values_list(
+                    "property_id", flat=True
+                )
+            )
+            bump_namespace(PAGES)
+            done += len(images)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{done + failed}/{total} images ({failed} failed), "
+                f"{(done + failed) / elapsed:.1f} images/s"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rendered {done} images, {failed} failed")
+        )
@@ -1,11 +1,20 @@
 """
 Management command to import properties from CSV file
-Usage: python manage.py import_properties <csv_file_path>
+Usage: python manage.py import_properties <csv_file_path> [--bulk] [--workers N]
+       [--enqueue]
 """
 
 import csv
+import os
 from django.core.management.base import BaseCommand, CommandError
+from property.importers import (
+    REQUIRED_COLUMNS,
+    BulkPropertyImporter,
+    RejectWriter,
+    read_csv_feed,
+)
 from property.models import Property
+from property.tasks import import_properties
 
 
 class Command(BaseCommand):
@@ -15,24 +24,67 @@ class Command(BaseCommand):
         parser.add_argument(
             "csv_file", type=str, help="Path to the CSV file containing property data"
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help=(
+                "Stream the file and write validated rows with bulk_create, one "
+                "transaction per batch. Also resolves location/city/state/country "
+                "columns to Location rows."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows per batch in --bulk mode (default: 1000)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=(
+                "Parse and validate the file in this many processes (implies "
+                "--bulk); records must not contain embedded newlines"
+            ),
+        )
+        parser.add_argument(
+            "--shard-size",
+            type=int,
+            default=8,
+            help="Size in MiB of the byte-range shards handed to workers (default: 8)",
+        )
+        parser.add_argument(
+            "--rejects",
+            type=str,
+            help=(
+                "CSV file receiving rejected rows in --bulk mode "
+                "(default: <csv_file>.rejects.csv)"
+            ),
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help=(
+                "Queue a --bulk import of the file for the task workers and "
+                "return; the workers must be able to read the path"
+            ),
+        )
 
     def handle(self, *args, **options):
         csv_file = options["csv_file"]
 
+        if options["enqueue"]:
+            return self.enqueue(csv_file, options)
+        if options["bulk"] or options["workers"] > 1:
+            return self.handle_bulk(csv_file, options)
+
         try:
             with open(csv_file, "r", encoding="utf-8") as file:
                 reader = csv.DictReader(file)
 
                 # Validate required columns
-                required_columns = [
-                    "title",
-                    "description",
-                    "property_type",
-                    "status",
-                    "price",
-                    "bedrooms",
-                    "bathrooms",
-                ]
+                required_columns = REQUIRED_COLUMNS
 
                 if not all(col in reader.fieldnames for col in required_columns):
                     raise CommandError(
@@ -79,3 +131,74 @@ class Command(BaseCommand):
             raise CommandError(f"CSV file not found: {csv_file}")
         except Exception as e:
             raise CommandError(f"Error reading CSV file: {str(e)}")
+
+    def check_bulk_options(self, options):
+        for option in ["batch_size", "workers", "shard_size"]:
+            if options[option] < 1:
+                raise CommandError(
+                    f"--{option.replace('_', '-')} must be a positive integer"
+                )
+
+    def handle_bulk(self, csv_file, options):
+        self.check_bulk_options(options)
+        rejects_path = options["rejects"] or f"{csv_file}.rejects.csv"
+
+        try:
+            with open(csv_file, "r", encoding="utf-8", newline="") as file:
+                try:
+                    fieldnames, rows = read_csv_feed(file)
+                except ValueError as e:
+                    raise CommandError(str(e))
+
+                rejects = RejectWriter(rejects_path, fieldnames)
+                importer = BulkPropertyImporter(
+                    batch_size=options["batch_size"],
+                    rejects=rejects,
+                    on_batch=self.report_batch,
+                )
+                try:
+                    if options["workers"] > 1:
+                        result = importer.run_parallel(
+                            csv_file,
+                            options["workers"],
+                            options["shard_size"] * 1024 * 1024,
+                        )
+                    else:
+                        result = importer.run(rows)
+                finally:
+                    rejects.close()
+        except FileNotFoundError:
+            raise CommandError(f"CSV file not found: {csv_file}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nImport completed: {result.imported} successful "
+                f"({result.updated} updated), {result.rejected} errors "
+                f"in {result.seconds:.1f}s "
+                f"({result.rows_per_second:,.0f} rows/s)"
+            )
+        )
+        if result.rejected:
+            self.stdout.write(
+                self.style.WARNING(f"Rejected rows written to {rejects_path}")
+            )
+
+    def enqueue(self, csv_file, options):
+        self.check_bulk_options(options)
+        if not os.path.isfile(csv_file):
+            raise CommandError(f"CSV file not found: {csv_file}")
+        result = import_properties.enqueue(
+            os.path.abspath(csv_file),
+            batch_size=options["batch_size"],
+            rejects=options["rejects"] and os.path.abspath(options["rejects"]),
+            workers=options["workers"],
+            shard_size=options["shard_size"] * 1024 * 1024,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Import queued as task {result.id}"))
+
+    def report_batch(self, result):
+        self.stdout.write(
+            f"Batch {result.batches}: {result.rows} rows "
+            f"({result.imported} imported, {result.rejected} rejected), "
+            f"{result.rows_per_second:,.0f} rows/s"
+        )
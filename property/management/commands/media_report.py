@@ -0,0 +1,44 @@
+"""
+Management command to report duplicate image files and the bytes saved
+Usage: python manage.py media_report [--path <directory>]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from property.storage import dedup_report, image_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Report duplicate files in the media directory (renditions excluded), "
+        "i.e. the bytes content-addressing would save on it, and the bytes "
+        "the content-addressed image files already save by being shared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            help="Directory to scan (default: the image storage's location)",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or image_storage().location
+        try:
+            report = dedup_report(path)
+        except OSError as error:
+            raise CommandError(f"Could not scan {path}: {error}")
+        self.stdout.write(
+            f"{path}: {report['files']} files, {report['bytes']} bytes; "
+            f"hashed {report['hashed']} with a shared size"
+        )
+        share = report["duplicate_bytes"] / report["bytes"] if report["bytes"] else 0
+        self.stdout.write(
+            f"Duplicates: {report['duplicate_files']} files, "
+            f"{report['duplicate_bytes']} bytes ({share:.1%}) would be saved"
+        )
+        self.stdout.write(
+            f"Content-addressed: {report['blob_count']} blobs "
+            f"({report['blob_unreferenced']} unreferenced), "
+            f"{report['blob_stored']} bytes stored for "
+            f"{report['blob_referenced']} referenced, "
+            f"{report['blob_saved']} bytes saved"
+        )
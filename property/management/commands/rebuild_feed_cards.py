@@ -0,0 +1,37 @@
+"""
+Management command to rebuild the denormalized listing cards
+Usage: python manage.py rebuild_feed_cards [--property <id> ...] [--enqueue]
+"""
+
+from django.core.management.base import BaseCommand
+from property.tasks import rebuild_feed_cards
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the feed cards the home page and listing cards render from. "
+        "Run after writes that bypass signals, or after changing MEDIA_URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--property",
+            type=int,
+            action="append",
+            dest="properties",
+            help="Only rebuild the card of the given property id (may be repeated)",
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Queue the rebuild for the task workers and return",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue"]:
+            result = rebuild_feed_cards.enqueue(options["properties"])
+            self.stdout.write(self.style.SUCCESS(f"Queued as task {result.id}"))
+            return
+
+        built = rebuild_feed_cards.call(options["properties"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {built} feed cards"))
@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the property full-text search index
+Usage: python manage.py rebuild_search_index
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from property.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from the properties table"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.perf_counter()
+        with transaction.atomic():
+            indexed = backend.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {indexed} properties with {type(backend).__name__} "
+                f"in {elapsed:.2f}s"
+            )
+        )
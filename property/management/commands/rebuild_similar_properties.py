@@ -0,0 +1,53 @@
+"""
+Management command to build the similar listings of each property
+Usage: python manage.py rebuild_similar_properties [--full] [--text]
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from property import similarity
+from property.cache import PAGES, bump_namespace
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the nearest available listings of each property for the detail "
+        "page. By default only listings added or changed since the last run, "
+        "and those whose neighbours they affect, are recomputed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute every listing instead of the changed ones",
+        )
+        parser.add_argument(
+            "--neighbours",
+            type=int,
+            help="Neighbours stored per listing "
+            "(default: PROPERTY_SIMILARITY_NEIGHBOURS)",
+        )
+        parser.add_argument(
+            "--text",
+            action="store_true",
+            default=None,
+            help="Compare descriptions too (default: PROPERTY_SIMILARITY_TEXT)",
+        )
+
+    def handle(self, *args, **options):
+        if options["neighbours"] is not None and options["neighbours"] < 1:
+            raise CommandError("--neighbours must be a positive integer")
+        build = similarity.rebuild if options["full"] else similarity.update
+        started = time.perf_counter()
+        try:
+            updated = build(options["neighbours"], options["text"])
+        except similarity.SimilarityUnavailable as error:
+            raise CommandError(str(error)) from error
+        bump_namespace(PAGES)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Computed neighbours of {updated} properties in {elapsed:.2f}s"
+            )
+        )
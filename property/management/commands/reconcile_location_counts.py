@@ -0,0 +1,37 @@
+"""
+Management command to recompute materialized location property counters
+Usage: python manage.py reconcile_location_counts [--location <id> ...] [--enqueue]
+"""
+
+from django.core.management.base import BaseCommand
+from property.tasks import reconcile_location_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Location.property_count and available_property_count from "
+        "the properties table. Run after bulk writes that bypass signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--location",
+            type=int,
+            action="append",
+            dest="locations",
+            help="Only reconcile the given location id (may be repeated)",
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Queue the reconciliation for the task workers and return",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue"]:
+            result = reconcile_location_counts.enqueue(options["locations"])
+            self.stdout.write(self.style.SUCCESS(f"Queued as task {result.id}"))
+            return
+
+        updated = reconcile_location_counts.call(options["locations"])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} locations"))
@@ -0,0 +1,147 @@
+"""
+Management command to run background task workers
+Usage: python manage.py run_workers [--workers N] [--queue <name> ...] [--burst]
+"""
+
+import logging
+import multiprocessing
+import signal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.tasks import task_backends
+from property.cache import cache_is_shared
+from property.queue import DatabaseBackend, Worker
+
+logger = logging.getLogger("property.queue")
+
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+def _run_worker(backend, queues, burst):
+    """Run a worker until a stop signal, letting its current task finish"""
+    worker = Worker(backend, queues)
+    previous = {
+        signum: signal.signal(signum, lambda *args: worker.stop())
+        for signum in STOP_SIGNALS
+    }
+    try:
+        return worker.run(burst)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background tasks from the database queue in a pool of worker "
+        "processes, each one task at a time. SIGINT/SIGTERM let running tasks "
+        "finish; a worker that dies is replaced and its task is taken over "
+        "once the visibility timeout expires."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Worker processes (default: 1, in this process)",
+        )
+        parser.add_argument(
+            "--queue",
+            action="append",
+            dest="queues",
+            help="Only run tasks of this queue (may be repeated; default: all)",
+        )
+        parser.add_argument(
+            "--backend", default="default", help="TASKS alias (default: default)"
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no task is due instead of waiting for more",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be a positive integer")
+        backend = task_backends[options["backend"]]
+        if not isinstance(backend, DatabaseBackend):
+            raise CommandError(
+                f"TASKS[{options['backend']!r}] is not a "
+                "property.queue.DatabaseBackend; its tasks do not need workers"
+            )
+        if not cache_is_shared():
+            # Tasks bump the page, facet and autocomplete versions, which the
+            # web processes would never see
+            raise CommandError(
+                "The default cache is per-process memory, so the web "
+                "processes would keep serving what the tasks invalidate. "
+                "Set CACHE_DIR or REDIS_URL for the workers and the web "
+                "server."
+            )
+        unknown = set(options["queues"] or []) - backend.queues
+        if unknown:
+            raise CommandError(f"Unknown queues: {', '.join(sorted(unknown))}")
+        queues = sorted(options["queues"] or backend.queues)
+
+        # Task outcomes, also from the forked workers
+        handler = logging.StreamHandler(self.stdout)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        handler.setLevel(logging.INFO if options["verbosity"] > 0 else logging.ERROR)
+        level = logger.level
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        try:
+            self.run(queues, options)
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+
+    def run(self, queues, options):
+        if options["workers"] == 1:
+            self.stdout.write(f"Running tasks of {', '.join(queues)}")
+            processed = _run_worker(options["backend"], queues, options["burst"])
+            self.stdout.write(self.style.SUCCESS(f"Ran {processed} tasks"))
+            return
+        self.stdout.write(
+            f"Running tasks of {', '.join(queues)} in {options['workers']} "
+            "worker processes"
+        )
+        self.run_pool(options["backend"], queues, options)
+
+    def run_pool(self, backend, queues, options):
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        stopping = []
+
+        def stop(signum, frame):
+            stopping.append(signum)
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        def start():
+            process = multiprocessing.Process(
+                target=_run_worker, args=(backend, queues, options["burst"])
+            )
+            process.start()
+            return process
+
+        processes = [start() for _ in range(options["workers"])]
+        for signum in STOP_SIGNALS:
+            signal.signal(signum, stop)
+        while processes:
+            for index, process in enumerate(processes):
+                process.join(timeout=1)
+                if process.is_alive() or process.exitcode is None:
+                    continue
+                if process.exitcode and not (stopping or options["burst"]):
+                    self.stderr.write(
+                        f"Worker {process.pid} exited with {process.exitcode}, "
+                        "restarting it"
+                    )
+                    processes[index] = start()
+                else:
+                    processes[index] = None
+            processes = [process for process in processes if process]
+        self.stdout.write(self.style.SUCCESS("Workers stopped"))
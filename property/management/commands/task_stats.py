@@ -0,0 +1,55 @@
+"""
+Management command to show the depth and latency of the task queues
+Usage: python manage.py task_stats [--window <minutes>] [--purge <days>]
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from property.queue import purge_finished, queue_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show queued tasks per queue and state, the age of the oldest due task "
+        "and wait/run time percentiles of recently finished tasks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window",
+            type=float,
+            default=60,
+            help="Minutes of finished tasks the latencies cover (default: 60)",
+        )
+        parser.add_argument(
+            "--purge",
+            type=float,
+            metavar="DAYS",
+            help="Delete tasks that finished more than this many days ago",
+        )
+
+    def handle(self, *args, **options):
+        if options["purge"] is not None:
+            if options["purge"] < 0:
+                raise CommandError("--purge must not be negative")
+            deleted = purge_finished(timedelta(days=options["purge"]))
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} finished tasks"))
+            return
+
+        stats = queue_stats(timedelta(minutes=options["window"]))
+        if not stats:
+            self.stdout.write("No tasks")
+        for name, queue in sorted(stats.items()):
+            oldest = queue["oldest_due_s"]
+            line = (
+                f"{name:<10} due={queue['due']:<6} scheduled={queue['scheduled']:<6} "
+                f"running={queue['running']:<4} failed={queue['failed']:<6} "
+                f"successful={queue['successful']:<8} oldest due="
+                + ("-" if oldest is None else f"{oldest:.1f}s")
+            )
+            if "finished" in queue:
+                line += (
+                    f" wait p50={queue['wait_p50_ms']}ms p95={queue['wait_p95_ms']}ms"
+                    f" run p50={queue['run_p50_ms']}ms p95={queue['run_p95_ms']}ms"
+                )
+            self.stdout.write(line)
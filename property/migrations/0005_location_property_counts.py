@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_property_counts(apps, schema_editor):
+    Location = apps.get_model('property', 'Location')
+    Property = apps.get_model('property', 'Property')
+
+    def counted(**filters):
+        return Coalesce(
+            Subquery(
+                Property.objects.filter(location=OuterRef('pk'), **filters)
+                .order_by()
+                .values('location')
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            0,
+        )
+
+    Location.objects.update(
+        property_count=counted(),
+        available_property_count=counted(status='available'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0004_alter_location_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='available_property_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='available properties'),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='property_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='properties'),
+        ),
+        migrations.RunPython(backfill_property_counts, migrations.RunPython.noop),
+    ]
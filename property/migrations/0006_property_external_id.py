@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0005_location_property_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="external_id",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True, unique=True
+            ),
+        ),
+    ]
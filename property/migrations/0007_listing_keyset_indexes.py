@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0006_property_external_id"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="property",
+            name="property_pr_created_82f744_idx",
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="property_pr_created_964c11_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["location", "-created_at", "-id"],
+                name="property_pr_locatio_6d7275_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Full-text index for property search (SQLite FTS5 backend)
+
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS property_search USING fts5("
+        "title, description, location, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO property_search (rowid, title, description, location) "
+        "SELECT p.id, p.title, p.description, "
+        "COALESCE(l.name || ' ' || l.city || ' ' || l.state || ' ' || l.country, '') "
+        "FROM property_property p "
+        "LEFT JOIN property_location l ON l.id = p.location_id"
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS property_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0007_listing_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
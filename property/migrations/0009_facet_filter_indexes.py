@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0008_property_search_fts5"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["status", "property_type", "price"],
+                name="property_pr_status_b1ab20_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["property_type", "price"], name="property_pr_propert_1d6c23_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["bedrooms", "price"], name="property_pr_bedroom_2dc7d3_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0009_facet_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="height",
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="image",
+            name="renditions",
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name="image",
+            name="renditions_generated_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="image",
+            name="width",
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0010_image_renditions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MapCell",
+            fields=[
+                (
+                    "geohash",
+                    models.CharField(max_length=5, primary_key=True, serialize=False),
+                ),
+                ("listings", models.PositiveIntegerField()),
+                ("locations", models.PositiveIntegerField()),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+            ],
+            options={
+                "verbose_name": "Map cell",
+                "verbose_name_plural": "Map cells",
+            },
+        ),
+        migrations.AddField(
+            model_name="location",
+            name="geohash",
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name="location",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="location",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(
+                fields=["geohash", "latitude", "longitude", "property_count"],
+                name="location_geohash_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mapcell",
+            name="location",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="property.location",
+            ),
+        ),
+    ]
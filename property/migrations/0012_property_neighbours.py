@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0011_location_geo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PropertyNeighbours",
+            fields=[
+                (
+                    "property",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="neighbours",
+                        serialize=False,
+                        to="property.property",
+                    ),
+                ),
+                ("ids", models.BinaryField()),
+                ("radius", models.FloatField()),
+                ("built_at", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name": "Property neighbours",
+                "verbose_name_plural": "Property neighbours",
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0012_property_neighbours"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(fields=["updated_at"], name="location_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["updated_at"], name="property_pr_updated_2f0fd7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["location", "updated_at"], name="property_pr_locatio_2f5ebc_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0013_page_validator_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QueuedTask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task_path", models.CharField(max_length=255)),
+                ("queue_name", models.CharField(max_length=100)),
+                ("priority", models.SmallIntegerField(default=0)),
+                ("args", models.JSONField(default=list)),
+                ("kwargs", models.JSONField(default=dict)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("READY", "Ready"),
+                            ("RUNNING", "Running"),
+                            ("FAILED", "Failed"),
+                            ("SUCCESSFUL", "Successful"),
+                        ],
+                        default="READY",
+                        max_length=10,
+                    ),
+                ),
+                ("run_after", models.DateTimeField(blank=True, null=True)),
+                (
+                    "enqueued_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("last_attempted_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("locked_until", models.DateTimeField(blank=True, null=True)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("worker_ids", models.JSONField(default=list)),
+                ("errors", models.JSONField(default=list)),
+                ("return_value", models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Queued task",
+                "verbose_name_plural": "Queued tasks",
+                "ordering": ["-enqueued_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "queue_name", "-priority", "id"],
+                        name="queuedtask_claim_idx",
+                    ),
+                    models.Index(
+                        fields=["finished_at"], name="queuedtask_finished_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def demote_extra_primaries(apps, schema_editor):
+    """Keep the first primary image of each listing in display order"""
+    Image = apps.get_model("property", "Image")
+    first_primary = Image.objects.filter(
+        property=OuterRef("property"), is_primary=True
+    ).order_by("order", "-uploaded_at", "pk")
+    Image.objects.filter(is_primary=True).exclude(
+        pk=Subquery(first_primary.values("pk")[:1])
+    ).update(is_primary=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0014_queued_task"),
+    ]
+
+    operations = [
+        migrations.RunPython(demote_extra_primaries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="image",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_primary", True)),
+                fields=("property",),
+                name="image_one_primary_per_property",
+                violation_error_message="A property can only have one primary image.",
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:36
+
+import property.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0015_image_one_primary_per_property"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("size", models.PositiveBigIntegerField()),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Media blob",
+                "verbose_name_plural": "Media blobs",
+            },
+        ),
+        migrations.AlterField(
+            model_name="image",
+            name="image",
+            field=models.ImageField(
+                storage=property.storage.image_storage, upload_to="property_images/"
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0017_upload_sessions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedCard",
+            fields=[
+                (
+                    "property",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="feed_card",
+                        serialize=False,
+                        to="property.property",
+                    ),
+                ),
+                ("status", models.CharField(max_length=20)),
+                ("created_at", models.DateTimeField()),
+                ("title", models.CharField(max_length=255)),
+                ("location", models.CharField(blank=True, max_length=500)),
+                ("price", models.CharField(max_length=32)),
+                ("bedrooms", models.PositiveIntegerField()),
+                ("bathrooms", models.PositiveIntegerField()),
+                ("picture", models.JSONField(null=True)),
+            ],
+            options={
+                "verbose_name": "Feed card",
+                "verbose_name_plural": "Feed cards",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["status", "-created_at", "-id"],
+                name="property_pr_status_7f1aad_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="feedcard",
+            index=models.Index(
+                fields=["status", "-created_at", "-property"],
+                name="property_fe_status_fb66cf_idx",
+            ),
+        ),
+    ]
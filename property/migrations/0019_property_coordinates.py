@@ -0,0 +1,88 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:08
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Substr
+
+# property.models.map_cell.CELL_PRECISION when this migration was written
+CELL_PRECISION = 5
+
+
+def copy_location_coordinates(apps, schema_editor):
+    Location = apps.get_model("property", "Location")
+    Property = apps.get_model("property", "Property")
+
+    location = Location.objects.filter(pk=OuterRef("location_id"))
+    Property.objects.update(
+        latitude=Subquery(location.values("latitude")[:1]),
+        longitude=Subquery(location.values("longitude")[:1]),
+        geohash=Coalesce(Subquery(location.values("geohash")[:1]), Value("")),
+    )
+
+
+def fill_map_cells(apps, schema_editor):
+    Location = apps.get_model("property", "Location")
+    MapCell = apps.get_model("property", "MapCell")
+
+    rows = (
+        Location.objects.filter(property_count__gt=0)
+        .exclude(geohash="")
+        .annotate(cell=Substr("geohash", 1, CELL_PRECISION))
+        .values("cell")
+        .annotate(
+            listings=Sum("property_count"),
+            locations=Count("pk"),
+            latitude=Avg("latitude"),
+            longitude=Avg("longitude"),
+            location=Min("pk"),
+        )
+        .order_by()
+    )
+    MapCell.objects.all().delete()
+    MapCell.objects.bulk_create(
+        [
+            MapCell(
+                geohash=row["cell"],
+                listings=row["listings"],
+                locations=row["locations"],
+                latitude=row["latitude"],
+                longitude=row["longitude"],
+                location_id=row["location"],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0018_feed_cards"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="geohash",
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="latitude",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="longitude",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["geohash", "latitude", "longitude"], name="property_geohash_idx"
+            ),
+        ),
+        migrations.RunPython(copy_location_coordinates, migrations.RunPython.noop),
+        migrations.RunPython(fill_map_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:19
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def stamp_unreferenced_blobs(apps, schema_editor):
+    # When they became unreferenced is unknown: the grace period starts now
+    MediaBlob = apps.get_model("property", "MediaBlob")
+    MediaBlob.objects.filter(ref_count=0).update(unreferenced_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0019_property_coordinates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mediablob",
+            name="unreferenced_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(stamp_unreferenced_blobs, migrations.RunPython.noop),
+    ]
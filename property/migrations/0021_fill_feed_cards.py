@@ -0,0 +1,74 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:21
+
+from itertools import batched
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+from property.renditions import picture
+from property.storage import image_storage
+
+# property.models.property.PRIMARY_IMAGE_ORDERING and
+# property.models.feed_card.CHUNK when this migration was written
+PRIMARY_IMAGE_ORDERING = ["-is_primary", "order", "-uploaded_at"]
+CHUNK = 500
+
+
+def fill_feed_cards(apps, schema_editor):
+    FeedCard = apps.get_model("property", "FeedCard")
+    Image = apps.get_model("property", "Image")
+    Property = apps.get_model("property", "Property")
+
+    primary = Image.objects.filter(property=OuterRef("pk")).order_by(
+        *PRIMARY_IMAGE_ORDERING
+    )
+    listings = (
+        Property.objects.order_by("pk")
+        .select_related("location")
+        .annotate(
+            primary_image_path=Subquery(primary.values("image")[:1]),
+            primary_image_renditions=Subquery(
+                primary.values("renditions")[:1], output_field=models.JSONField()
+            ),
+        )
+    )
+    storage = image_storage()
+    FeedCard.objects.all().delete()
+    for chunk in batched(listings.iterator(chunk_size=CHUNK), CHUNK):
+        cards = []
+        for listing in chunk:
+            location = listing.location
+            path = listing.primary_image_path
+            cards.append(
+                FeedCard(
+                    property_id=listing.pk,
+                    status=listing.status,
+                    created_at=listing.created_at,
+                    title=listing.title,
+                    location=(
+                        f"{location.name}, {location.city}, {location.country}"
+                        if location
+                        else ""
+                    ),
+                    price=f"${listing.price:,.2f}",
+                    bedrooms=listing.bedrooms,
+                    bathrooms=listing.bathrooms,
+                    picture=(
+                        picture(listing.primary_image_renditions, storage.url(path))
+                        if path
+                        else None
+                    ),
+                )
+            )
+        FeedCard.objects.bulk_create(cards)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("property", "0020_media_blob_unreferenced_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_feed_cards, migrations.RunPython.noop),
+    ]
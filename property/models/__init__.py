@@ -5,5 +5,21 @@ Models package for Property app
 from .location import Location
 from .property import Property
 from .image import Image
+from .map_cell import MapCell
+from .neighbours import PropertyNeighbours
+from .task import QueuedTask
+from .media_blob import MediaBlob
+from .upload import UploadSession
+from .feed_card import FeedCard
 
-__all__ = ["Location", "Property", "Image"]
+__all__ = [
+    "Location",
+    "Property",
+    "Image",
+    "MapCell",
+    "PropertyNeighbours",
+    "QueuedTask",
+    "MediaBlob",
+    "UploadSession",
+    "FeedCard",
+]
@@ -0,0 +1,125 @@
+"""
+Feed Card Model Module
+Denormalized listing cards, so the home page and listing cards render
+without joining locations or looking up primary images
+"""
+
+from itertools import batched
+from django.db import models, transaction
+from .property import Property
+
+# Listings refreshed per query
+CHUNK = 500
+
+CARD_FIELDS = (
+    "status",
+    "created_at",
+    "title",
+    "location",
+    "price",
+    "bedrooms",
+    "bathrooms",
+    "picture",
+)
+
+
+class FeedCardQuerySet(models.QuerySet):
+    def recent(self, limit):
+        """The ``limit`` newest available listings, one index range scan"""
+        return self.filter(status="available").order_by("-created_at", "-property_id")[
+            :limit
+        ]
+
+    def refresh(self, property_ids=None):
+        """
+        Rebuild the cards of ``property_ids`` (every listing when None) from
+        their listings, locations and primary images. Returns the number of
+        cards written.
+        """
+        if property_ids is None:
+            with transaction.atomic():
+                self.all().delete()
+                return sum(
+                    self._fill(chunk)
+                    for chunk in batched(
+                        Property.objects.order_by("pk").values_list("pk", flat=True),
+                        CHUNK,
+                    )
+                )
+        return sum(
+            self._fill(chunk) for chunk in batched(sorted(set(property_ids)), CHUNK)
+        )
+
+    def _fill(self, property_ids):
+        listings = (
+            Property.objects.filter(pk__in=property_ids)
+            .select_related("location")
+            .with_primary_image()
+        )
+        cards = self.bulk_create(
+            [self.model.for_property(listing) for listing in listings],
+            update_conflicts=True,
+            unique_fields=["property"],
+            update_fields=CARD_FIELDS,
+        )
+        return len(cards)
+
+
+class FeedCard(models.Model):
+    """
+    What a listing card shows, formatted: price and location as displayed
+    and the ``<picture>`` data of the primary image (see
+    ``property.renditions.picture``), with the status and creation time the
+    home page selects and orders by. Kept in step with ``Property``,
+    ``Location`` and ``Image`` writes by the signal handlers (a location's
+    in a worker); rebuilt by ``python manage.py rebuild_feed_cards``.
+    """
+
+    property = models.OneToOneField(
+        Property,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="feed_card",
+    )
+    status = models.CharField(max_length=20)
+    created_at = models.DateTimeField()
+    title = models.CharField(max_length=255)
+    location = models.CharField(max_length=500, blank=True)
+    price = models.CharField(max_length=32)
+    bedrooms = models.PositiveIntegerField()
+    bathrooms = models.PositiveIntegerField()
+    picture = models.JSONField(null=True)
+
+    objects = FeedCardQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Feed card"
+        verbose_name_plural = "Feed cards"
+        indexes = [models.Index(fields=["status", "-created_at", "-property"])]
+
+    def __str__(self):
+        return self.title
+
+    @classmethod
+    def for_property(cls, listing):
+        """
+        The unsaved card of ``listing``; load it with
+        ``select_related("location")`` and ``with_primary_image()`` to build
+        it without queries
+        """
+        location = listing.location
+        return cls(
+            property_id=listing.pk,
+            status=listing.status,
+            created_at=listing.created_at,
+            title=listing.title,
+            location=(
+                f"{location.name}, {location.city}, {location.country}"
+                if location
+                else ""
+            ),
+            price=listing.formatted_price,
+            bedrooms=listing.bedrooms,
+            bathrooms=listing.bathrooms,
+            picture=listing.primary_image_picture,
+        )
@@ -3,10 +3,69 @@ Image Model Module
 Handles property images
 """
 
-from django.db import models
+from collections import Counter
+from django.db import models, transaction
+from django.db.models import Q
+from django.dispatch import Signal
 from builtins import property as py_property
+from ..storage import image_storage
 from .property import Property
 
+# Sent by ImageQuerySet.save_gallery, which bypasses the save signals, with
+# the ``property_ids`` of the listings whose galleries changed
+gallery_saved = Signal()
+
+# What a gallery edit changes; anything else (a new file) goes through save()
+GALLERY_FIELDS = ("order", "is_primary", "caption")
+
+
+class ImageQuerySet(models.QuerySet):
+    def save_gallery(self, images, fields=GALLERY_FIELDS):
+        """
+        Save ``fields`` of existing images in one transaction with a fixed
+        number of queries: demote the primaries being replaced, then
+        ``bulk_update`` the images. Raises ValueError when two of them would
+        be the primary image of one listing.
+        """
+        images = list(images)
+        if any(image.pk is None for image in images):
+            raise ValueError("save_gallery() only saves existing images")
+        primaries = Counter(image.property_id for image in images if image.is_primary)
+        if any(count > 1 for count in primaries.values()):
+            raise ValueError("A property can only have one primary image")
+        if not images:
+            return 0
+        with transaction.atomic(using=self.db):
+            if primaries and "is_primary" in fields:
+                # Before the update: the constraint is checked row by row
+                self.filter(property_id__in=primaries, is_primary=True).exclude(
+                    pk__in=[image.pk for image in images if image.is_primary]
+                ).update(is_primary=False)
+            updated = self.bulk_update(images, fields)
+            gallery_saved.send(
+                sender=self.model,
+                property_ids={image.property_id for image in images},
+                using=self.db,
+            )
+        return updated
+
+    def reorder(self, listing, image_ids, primary_id=None):
+        """
+        Order a listing's gallery as ``image_ids`` (all of its images) and,
+        when given, make ``primary_id`` its primary image
+        """
+        images = {image.pk: image for image in self.filter(property=listing)}
+        if sorted(image_ids) != sorted(images):
+            raise ValueError("image_ids must list each image of the property once")
+        if primary_id is not None and primary_id not in images:
+            raise ValueError("primary_id is not an image of the property")
+        fields = ["order"] if primary_id is None else ["order", "is_primary"]
+        for order, image_id in enumerate(image_ids):
+            images[image_id].order = order
+            if primary_id is not None:
+                images[image_id].is_primary = image_id == primary_id
+        return self.save_gallery(images.values(), fields)
+
 
 class Image(models.Model):
     """
@@ -16,34 +75,74 @@ class Image(models.Model):
     property = models.ForeignKey(
         Property, on_delete=models.CASCADE, related_name="images"
     )
-    image = models.ImageField(upload_to="property_images/")
+    # Stored once per content and shared; see property/storage.py
+    image = models.ImageField(upload_to="property_images/", storage=image_storage)
     caption = models.CharField(max_length=255, blank=True)
     is_primary = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Filled by property.renditions, on upload or by generate_renditions
+    width = models.PositiveIntegerField(null=True, editable=False)
+    height = models.PositiveIntegerField(null=True, editable=False)
+    renditions = models.JSONField(default=list, blank=True, editable=False)
+    renditions_generated_at = models.DateTimeField(null=True, editable=False)
+
+    objects = ImageQuerySet.as_manager()
+
     class Meta:
         ordering = ["order", "-uploaded_at"]
         verbose_name = "Property Image"
         verbose_name_plural = "Property Images"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["property"],
+                condition=Q(is_primary=True),
+                name="image_one_primary_per_property",
+                violation_error_message="A property can only have one primary image.",
+            ),
+        ]
 
     def __str__(self):
         return f"Image for {self.property.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._loaded_image_name = loaded.get("image")
+        return instance
+
+    def validate_constraints(self, exclude=None):
+        # Saving a primary image demotes the listing's current one, so forms
+        # need not reject it; save_gallery checks a batch of images
+        super().validate_constraints({*(exclude or ()), "is_primary"})
+
     def save(self, *args, **kwargs):
         """
-        Auto-set first image as primary if no primary exists
+        Demote the listing's other primary image when this one becomes primary
         """
-        if self.is_primary:
-            # Ensure only one primary image per property
-            Image.objects.filter(property=self.property, is_primary=True).update(
-                is_primary=False
-            )
-        super().save(*args, **kwargs)
+        if self.image.name != getattr(self, "_loaded_image_name", self.image.name):
+            # A replaced file needs new renditions
+            self.width = self.height = self.renditions_generated_at = None
+            self.renditions = []
+        with transaction.atomic(using=kwargs.get("using")):
+            # Also when loaded as primary: another save may have demoted it
+            if self.is_primary:
+                Image.objects.filter(
+                    property_id=self.property_id, is_primary=True
+                ).exclude(pk=self.pk).update(is_primary=False)
+            super().save(*args, **kwargs)
+        self._loaded_image_name = self.image.name
 
     @py_property
     def thumbnail_url(self):
-        """Return image URL (can be extended with thumbnail generation)"""
-        if self.image:
-            return self.image.url
-        return None
+        """Return the URL of a small rendition, or of the original upload"""
+        return self.picture["src"]
+
+    @py_property
+    def picture(self):
+        """``<picture>`` data from ``property.renditions.picture``"""
+        from ..renditions import picture
+
+        return picture(self.renditions, self.image.url if self.image else None)
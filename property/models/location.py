@@ -1,4 +1,84 @@
+import math
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Sqrt
+from django.db.models.lookups import LessThanOrEqual
+from .. import geo
+
+
+def distance_expression(latitude, longitude, prefix=""):
+    """
+    Squared distance in km² from a point to the location at ``prefix``, on
+    the equirectangular approximation: plain arithmetic per row, and within
+    a few percent of the great-circle distance at the radii the listing
+    search allows (``PROPERTY_GEO_MAX_RADIUS_KM``)
+    """
+    scale = geo.KM_PER_DEGREE
+    x = (F(f"{prefix}longitude") - longitude) * (
+        scale * math.cos(math.radians(latitude))
+    )
+    y = (F(f"{prefix}latitude") - latitude) * scale
+    return x * x + y * y
+
+
+def near_filter(latitude, longitude, radius_km, prefix=""):
+    """Conditions for locations at ``prefix`` within ``radius_km`` of a point"""
+    return (
+        geo.bbox_condition(*geo.bbox_around(latitude, longitude, radius_km), prefix),
+        LessThanOrEqual(distance_expression(latitude, longitude, prefix), radius_km**2),
+    )
+
+
+class LocationQuerySet(models.QuerySet):
+    def within_bbox(self, south, west, north, east):
+        return self.filter(geo.bbox_condition(south, west, north, east))
+
+    def near(self, latitude, longitude, radius_km):
+        """
+        Locations within ``radius_km`` of a point, nearest first, annotated
+        with ``distance_km``
+        """
+        return (
+            self.filter(*near_filter(latitude, longitude, radius_km))
+            .annotate(distance_km=Sqrt(distance_expression(latitude, longitude)))
+            .order_by("distance_km", "pk")
+        )
+
+    def reconcile_property_counts(self):
+        """
+        Recompute the materialized property counters, and the map cells of
+        the locations, from the properties table; needed after bulk writes
+        that bypass signals. Returns the number of locations updated.
+        """
+        from .property import Property
+
+        def counted(**filters):
+            return Coalesce(
+                Subquery(
+                    Property.objects.filter(location=OuterRef("pk"), **filters)
+                    .order_by()
+                    .values("location")
+                    .annotate(total=Count("pk"))
+                    .values("total")
+                ),
+                0,
+            )
+
+        from .map_cell import MapCell
+
+        updated = self.update(
+            property_count=counted(),
+            available_property_count=counted(status="available"),
+        )
+        if self.query.has_filters():
+            MapCell.objects.refresh(self.values_list("geohash", flat=True))
+        else:
+            MapCell.objects.refresh()
+        return updated
+
+
+# Written only through F() updates and reconcile_property_counts()
+COUNTER_FIELDS = ("property_count", "available_property_count")
 
 
 class Location(models.Model):
@@ -10,9 +90,26 @@ class Location(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100, blank=True)
     country = models.CharField(max_length=100, default="USA")
+
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Derived from the coordinates on save; bulk inserts set it with
+    # property.geo.encode()
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+
+    # Materialized counters, maintained by property signal handlers
+    property_count = models.PositiveIntegerField(
+        "properties", default=0, db_index=True
+    )
+    available_property_count = models.PositiveIntegerField(
+        "available properties", default=0, db_index=True
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = LocationQuerySet.as_manager()
+
     class Meta:
         ordering = ["name"]
         verbose_name = "Location"
@@ -23,10 +120,45 @@ class Location(models.Model):
                 name="unique_location_per_area",
             )
         ]
+        indexes = [
+            # Geohash range scans for radius and bounding-box searches; the
+            # map clusters are read from the index alone
+            models.Index(
+                fields=["geohash", "latitude", "longitude", "property_count"],
+                name="location_geohash_idx",
+            ),
+            # Latest location change, for the page validators
+            models.Index(fields=["updated_at"], name="location_updated_idx"),
+        ]
 
     def __str__(self):
         return self.full_address
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored geohash, whose map cell a move changes"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_geohash = instance.__dict__.get("geohash")
+        return instance
+
+    def save(self, **kwargs):
+        if self.latitude is None or self.longitude is None:
+            self.geohash = ""
+        else:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = [*update_fields, "geohash"]
+        # Saving a loaded instance must not overwrite counters that were
+        # updated in the database since it was read.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        super().save(**kwargs)
+
     @property
     def full_address(self):
         parts = [self.name, self.city]
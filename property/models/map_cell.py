@@ -0,0 +1,105 @@
+"""
+Map Cell Model Module
+Listings per geohash cell, pre-aggregated for map clusters at coarse zooms
+"""
+
+from django.db import models, transaction
+from django.db.models import Avg, Count, Min, Q, Sum
+from django.db.models.functions import Substr
+from .. import geo
+from .location import Location
+
+# Cells are about 5 km wide; coarser zooms group them further
+CELL_PRECISION = 5
+
+# Cells refreshed per query, well below SQLite's expression depth limit
+CHUNK = 200
+
+
+class MapCellQuerySet(models.QuerySet):
+    def refresh(self, cells=None):
+        """
+        Recompute ``cells`` (geohashes, cut to ``CELL_PRECISION``; every cell
+        when None) from the locations with listings
+        """
+        if cells is None:
+            with transaction.atomic():
+                self.all().delete()
+                self._fill(Location.objects.all())
+            return
+        cells = sorted({cell[:CELL_PRECISION] for cell in cells if cell})
+        for start in range(0, len(cells), CHUNK):
+            chunk = cells[start : start + CHUNK]
+            ranges = Q()
+            for low, high in geo.prefix_ranges(chunk):
+                ranges |= Q(geohash__gte=low) & (Q(geohash__lt=high) if high else Q())
+            with transaction.atomic():
+                self.filter(geohash__in=chunk).delete()
+                self._fill(Location.objects.filter(ranges))
+
+    def refresh_locations(self, location_ids):
+        """Recompute the cells of the given locations"""
+        self.refresh(
+            Location.objects.filter(pk__in=location_ids).values_list(
+                "geohash", flat=True
+            )
+        )
+
+    def _fill(self, locations):
+        rows = (
+            locations.filter(property_count__gt=0)
+            .exclude(geohash="")
+            .annotate(cell=Substr("geohash", 1, CELL_PRECISION))
+            .values("cell")
+            .annotate(
+                listings=Sum("property_count"),
+                locations=Count("pk"),
+                latitude=Avg("latitude"),
+                longitude=Avg("longitude"),
+                location=Min("pk"),
+            )
+            .order_by()
+        )
+        self.bulk_create(
+            [
+                self.model(
+                    geohash=row["cell"],
+                    listings=row["listings"],
+                    locations=row["locations"],
+                    latitude=row["latitude"],
+                    longitude=row["longitude"],
+                    location_id=row["location"],
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class MapCell(models.Model):
+    """
+    Listings of the locations in one geohash cell of ``CELL_PRECISION``
+    characters, so map clusters of wide areas read a few thousand cells
+    instead of every location. Refreshed from ``Location`` by the signal
+    handlers and ``reconcile_property_counts()``.
+    """
+
+    geohash = models.CharField(max_length=CELL_PRECISION, primary_key=True)
+    listings = models.PositiveIntegerField()
+    locations = models.PositiveIntegerField()
+    # Mean coordinates of the cell's locations
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    # The first location, which a single-location cluster links to
+    location = models.ForeignKey(
+        Location, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+
+    objects = MapCellQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Map cell"
+        verbose_name_plural = "Map cells"
+
+    def __str__(self):
+        return self.geohash
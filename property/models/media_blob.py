@@ -0,0 +1,139 @@
+"""
+Media Blob Model Module
+Reference counts of content-addressed image files (property/storage.py)
+"""
+
+from collections import defaultdict
+from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from ..storage import image_storage, is_blob_name
+
+
+class MediaBlobQuerySet(models.QuerySet):
+    def adjust(self, deltas, storage=None):
+        """
+        Apply ``{name: delta}`` reference changes in a query per distinct
+        delta; a blob gaining its first reference gets a row. Blobs losing
+        their last reference are stamped ``unreferenced_at``, cleared again
+        when one is added. Names that are not blobs are ignored.
+        """
+        deltas = {
+            name: delta
+            for name, delta in deltas.items()
+            if delta and is_blob_name(name)
+        }
+        self._add_rows([name for name, delta in deltas.items() if delta > 0], storage)
+        names_by_delta = defaultdict(list)
+        for name, delta in deltas.items():
+            names_by_delta[delta].append(name)
+        now = timezone.now()
+        for delta, names in names_by_delta.items():
+            self.filter(name__in=names).update(
+                ref_count=Greatest(F("ref_count") + delta, 0),
+                unreferenced_at=Case(
+                    When(
+                        ref_count__lte=-delta,
+                        then=Coalesce(F("unreferenced_at"), Value(now)),
+                    ),
+                    default=None,
+                ),
+            )
+
+    def _add_rows(self, names, storage=None, ref_counts=None):
+        """Rows for blobs that have none; existing rows are left alone"""
+        if not names:
+            return
+        storage = storage or image_storage()
+        ref_counts = ref_counts or {}
+        now = timezone.now()
+        self.bulk_create(
+            [
+                self.model(
+                    name=name,
+                    size=storage.size(name),
+                    ref_count=ref_counts.get(name, 0),
+                    unreferenced_at=None if ref_counts.get(name) else now,
+                )
+                for name in names
+            ],
+            ignore_conflicts=True,
+        )
+
+    def reconcile(self, storage=None):
+        """
+        Recount references from the images, e.g. after bulk writes that
+        skipped the signals, adding rows for blobs that have none. Returns
+        the number of rows changed.
+        """
+        from .image import Image
+
+        references = (
+            Image.objects.filter(image=OuterRef("name"))
+            .order_by()
+            .values("image")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        changed = self.exclude(ref_count=Coalesce(Subquery(references), 0)).update(
+            ref_count=Coalesce(Subquery(references), 0)
+        )
+        self.filter(ref_count=0, unreferenced_at=None).update(
+            unreferenced_at=timezone.now()
+        )
+        self.filter(ref_count__gt=0).exclude(unreferenced_at=None).update(
+            unreferenced_at=None
+        )
+
+        storage = storage or image_storage()
+        missing = dict(
+            Image.objects.exclude(image__in=self.values("name"))
+            .order_by()
+            .values("image")
+            .annotate(total=Count("pk"))
+            .values_list("image", "total")
+        )
+        missing = {
+            name: total
+            for name, total in missing.items()
+            if is_blob_name(name) and storage.exists(name)
+        }
+        self._add_rows(list(missing), storage, missing)
+        return changed + len(missing)
+
+    def stats(self):
+        """Blobs, bytes stored, bytes referenced and bytes saved by sharing"""
+        return self.aggregate(
+            count=Count("pk"),
+            unreferenced=Count("pk", filter=Q(ref_count=0)),
+            stored=Coalesce(Sum("size"), 0),
+            referenced=Coalesce(Sum(F("size") * F("ref_count")), 0),
+            saved=Coalesce(
+                Sum(F("size") * (F("ref_count") - 1), filter=Q(ref_count__gt=1)), 0
+            ),
+        )
+
+
+class MediaBlob(models.Model):
+    """
+    One stored image file and the number of ``Image`` rows using it, kept
+    by the image signals and recounted by ``python manage.py gc_media``,
+    which deletes blobs that stay unreferenced.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When the last reference went away; None while referenced
+    unreferenced_at = models.DateTimeField(null=True, blank=True)
+
+    objects = MediaBlobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Media blob"
+        verbose_name_plural = "Media blobs"
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
@@ -0,0 +1,48 @@
+"""
+Property Neighbours Model Module
+Precomputed similar listings of each property
+"""
+
+import struct
+from builtins import property as py_property
+from django.db import models
+from .property import Property
+
+
+class PropertyNeighbours(models.Model):
+    """
+    The most similar available listings of a property, nearest first, as
+    packed 64-bit ids, so the detail page reads them with the property.
+    Built by ``python manage.py rebuild_similar_properties``
+    (property/similarity.py).
+    """
+
+    property = models.OneToOneField(
+        Property,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="neighbours",
+    )
+    ids = models.BinaryField()
+    # Distance to the farthest stored neighbour; infinite while there are
+    # fewer than the configured number. A changed listing closer than this
+    # has to enter the list.
+    radius = models.FloatField()
+    # Listings updated after this are recomputed by the next build
+    built_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Property neighbours"
+        verbose_name_plural = "Property neighbours"
+
+    def __str__(self):
+        return f"Neighbours of {self.property_id}"
+
+    @staticmethod
+    def pack(ids):
+        return struct.pack(f"<{len(ids)}q", *ids)
+
+    @py_property
+    def neighbour_ids(self):
+        data = bytes(self.ids)
+        return list(struct.unpack(f"<{len(data) // 8}q", data))
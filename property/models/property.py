@@ -3,8 +3,125 @@ Property Model Module
 Handles real estate property listings
 """
 
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
-from .location import Location
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Sqrt
+from django.utils.functional import cached_property
+from .. import geo
+from .location import Location, distance_expression, near_filter
+
+# Copied from the listing's location, so radius searches scan one index
+COORDINATE_FIELDS = ("latitude", "longitude", "geohash")
+
+# Primary image first, then display order, newest upload first
+PRIMARY_IMAGE_ORDERING = ["-is_primary", "order", "-uploaded_at"]
+
+
+def primary_image_sort_key(image):
+    """Python equivalent of PRIMARY_IMAGE_ORDERING for prefetched images"""
+    uploaded = image.uploaded_at.timestamp() if image.uploaded_at else 0
+    return (not image.is_primary, image.order, -uploaded)
+
+
+class PropertyQuerySet(models.QuerySet):
+    def with_primary_image(self):
+        """
+        Annotate ``primary_image_path`` (the stored file name of the primary
+        image) and ``primary_image_renditions`` with subqueries, so cards
+        render without touching ``images``.
+        """
+        Image = self.model.images.rel.related_model
+        primary = Image.objects.filter(property=OuterRef("pk")).order_by(
+            *PRIMARY_IMAGE_ORDERING
+        )
+        return self.annotate(
+            primary_image_path=Subquery(primary.values("image")[:1]),
+            primary_image_renditions=Subquery(
+                primary.values("renditions")[:1], output_field=models.JSONField()
+            ),
+        )
+
+    def at_location_named(self, text):
+        """Listings whose location name, city or country contains ``text``"""
+        return self.filter(
+            Q(location__name__icontains=text)
+            | Q(location__city__icontains=text)
+            | Q(location__country__icontains=text)
+        )
+
+    def sync_coordinates(self):
+        """
+        Copy each listing's location coordinates onto it, after writes that
+        bypass ``save()``; returns the number of listings updated
+        """
+        location = Location.objects.filter(pk=OuterRef("location_id"))
+        return self.update(
+            latitude=Subquery(location.values("latitude")[:1]),
+            longitude=Subquery(location.values("longitude")[:1]),
+            geohash=Coalesce(Subquery(location.values("geohash")[:1]), Value("")),
+        )
+
+    def within_bbox(self, south, west, north, east):
+        """Listings whose location lies inside a bounding box"""
+        return self.filter(geo.bbox_condition(south, west, north, east))
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """
+        Listings whose location is within ``radius_km`` of a point, read
+        from the listings' own geohash index without joining locations
+        """
+        return self.filter(*near_filter(latitude, longitude, radius_km))
+
+    def nearest_first(self, latitude, longitude):
+        """Order by distance from a point, annotating ``distance_km``"""
+        return self.annotate(
+            distance_km=Sqrt(distance_expression(latitude, longitude))
+        ).order_by("distance_km", "-created_at", "-id")
+
+    def near(self, latitude, longitude, radius_km):
+        """Listings within ``radius_km`` of a point, nearest first"""
+        return self.within_radius(latitude, longitude, radius_km).nearest_first(
+            latitude, longitude
+        )
+
+    def _similar(self, listing, limit):
+        try:
+            ids = listing.neighbours.neighbour_ids
+        except ObjectDoesNotExist:
+            return (
+                None,
+                self.filter(location=listing.location_id, status="available").exclude(
+                    pk=listing.pk
+                )[:limit],
+            )
+        # By id alone: given a status condition too, SQLite prefers the
+        # status index and reads every available listing
+        return ids, self.filter(pk__in=ids)
+
+    @staticmethod
+    def _rank_similar(ids, listings, limit):
+        if ids is None:
+            return listings
+        by_id = {listing.pk: listing for listing in listings}
+        return [
+            by_id[pk] for pk in ids if pk in by_id and by_id[pk].status == "available"
+        ][:limit]
+
+    def similar_to(self, listing, limit=3):
+        """
+        Up to ``limit`` available listings similar to ``listing``, most
+        similar first: its precomputed neighbours (load ``listing`` with
+        ``select_related("neighbours")`` to save a query), or other listings
+        at its location when none are built yet
+        """
+        ids, listings = self._similar(listing, limit)
+        return self._rank_similar(ids, list(listings), limit)
+
+    async def asimilar_to(self, listing, limit=3):
+        """``similar_to()`` with the async ORM"""
+        ids, listings = self._similar(listing, limit)
+        return self._rank_similar(ids, [item async for item in listings], limit)
 
 
 class Property(models.Model):
@@ -20,6 +137,10 @@ class Property(models.Model):
 
     STATUS_CHOICES = [("available", "Available"), ("rented", "Rented")]
 
+    # Identifier assigned by the upstream feed; re-imports update by this key
+    external_id = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, editable=False
+    )
     title = models.CharField(max_length=255)
     description = models.TextField()
     property_type = models.CharField(
@@ -38,6 +159,12 @@ class Property(models.Model):
         blank=True,
     )
 
+    # The location's coordinates and geohash, copied on save and when the
+    # location moves (see COORDINATE_FIELDS)
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+
     # Property details
     price = models.DecimalField(max_digits=12, decimal_places=2)
     bedrooms = models.PositiveIntegerField(default=0)
@@ -45,22 +172,107 @@ class Property(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PropertyQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Property"
         verbose_name_plural = "Properties"
         indexes = [
             models.Index(fields=["location", "status"]),
-            models.Index(fields=["-created_at"]),
+            # Newest-first listing order; the id tie-breaker backs keyset
+            # (cursor) pagination
+            models.Index(fields=["-created_at", "-id"]),
+            models.Index(fields=["location", "-created_at", "-id"]),
+            # Faceted filters: equality on status/type, ranges on price and
+            # bedrooms
+            models.Index(fields=["status", "property_type", "price"]),
+            # Newest available listings first
+            models.Index(fields=["status", "-created_at", "-id"]),
+            # Geohash range scans for radius searches, covering the exact
+            # coordinate checks
+            models.Index(
+                fields=["geohash", "latitude", "longitude"],
+                name="property_geohash_idx",
+            ),
+            models.Index(fields=["property_type", "price"]),
+            models.Index(fields=["bedrooms", "price"]),
+            # Latest change of all listings or of a location's: the page
+            # validators' MAX(updated_at) is one index lookup
+            models.Index(fields=["updated_at"]),
+            models.Index(fields=["location", "updated_at"]),
         ]
 
     def __str__(self):
         return f"{self.title}"
 
-    @property
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember loaded values so signal handlers can see what changed"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, **kwargs):
+        loaded = getattr(self, "_loaded_values", None) or {}
+        moved = "location_id" in loaded and loaded["location_id"] != self.location_id
+        if self._state.adding or moved:
+            self.copy_coordinates(self.location)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and {"location", "location_id"} & set(
+                update_fields
+            ):
+                kwargs["update_fields"] = [*update_fields, *COORDINATE_FIELDS]
+        super().save(**kwargs)
+
+    def copy_coordinates(self, location):
+        """Take the coordinates and geohash of ``location`` (None clears them)"""
+        if location is None:
+            self.latitude = self.longitude = None
+            self.geohash = ""
+        else:
+            self.latitude, self.longitude = location.latitude, location.longitude
+            self.geohash = location.geohash
+
+    @cached_property
     def primary_image(self):
-        """Return the first image or None"""
-        return self.images.first()
+        """
+        Return the primary image (falling back to the first by display order)
+        or None. Uses prefetched images when ``images`` was prefetched.
+        """
+        prefetched = getattr(self, "_prefetched_objects_cache", {}).get("images")
+        if prefetched is not None:
+            return min(prefetched, key=primary_image_sort_key, default=None)
+        return self.images.order_by(*PRIMARY_IMAGE_ORDERING).first()
+
+    @property
+    def primary_image_url(self):
+        """
+        URL of the primary image or None. Reads the ``with_primary_image``
+        annotation when present instead of loading the image.
+        """
+        if "primary_image_path" in self.__dict__:
+            if not self.primary_image_path:
+                return None
+            image_field = self.images.model._meta.get_field("image")
+            return image_field.storage.url(self.primary_image_path)
+        primary = self.primary_image
+        return primary.image.url if primary and primary.image else None
+
+    @property
+    def primary_image_picture(self):
+        """
+        ``<picture>`` data (see ``property.renditions.picture``) for the
+        primary image, or None. Uses the ``with_primary_image`` annotations
+        when present.
+        """
+        from ..renditions import picture
+
+        if "primary_image_renditions" in self.__dict__:
+            url = self.primary_image_url
+            return picture(self.primary_image_renditions, url) if url else None
+        primary = self.primary_image
+        return primary.picture if primary and primary.image else None
 
     @property
     def formatted_price(self):
@@ -0,0 +1,58 @@
+"""
+Queued Task Model Module
+Rows of the database task queue (property/queue.py)
+"""
+
+from django.db import models
+from django.tasks import TaskResultStatus
+from django.utils import timezone
+
+
+class QueuedTask(models.Model):
+    """
+    One enqueued ``django.tasks`` task and its outcome. Workers claim a row
+    by bumping ``attempts`` from the value they read, so two workers never
+    run the same attempt; a claim is leased until ``locked_until``, after
+    which another worker may take the task over.
+    """
+
+    task_path = models.CharField(max_length=255)
+    queue_name = models.CharField(max_length=100)
+    priority = models.SmallIntegerField(default=0)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10,
+        choices=TaskResultStatus.choices,
+        default=TaskResultStatus.READY,
+    )
+    # Not before this; set by run_after and by retry backoff
+    run_after = models.DateTimeField(null=True, blank=True)
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    last_attempted_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Visibility timeout of the running attempt, extended while it runs
+    locked_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    worker_ids = models.JSONField(default=list)
+    # {"exception_class_path", "traceback"} per failed attempt
+    errors = models.JSONField(default=list)
+    return_value = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-enqueued_at"]
+        verbose_name = "Queued task"
+        verbose_name_plural = "Queued tasks"
+        indexes = [
+            # Claims: the next due task of a queue, by priority
+            models.Index(
+                fields=["status", "queue_name", "-priority", "id"],
+                name="queuedtask_claim_idx",
+            ),
+            # Latency stats and purging of finished tasks
+            models.Index(fields=["finished_at"], name="queuedtask_finished_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task_path} ({self.status})"
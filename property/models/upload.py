@@ -0,0 +1,58 @@
+"""
+Upload Session Model Module
+Resumable image uploads in progress (property/uploads.py)
+"""
+
+import uuid
+from builtins import property as py_property
+from pathlib import Path
+from django.conf import settings
+from django.db import models
+from .property import Property
+
+
+class UploadSession(models.Model):
+    """
+    One image file being uploaded in chunks for a listing. Chunks are written
+    to ``path`` as they arrive and ``received`` counts the bytes stored, so
+    an interrupted upload resumes from there. Complete sessions become
+    ``Image`` rows when the batch is committed.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    property = models.ForeignKey(
+        Property, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    filename = models.CharField(max_length=255)
+    caption = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        verbose_name = "Upload session"
+        verbose_name_plural = "Upload sessions"
+        indexes = [
+            # Expiry of abandoned uploads
+            models.Index(fields=["updated_at"], name="uploadsession_updated_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size} bytes)"
+
+    @py_property
+    def path(self):
+        """Partial file the chunks are written to"""
+        return Path(settings.PROPERTY_UPLOAD_DIR) / f"{self.pk.hex}.part"
+
+    @py_property
+    def complete(self):
+        return self.received == self.size
@@ -0,0 +1,162 @@
+"""
+Pagination helpers for Property app views
+"""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator that accepts an already known total, e.g. a materialized
+    counter, instead of issuing ``COUNT(*)``.
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+    async def aget_page(self, number):
+        """
+        ``get_page`` for async views, fetching the page's rows with the
+        async ORM. The total must have been passed in as ``count``.
+        """
+        page = self.get_page(number)
+        page.object_list = [obj async for obj in page.object_list]
+        return page
+
+
+class CursorPage:
+    """
+    One page of a keyset-paginated queryset, with opaque tokens for the
+    neighbouring pages.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over ``(created_at, id)``, newest first.
+
+    Each page is a single ``LIMIT`` query that seeks from the cursor through
+    the ``(-created_at, -id)`` index, so deep pages cost the same as the
+    first one and no ``COUNT(*)`` is needed.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page(self, cursor=None):
+        """Return the page for ``cursor``; invalid tokens give the first page"""
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is None:
+            return self._page_after(list(self._after(None)), has_previous=False)
+        direction, created_at, pk = position
+        if direction == "prev":
+            rows = list(self._before(created_at, pk))
+            return self._page_before(rows) or self.get_page()
+        rows = list(self._after((created_at, pk)))
+        return self._page_after(rows, has_previous=True)
+
+    async def aget_page(self, cursor=None):
+        """``get_page`` with the async ORM"""
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is None:
+            rows = [obj async for obj in self._after(None)]
+            return self._page_after(rows, has_previous=False)
+        direction, created_at, pk = position
+        if direction == "prev":
+            rows = [obj async for obj in self._before(created_at, pk)]
+            return self._page_before(rows) or await self.aget_page()
+        rows = [obj async for obj in self._after((created_at, pk))]
+        return self._page_after(rows, has_previous=True)
+
+    def _after(self, position):
+        """Rows after ``position``, newest first, one more than a page"""
+        queryset = self.queryset
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(pk__lt=pk),
+                created_at__lte=created_at,
+            )
+        return queryset.order_by("-created_at", "-pk")[: self.per_page + 1]
+
+    def _before(self, created_at, pk):
+        """Rows before the position, oldest first, one more than a page"""
+        return self.queryset.filter(
+            Q(created_at__gt=created_at) | Q(pk__gt=pk),
+            created_at__gte=created_at,
+        ).order_by("created_at", "pk")[: self.per_page + 1]
+
+    def _page_after(self, rows, has_previous):
+        items = rows[: self.per_page]
+        return CursorPage(
+            items,
+            next_cursor=(
+                self.encode_cursor("next", items[-1])
+                if len(rows) > self.per_page
+                else None
+            ),
+            previous_cursor=(
+                self.encode_cursor("prev", items[0]) if has_previous and items else None
+            ),
+        )
+
+    def _page_before(self, rows):
+        """The page of ``rows`` fetched by ``_before``, or None when empty"""
+        items = rows[: self.per_page][::-1]
+        if not items:
+            return None
+        return CursorPage(
+            items,
+            next_cursor=self.encode_cursor("next", items[-1]),
+            previous_cursor=(
+                self.encode_cursor("prev", items[0])
+                if len(rows) > self.per_page
+                else None
+            ),
+        )
+
+    @staticmethod
+    def encode_cursor(direction, obj):
+        payload = json.dumps(
+            [direction, obj.created_at.isoformat(), obj.pk], separators=(",", ":")
+        )
+        return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, created_at, pk = json.loads(urlsafe_b64decode(padded))
+            created_at = datetime.fromisoformat(created_at)
+            if direction not in ("next", "prev") or not isinstance(pk, int):
+                return None
+        except (ValueError, TypeError):
+            return None
+        return direction, created_at, pk
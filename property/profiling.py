@@ -0,0 +1,237 @@
+"""
+Profiling Module
+Per-request query count, database time, template render time and total time,
+aggregated per URL name into rolling latency windows, plus per-view budgets
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+# Profile of the request being handled in this context; context variables
+# follow requests into sync_to_async threads
+_current = ContextVar("property_profile", default=None)
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Most queries (and optionally milliseconds) one request of a view may take"""
+
+    queries: int
+    total_ms: float | None = None
+
+
+def budget(queries, total_ms=None):
+    """
+    Declare the budget of a function view. Class-based views set a
+    ``budget`` class attribute instead.
+    """
+
+    def decorator(view):
+        view.budget = Budget(queries, total_ms)
+        return view
+
+    return decorator
+
+
+def view_budget(view):
+    """Budget declared by a resolved view function, or None"""
+    view = getattr(view, "view_class", view)
+    return getattr(view, "budget", None)
+
+
+@dataclass
+class RequestProfile:
+    queries: int = 0
+    db_ms: float = 0.0
+    template_ms: float = 0.0
+    total_ms: float = 0.0
+    rendering: bool = False
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_samples) - 1))), len(sorted_samples) - 1)
+    return sorted_samples[index]
+
+
+class ProfileRegistry:
+    """
+    Last ``settings.PROPERTY_PROFILING_WINDOW`` profiles per URL name, kept
+    in this process's memory.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(self._window)
+        self._counts = defaultdict(int)
+        self._budgets = {}
+
+    @staticmethod
+    def _window():
+        return deque(maxlen=settings.PROPERTY_PROFILING_WINDOW)
+
+    def record(self, name, profile, budget=None):
+        with self._lock:
+            self._samples[name].append(
+                (profile.total_ms, profile.db_ms, profile.template_ms, profile.queries)
+            )
+            self._counts[name] += 1
+            self._budgets[name] = budget
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._budgets.clear()
+
+    def summary(self):
+        """``{url_name: {...}}`` with percentiles over the current window"""
+        with self._lock:
+            windows = {name: list(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+            budgets = dict(self._budgets)
+
+        summary = {}
+        for name, samples in sorted(windows.items()):
+            total, db, template, queries = (sorted(column) for column in zip(*samples))
+            summary[name] = {
+                "requests": counts[name],
+                "window": len(samples),
+                "p50_ms": round(percentile(total, 0.50), 2),
+                "p95_ms": round(percentile(total, 0.95), 2),
+                "p99_ms": round(percentile(total, 0.99), 2),
+                "db_p95_ms": round(percentile(db, 0.95), 2),
+                "template_p95_ms": round(percentile(template, 0.95), 2),
+                "queries_p50": percentile(queries, 0.50),
+                "queries_max": queries[-1],
+                "budget_queries": budgets[name].queries if budgets[name] else None,
+            }
+        return summary
+
+
+profiles = ProfileRegistry()
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper, installed on every connection"""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.db_ms += (time.perf_counter() - started) * 1000
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ProfiledTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None or profile.rendering:
+            # Nested renders are part of the outer render's time
+            return super().render(context, request)
+        profile.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_ms += (time.perf_counter() - started) * 1000
+            profile.rendering = False
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """Django template backend whose templates report their render time"""
+
+    def get_template(self, template_name):
+        return ProfiledTemplate(super().get_template(template_name).template, self)
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(super().from_string(template_code).template, self)
+
+
+class ProfilingMiddleware:
+    """
+    Profile every request resolved to a named URL: record it in
+    ``profiles``, warn when it exceeds the view's budget and, with
+    ``PROPERTY_SERVER_TIMING``, describe it in a ``Server-Timing`` header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.PROPERTY_PROFILING:
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile, started)
+
+    async def __acall__(self, request):
+        if not settings.PROPERTY_PROFILING:
+            return await self.get_response(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile, started)
+
+    def finish(self, request, response, profile, started):
+        profile.total_ms = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        if match is None or not match.view_name:
+            return response
+
+        limits = view_budget(match.func)
+        profiles.record(match.view_name, profile, limits)
+        if limits is not None and (
+            profile.queries > limits.queries
+            or (limits.total_ms is not None and profile.total_ms > limits.total_ms)
+        ):
+            logger.warning(
+                "%s exceeded its budget: %d queries (budget %d), %.1f ms",
+                match.view_name,
+                profile.queries,
+                limits.queries,
+                profile.total_ms,
+            )
+        if settings.PROPERTY_SERVER_TIMING:
+            response["Server-Timing"] = (
+                f'db;dur={profile.db_ms:.1f};desc="{profile.queries} queries", '
+                f"tpl;dur={profile.template_ms:.1f}, "
+                f"total;dur={profile.total_ms:.1f}"
+            )
+        return response
@@ -0,0 +1,381 @@
+"""
+Database task queue
+A ``django.tasks`` backend storing tasks in the ``QueuedTask`` table, so
+background work needs no broker, and the worker ``python manage.py
+run_workers`` runs in a pool of processes. Failed attempts are retried with
+exponential backoff; a claimed task is leased for a visibility timeout that
+the running worker keeps renewing, so the tasks of a worker that died are
+taken over by another one.
+"""
+
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from traceback import format_exception
+from django.db import close_old_connections, connection
+from django.db.models import Count, Min, Q
+from django.tasks import TaskContext, TaskResult, TaskResultStatus, task_backends
+from django.tasks.backends.base import BaseTaskBackend
+from django.tasks.base import TaskError
+from django.tasks.exceptions import TaskResultDoesNotExist
+from django.tasks.signals import task_enqueued, task_finished, task_started
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.json import normalize_json
+from django.utils.module_loading import import_string
+from .models import QueuedTask
+from .profiling import percentile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPTIONS = {
+    # Seconds a claimed task stays hidden from other workers. The worker
+    # renews the lease while the task runs, so only the tasks of a worker
+    # that stopped are taken over
+    "VISIBILITY_TIMEOUT": 300,
+    # Attempts before a task is marked failed
+    "MAX_ATTEMPTS": 3,
+    # Seconds before the first retry, doubling with every further one
+    "RETRY_DELAY": 10,
+    # Seconds an idle worker waits before looking for due tasks again
+    "POLL_INTERVAL": 1.0,
+}
+
+# Due tasks read per claim; a worker that loses a race tries the next one
+CLAIM_CANDIDATES = 10
+
+READY = TaskResultStatus.READY
+RUNNING = TaskResultStatus.RUNNING
+FAILED = TaskResultStatus.FAILED
+SUCCESSFUL = TaskResultStatus.SUCCESSFUL
+
+
+class LeaseExpired(Exception):
+    """Recorded for an attempt whose worker stopped renewing its lease"""
+
+
+class DatabaseBackend(BaseTaskBackend):
+    """
+    Tasks are rows of ``QueuedTask``, written in the caller's transaction;
+    ``OPTIONS`` override ``DEFAULT_OPTIONS``
+    """
+
+    supports_defer = True
+    supports_async_task = True
+    supports_get_result = True
+    supports_priority = True
+
+    def __init__(self, alias, params):
+        super().__init__(alias, params)
+        self.options = {**DEFAULT_OPTIONS, **self.options}
+
+    def enqueue(self, task, args, kwargs):
+        self.validate_task(task)
+        row = QueuedTask.objects.create(
+            task_path=task.module_path,
+            queue_name=task.queue_name,
+            priority=task.priority,
+            args=normalize_json(args),
+            kwargs=normalize_json(kwargs),
+            run_after=task.run_after,
+        )
+        result = self.result(row, task)
+        task_enqueued.send(type(self), task_result=result)
+        return result
+
+    def get_result(self, result_id):
+        try:
+            row = QueuedTask.objects.get(pk=result_id)
+        except (QueuedTask.DoesNotExist, ValueError):
+            raise TaskResultDoesNotExist(result_id) from None
+        return self.result(row)
+
+    def result(self, row, task=None):
+        """The ``TaskResult`` of a ``QueuedTask`` row"""
+        if task is None:
+            task = import_string(row.task_path).using(
+                priority=row.priority, queue_name=row.queue_name, backend=self.alias
+            )
+        result = TaskResult(
+            task=task,
+            id=str(row.pk),
+            status=TaskResultStatus(row.status),
+            enqueued_at=row.enqueued_at,
+            started_at=row.started_at,
+            finished_at=row.finished_at,
+            last_attempted_at=row.last_attempted_at,
+            args=row.args,
+            kwargs=row.kwargs,
+            backend=self.alias,
+            errors=[TaskError(**error) for error in row.errors],
+            worker_ids=list(row.worker_ids),
+        )
+        object.__setattr__(result, "_return_value", row.return_value)
+        return result
+
+
+def _error(exception):
+    exception_type = type(exception)
+    return {
+        "exception_class_path": (
+            f"{exception_type.__module__}.{exception_type.__qualname__}"
+        ),
+        "traceback": "".join(format_exception(exception)),
+    }
+
+
+class Lease(threading.Thread):
+    """Keep renewing the visibility timeout of a running task"""
+
+    def __init__(self, row, timeout):
+        super().__init__(daemon=True)
+        self.row = row
+        self.timeout = timeout
+        self.finished = threading.Event()
+
+    def run(self):
+        try:
+            while not self.finished.wait(self.timeout / 3):
+                QueuedTask.objects.filter(
+                    pk=self.row.pk, status=RUNNING, attempts=self.row.attempts
+                ).update(locked_until=timezone.now() + timedelta(seconds=self.timeout))
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finished.set()
+        self.join()
+
+
+class Worker:
+    """
+    Runs the due tasks of ``queues`` (by default every queue of the backend),
+    highest priority first, one at a time
+    """
+
+    def __init__(self, backend="default", queues=None):
+        self.backend = task_backends[backend]
+        self.queues = sorted(queues or self.backend.queues)
+        self.options = self.backend.options
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{get_random_string(6)}"
+        self.stopping = threading.Event()
+
+    def stop(self):
+        """Finish the running task, then return from ``run()``"""
+        self.stopping.set()
+
+    def run(self, burst=False):
+        """
+        Run tasks until ``stop()``, or with ``burst`` until none is due;
+        returns the number of tasks run
+        """
+        processed = 0
+        while not self.stopping.is_set():
+            if not connection.in_atomic_block:
+                # As between requests: drop broken or expired connections
+                close_old_connections()
+            if self.run_once():
+                processed += 1
+                continue
+            if burst:
+                break
+            self.stopping.wait(self.options["POLL_INTERVAL"])
+        return processed
+
+    def run_once(self):
+        """Claim and run the next due task; False when there is none"""
+        row = self.claim()
+        if row is None:
+            return False
+        self.execute(row)
+        return True
+
+    def claim(self):
+        now = timezone.now()
+        tasks = QueuedTask.objects.filter(queue_name__in=self.queues)
+        expired = tasks.filter(status=RUNNING, locked_until__lt=now)
+        due = tasks.filter(
+            Q(run_after__isnull=True) | Q(run_after__lte=now), status=READY
+        ).order_by("-priority", "pk")
+        for candidates in (expired, due):
+            for row in candidates[:CLAIM_CANDIDATES]:
+                if row.status == RUNNING and self._give_up(row, now):
+                    continue
+                if self._lock(row, now):
+                    return row
+        return None
+
+    def _lock(self, row, now):
+        # Only one worker can move the row on from the attempt it read
+        changes = {
+            "status": RUNNING,
+            "attempts": row.attempts + 1,
+            "worker_ids": [*row.worker_ids, self.id],
+            "started_at": row.started_at or now,
+            "last_attempted_at": now,
+            "locked_until": now + timedelta(seconds=self.options["VISIBILITY_TIMEOUT"]),
+        }
+        claimed = QueuedTask.objects.filter(
+            pk=row.pk, status=row.status, attempts=row.attempts
+        ).update(**changes)
+        if claimed:
+            for name, value in changes.items():
+                setattr(row, name, value)
+        return bool(claimed)
+
+    def _give_up(self, row, now):
+        """Fail a task whose lease expired on its last attempt"""
+        if row.attempts < self.options["MAX_ATTEMPTS"]:
+            return False
+        error = LeaseExpired(f"Worker {row.worker_ids[-1]} stopped renewing the lease")
+        self._finish(row, FAILED, errors=[*row.errors, _error(error)], finished_at=now)
+        return True
+
+    def execute(self, row):
+        started = timezone.now()
+        try:
+            result = self.backend.result(row)
+            task_started.send(type(self.backend), task_result=result)
+            with Lease(row, self.options["VISIBILITY_TIMEOUT"]):
+                if result.task.takes_context:
+                    value = result.task.call(
+                        TaskContext(task_result=result), *row.args, **row.kwargs
+                    )
+                else:
+                    value = result.task.call(*row.args, **row.kwargs)
+            value = normalize_json(value)
+        except KeyboardInterrupt:
+            raise
+        except BaseException as exception:
+            self._failed(row, exception)
+        else:
+            self._finish(
+                row, SUCCESSFUL, return_value=value, finished_at=timezone.now()
+            )
+        logger.info(
+            "%s %s: %s in %.3fs",
+            row.task_path,
+            row.pk,
+            row.status,
+            (timezone.now() - started).total_seconds(),
+        )
+
+    def _failed(self, row, exception):
+        logger.warning(
+            "%s %s failed (attempt %s): %r",
+            row.task_path,
+            row.pk,
+            row.attempts,
+            exception,
+        )
+        errors = [*row.errors, _error(exception)]
+        if row.attempts >= self.options["MAX_ATTEMPTS"]:
+            self._finish(row, FAILED, errors=errors, finished_at=timezone.now())
+            return
+        delay = self.options["RETRY_DELAY"] * 2 ** (row.attempts - 1)
+        self._finish(
+            row,
+            READY,
+            errors=errors,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+
+    def _finish(self, row, status, **changes):
+        changes.update(status=status, locked_until=None)
+        saved = QueuedTask.objects.filter(
+            pk=row.pk, status=row.status, attempts=row.attempts
+        ).update(**changes)
+        if not saved:
+            # The lease expired and another worker took the task over
+            logger.warning(
+                "%s %s: lost the lease, result dropped", row.task_path, row.pk
+            )
+            return
+        for name, value in changes.items():
+            setattr(row, name, value)
+        if status != READY:
+            task_finished.send(type(self.backend), task_result=self.backend.result(row))
+
+
+def _seconds(start, end):
+    return (end - start).total_seconds()
+
+
+def queue_stats(window=timedelta(hours=1)):
+    """
+    Per queue: tasks by state (``due`` and ``scheduled`` split the ready
+    ones), the age of the oldest due task, and percentiles of the wait from
+    enqueueing to the first start and of the final attempt's run time, over
+    tasks finished within ``window``
+    """
+    now = timezone.now()
+    stats = {}
+
+    def queue(name):
+        return stats.setdefault(
+            name,
+            {
+                "due": 0,
+                "scheduled": 0,
+                "running": 0,
+                "failed": 0,
+                "successful": 0,
+                "oldest_due_s": None,
+            },
+        )
+
+    counts = QueuedTask.objects.values("queue_name", "status").annotate(
+        tasks=Count("pk")
+    )
+    for row in counts.order_by():
+        queue(row["queue_name"])[row["status"].lower()] = row["tasks"]
+    for row in (
+        QueuedTask.objects.filter(status=READY, run_after__gt=now)
+        .values("queue_name")
+        .annotate(tasks=Count("pk"))
+        .order_by()
+    ):
+        queue(row["queue_name"])["scheduled"] = row["tasks"]
+    for row in (
+        QueuedTask.objects.filter(status=READY)
+        .filter(Q(run_after__isnull=True) | Q(run_after__lte=now))
+        .values("queue_name")
+        .annotate(oldest=Min("enqueued_at"))
+        .order_by()
+    ):
+        queue(row["queue_name"])["oldest_due_s"] = round(
+            _seconds(row["oldest"], now), 3
+        )
+    for name, values in stats.items():
+        values["due"] = values.pop("ready", 0) - values["scheduled"]
+
+    waits, runs = {}, {}
+    finished = QueuedTask.objects.filter(
+        finished_at__gte=now - window, started_at__isnull=False
+    ).values_list(
+        "queue_name", "enqueued_at", "started_at", "last_attempted_at", "finished_at"
+    )
+    for name, enqueued_at, started_at, attempted_at, finished_at in finished:
+        waits.setdefault(name, []).append(_seconds(enqueued_at, started_at) * 1000)
+        runs.setdefault(name, []).append(_seconds(attempted_at, finished_at) * 1000)
+    for name in waits:
+        values = queue(name)
+        values["finished"] = len(waits[name])
+        for label, samples in [("wait", waits[name]), ("run", runs[name])]:
+            samples.sort()
+            values[f"{label}_p50_ms"] = round(percentile(samples, 0.50), 1)
+            values[f"{label}_p95_ms"] = round(percentile(samples, 0.95), 1)
+    return stats
+
+
+def purge_finished(older_than):
+    """Delete tasks that finished more than ``older_than`` ago"""
+    cutoff = timezone.now() - older_than
+    deleted, _ = QueuedTask.objects.filter(finished_at__lt=cutoff).delete()
+    return deleted
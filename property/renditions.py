@@ -0,0 +1,215 @@
+"""
+Image Renditions Module
+Generates resized copies of uploaded property images in modern formats and
+builds the ``srcset`` data templates need to pick one
+"""
+
+import io
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePosixPath
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils import timezone
+from PIL import Image as PILImage
+from PIL import ImageOps, features
+from .storage import image_storage, rendition_storage
+
+logger = logging.getLogger(__name__)
+
+# Format name: (Pillow format, file extension, MIME type, save options)
+FORMATS = {
+    "avif": ("AVIF", "avif", "image/avif", {"quality": 55, "speed": 9}),
+    "webp": ("WEBP", "webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", "image/jpeg", {"quality": 82, "progressive": True}),
+}
+
+# Width a thumbnail or card image should at least have
+THUMBNAIL_WIDTH = 320
+
+
+def available_formats():
+    """Configured formats this Pillow build can encode; JPEG always"""
+    formats = [
+        name
+        for name in settings.PROPERTY_IMAGE_RENDITION_FORMATS
+        if name == "jpeg" or features.check(name)
+    ]
+    if "jpeg" not in formats:
+        formats.append("jpeg")
+    return formats
+
+
+def rendition_widths(original_width):
+    """Configured widths below the original's, plus one capped at it"""
+    widths = settings.PROPERTY_IMAGE_RENDITION_WIDTHS
+    if not widths:
+        return []
+    return sorted(
+        {width for width in widths if width < original_width}
+        | {min(original_width, max(widths))}
+    )
+
+
+def rendition_name(original_name, width, extension):
+    path = PurePosixPath(original_name)
+    return str(path.parent / "renditions" / f"{path.stem}-{width}w.{extension}")
+
+
+def render_image(name, storage=None):
+    """
+    Write every rendition of the image ``name`` in ``storage`` (default: the
+    image storage) to its ``rendition_storage`` and return ``(width, height,
+    renditions)``. Touches storage only, never the database, so it can run
+    in worker processes.
+    """
+    storage = storage or image_storage()
+    with storage.open(name, "rb") as file:
+        original = ImageOps.exif_transpose(PILImage.open(file))
+        original.load()
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+
+    output = rendition_storage(storage)
+    renditions = []
+    for width in rendition_widths(original.width):
+        height = max(round(original.height * width / original.width), 1)
+        resized = original.resize((width, height), PILImage.Resampling.LANCZOS)
+        for format_name in available_formats():
+            pil_format, extension, _, options = FORMATS[format_name]
+            image = resized
+            if pil_format == "JPEG" and image.mode != "RGB":
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+            path = rendition_name(name, width, extension)
+            if output.exists(path):
+                output.delete(path)
+            renditions.append(
+                {
+                    "name": output.save(path, ContentFile(buffer.getvalue())),
+                    "format": format_name,
+                    "width": width,
+                    "height": height,
+                }
+            )
+    return original.width, original.height, renditions
+
+
+def generate_renditions(image):
+    """Render ``image`` (an ``Image`` instance) and store the result on its row"""
+    # Images sharing a content-addressed file share its renditions
+    rendered = (
+        type(image)
+        .objects.filter(image=image.image.name, renditions_generated_at__isnull=False)
+        .exclude(pk=image.pk)
+        .values_list("width", "height", "renditions")
+        .first()
+    )
+    width, height, renditions = rendered or render_image(
+        image.image.name, image.image.storage
+    )
+    image.width, image.height, image.renditions = width, height, renditions
+    image.renditions_generated_at = timezone.now()
+    type(image).objects.filter(pk=image.pk).update(
+        width=width,
+        height=height,
+        renditions=renditions,
+        renditions_generated_at=image.renditions_generated_at,
+    )
+
+
+def generate_renditions_for(image_id):
+    """``transaction.on_commit`` callback for freshly uploaded images"""
+    from .cache import PAGES, bump_namespace
+    from .models import FeedCard, Image
+
+    image = Image.objects.filter(pk=image_id).first()
+    if image is None or not image.image:
+        return
+    try:
+        generate_renditions(image)
+    except (OSError, ValueError):
+        logger.exception("Could not generate renditions for image %s", image_id)
+        return
+    FeedCard.objects.refresh([image.property_id])
+    bump_namespace(PAGES)
+
+
+def _setup_worker():
+    import django
+
+    django.setup()
+
+
+def _render_job(image_id, name):
+    try:
+        return image_id, render_image(name), None
+    except (OSError, ValueError) as error:
+        return image_id, None, f"{type(error).__name__}: {error}"
+
+
+def render_images(jobs, workers):
+    """
+    Yield ``(image_id, result, error)`` for ``(image_id, name)`` jobs, in a
+    pool of ``workers`` processes with at most ``2 * workers`` in flight,
+    or inline when ``workers`` is 1.
+    """
+    if workers <= 1:
+        for job in jobs:
+            yield _render_job(*job)
+        return
+
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    pending = deque()
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        while True:
+            while len(pending) < 2 * workers and (job := next(jobs, None)):
+                pending.append(pool.submit(_render_job, *job))
+            if not pending:
+                break
+            yield pending.popleft().result()
+
+
+# Template helpers
+
+
+def rendition_url(name):
+    return rendition_storage().url(name)
+
+
+def _srcset(renditions, format_name):
+    return ", ".join(
+        f"{rendition_url(item['name'])} {item['width']}w"
+        for item in sorted(renditions, key=lambda item: item["width"])
+        if item["format"] == format_name
+    )
+
+
+def picture(renditions, fallback_url=None):
+    """
+    Data for a ``<picture>`` element: ``{"src", "srcset", "sources"}``,
+    where ``sources`` lists ``{"type", "srcset"}`` for the modern formats,
+    best first. Without renditions only ``src`` (``fallback_url``) is set.
+    """
+    jpegs = sorted(
+        (item for item in renditions or [] if item["format"] == "jpeg"),
+        key=lambda item: item["width"],
+    )
+    if not jpegs:
+        return {"src": fallback_url, "srcset": "", "sources": []}
+    src = next((item for item in jpegs if item["width"] >= THUMBNAIL_WIDTH), jpegs[-1])
+    present = {item["format"] for item in renditions}
+    return {
+        "src": rendition_url(src["name"]),
+        "srcset": _srcset(renditions, "jpeg"),
+        "sources": [
+            {"type": FORMATS[name][2], "srcset": _srcset(renditions, name)}
+            for name in FORMATS
+            if name != "jpeg" and name in present
+        ],
+    }
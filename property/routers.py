@@ -0,0 +1,168 @@
+"""
+Database Routers
+Send listing reads to replicas, with read-your-writes pinning and fallback
+to the primary
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Whether the request handled in this context reads from the primary, and
+# whether it has written; context variables follow requests into
+# sync_to_async threads
+_pinned = ContextVar("property_pinned_to_primary", default=False)
+_wrote = ContextVar("property_wrote_to_primary", default=False)
+
+# The read database of the request handled in this context, chosen on its
+# first read so all its queries see one replica's state. A dict set per
+# request, so concurrent tasks of an async view share the choice; None
+# outside requests, where every read chooses again.
+_replica = ContextVar("property_read_database", default=None)
+
+# Replica alias -> time.monotonic() before which it is not tried again
+_unavailable_until = {}
+
+
+def pinned_to_primary():
+    return _pinned.get()
+
+
+def pin_to_primary():
+    """Read from the primary for the rest of this request"""
+    _pinned.set(True)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block"""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def replica_available(alias):
+    """
+    Whether ``alias`` accepts connections. A replica that fails is skipped for
+    ``PROPERTY_REPLICA_RETRY_SECONDS`` so requests do not each wait for it.
+    """
+    if _unavailable_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _unavailable_until[alias] = (
+            time.monotonic() + settings.PROPERTY_REPLICA_RETRY_SECONDS
+        )
+        return False
+    _unavailable_until.pop(alias, None)
+    return True
+
+
+def choose_read_database():
+    """A random available alias of ``PROPERTY_READ_DATABASES``, or ``default``"""
+    replicas = list(settings.PROPERTY_READ_DATABASES)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if replica_available(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """
+    Send reads of ``settings.PROPERTY_REPLICA_MODELS`` to a random available
+    alias of ``settings.PROPERTY_READ_DATABASES``, the same one for the whole
+    request, and everything else to ``default``. Reads stay on ``default``
+    inside an atomic block on it, once the request has written one of those
+    models (see ``ReplicaPinningMiddleware``) and when no replica is
+    available.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.label not in settings.PROPERTY_REPLICA_MODELS
+            or _pinned.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        chosen = _replica.get()
+        if chosen is None:
+            return choose_read_database()
+        if "alias" not in chosen:
+            chosen["alias"] = choose_read_database()
+        return chosen["alias"]
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label in settings.PROPERTY_REPLICA_MODELS:
+            _pinned.set(True)
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes across requests: a request that writes gets a cookie
+    that keeps the client's next requests on the primary for
+    ``PROPERTY_REPLICA_PIN_SECONDS``, longer than replication lags, so the
+    page a form redirects to shows the change. Also scopes the replica
+    ``ReplicaRouter`` chooses to the request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        tokens = self.start(request)
+        try:
+            return self.finish(self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    async def __acall__(self, request):
+        tokens = self.start(request)
+        try:
+            return self.finish(await self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    def start(self, request):
+        pinned = settings.PROPERTY_REPLICA_PIN_COOKIE in request.COOKIES
+        return _pinned.set(pinned), _wrote.set(False), _replica.set({})
+
+    def reset(self, tokens):
+        pinned, wrote, replica = tokens
+        _pinned.reset(pinned)
+        _wrote.reset(wrote)
+        _replica.reset(replica)
+
+    def finish(self, response):
+        if _wrote.get():
+            response.set_cookie(
+                settings.PROPERTY_REPLICA_PIN_COOKIE,
+                "1",
+                max_age=settings.PROPERTY_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
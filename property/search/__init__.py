@@ -0,0 +1,63 @@
+"""
+Full-text search for property listings
+
+The backend is chosen with ``settings.PROPERTY_SEARCH_BACKEND``. Backends keep
+their index in sync through the signal handlers in ``property.signals`` and
+the bulk importer.
+"""
+
+from functools import cache
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+from django.utils.module_loading import import_string
+
+
+@cache
+def get_search_backend():
+    return import_string(settings.PROPERTY_SEARCH_BACKEND)()
+
+
+def search_properties(queryset, query, fields=None, limit=None):
+    """
+    Restrict ``queryset`` to properties matching ``query``, best match first.
+    Every match is kept, through a subquery of the index, unless ``limit``
+    caps them at that many best matches (read from the index first).
+    """
+    backend = get_search_backend()
+    if limit is not None:
+        return _ranked(queryset, backend.search(query, limit, fields))
+    matches = backend.matches(query, fields)
+    if matches is None:
+        return queryset.none()
+    queryset = queryset.filter(pk__in=matches)
+    rank = backend.rank(query, fields)
+    if rank is None:
+        return queryset
+    return queryset.annotate(search_rank=rank).order_by("search_rank")
+
+
+async def asearch_properties(queryset, query, fields=None, limit=None):
+    """
+    ``search_properties`` for async views; a capped search queries the index
+    in a thread
+    """
+    if limit is None:
+        return search_properties(queryset, query, fields)
+    search = sync_to_async(get_search_backend().search)
+    return _ranked(queryset, await search(query, limit, fields))
+
+
+def _ranked(queryset, ids):
+    if not ids:
+        return queryset.none()
+    return (
+        queryset.filter(pk__in=ids)
+        .annotate(
+            search_rank=Case(
+                *[When(pk=pk, then=Value(rank)) for rank, pk in enumerate(ids)],
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("search_rank")
+    )
@@ -0,0 +1,47 @@
+"""
+Search backend interface
+"""
+
+SEARCH_FIELDS = ("title", "description", "location")
+
+
+class BaseSearchBackend:
+    """
+    A search backend returns property ids for a free-text query, best match
+    first, and is told about every property whose indexed text may have
+    changed.
+    """
+
+    def search(self, query, limit, fields=None):
+        """
+        Return up to ``limit`` matching property ids, best match first.
+        ``fields`` restricts matching to some of SEARCH_FIELDS.
+        """
+        raise NotImplementedError
+
+    def matches(self, query, fields=None):
+        """
+        An expression selecting the ids of every matching property, for
+        ``pk__in``, or None when ``query`` cannot match anything
+        """
+        raise NotImplementedError
+
+    def rank(self, query, fields=None):
+        """
+        An expression ordering matching properties best first, or None when
+        the backend does not rank
+        """
+        return None
+
+    def index_properties(self, property_ids):
+        """(Re)index the given properties, dropping any that no longer exist"""
+
+    def index_location(self, location_id):
+        """Reindex the properties of a location whose text changed"""
+
+    def remove_properties(self, property_ids):
+        """Drop the given properties from the index"""
+
+    def rebuild(self):
+        """Rebuild the whole index; returns the number of indexed properties"""
+        return 0
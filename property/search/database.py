@@ -0,0 +1,32 @@
+"""
+Database search backend
+Portable fallback that scans with ``icontains``; keeps no index of its own
+"""
+
+from django.db.models import Q
+from ..models import Property
+from .base import SEARCH_FIELDS, BaseSearchBackend
+
+LOOKUPS = {
+    "title": ["title"],
+    "description": ["description"],
+    "location": ["location__name", "location__city", "location__country"],
+}
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    def search(self, query, limit, fields=None):
+        matches = self.matches(query, fields)
+        if matches is None:
+            return []
+        return list(matches.values_list("pk", flat=True)[:limit])
+
+    def matches(self, query, fields=None):
+        query = query.strip()
+        if not query:
+            return None
+        condition = Q()
+        for field in fields or SEARCH_FIELDS:
+            for lookup in LOOKUPS[field]:
+                condition |= Q(**{f"{lookup}__icontains": query})
+        return Property.objects.filter(condition).values("pk")
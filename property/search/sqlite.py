@@ -0,0 +1,121 @@
+"""
+SQLite FTS5 search backend
+Ranks matches over title, description and location text with bm25
+"""
+
+import re
+from django.db import connection, connections, router
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from ..models import Location, Property
+from .base import BaseSearchBackend
+
+TABLE = "property_search"
+
+# bm25 column weights: title, description, location
+WEIGHTS = (10.0, 1.0, 5.0)
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Property rows with their location flattened to one text column
+SOURCE = (
+    f"SELECT p.id, p.title, p.description, "
+    f"COALESCE(l.name || ' ' || l.city || ' ' || l.state || ' ' || l.country, '') "
+    f"FROM {Property._meta.db_table} p "
+    f"LEFT JOIN {Location._meta.db_table} l ON l.id = p.location_id"
+)
+
+# Keeps statements under SQLite's bound parameter limit
+CHUNK = 500
+
+
+def match_expression(query, fields=None):
+    """
+    Turn free text into an FTS5 query: every word must match as a prefix,
+    and FTS5 operators typed by users are treated as plain words.
+    """
+    expression = " ".join(f'"{token}"*' for token in TOKEN.findall(query))
+    if expression and fields:
+        expression = f"{{{' '.join(fields)}}} : ({expression})"
+    return expression
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    def search(self, query, limit, fields=None):
+        expression = match_expression(query, fields)
+        if not expression:
+            return []
+        # A read like any other, so it may go to a replica
+        with connections[router.db_for_read(Property)].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s "
+                f"ORDER BY bm25({TABLE}, %s, %s, %s) LIMIT %s",
+                [expression, *WEIGHTS, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def matches(self, query, fields=None):
+        expression = match_expression(query, fields)
+        if not expression:
+            return None
+        return RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [expression])
+
+    def rank(self, query, fields=None):
+        expression = match_expression(query, fields)
+        if not expression:
+            return None
+        # bm25 of the listing's own row: FTS5 seeks the match to the rowid
+        return RawSQL(
+            f"(SELECT bm25({TABLE}, %s, %s, %s) FROM {TABLE} "
+            f"WHERE {TABLE} MATCH %s AND rowid = {Property._meta.db_table}.id)",
+            [*WEIGHTS, expression],
+            output_field=FloatField(),
+        )
+
+    def index_properties(self, property_ids):
+        property_ids = list(property_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(property_ids), CHUNK):
+                chunk = property_ids[start : start + CHUNK]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(
+                    f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", chunk
+                )
+                cursor.execute(
+                    f"INSERT INTO {TABLE} (rowid, title, description, location) "
+                    f"{SOURCE} WHERE p.id IN ({placeholders})",
+                    chunk,
+                )
+
+    def index_location(self, location_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN (SELECT id FROM "
+                f"{Property._meta.db_table} WHERE location_id = %s)",
+                [location_id],
+            )
+            cursor.execute(
+                f"INSERT INTO {TABLE} (rowid, title, description, location) "
+                f"{SOURCE} WHERE p.location_id = %s",
+                [location_id],
+            )
+
+    def remove_properties(self, property_ids):
+        property_ids = list(property_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(property_ids), CHUNK):
+                chunk = property_ids[start : start + CHUNK]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(
+                    f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", chunk
+                )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+            cursor.execute(
+                f"INSERT INTO {TABLE} (rowid, title, description, location) {SOURCE}"
+            )
+            cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+            cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
+            return cursor.fetchone()[0]
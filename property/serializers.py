@@ -1,5 +1,38 @@
+from pathlib import PurePath
+from django.conf import settings
+from django.core.validators import get_available_image_extensions
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Location
+from .models import Image, Location, Property, UploadSession
+
+
+class SparseFieldsetMixin:
+    """
+    Serialize only the fields named in the ``fields`` argument (e.g. from
+    ``?fields=id,title``), or every field when it is None
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, value):
+        """
+        Field names listed in a comma-separated ``value``, or None when it is
+        None. Raises ``ValidationError`` on unknown names.
+        """
+        if value is None:
+            return None
+        fields = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = [name for name in fields if name not in cls().fields]
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": f"Unknown fields: {', '.join(unknown)}"}
+            )
+        return fields
 
 
 class LocationAutocompleteSerializer(serializers.ModelSerializer):
@@ -15,3 +48,113 @@ class LocationAutocompleteSerializer(serializers.ModelSerializer):
             "full_address",
             "property_count",
         ]
+
+
+class PropertyCardSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    location = serializers.CharField(source="location.full_address", default=None)
+    price = serializers.CharField(source="formatted_price")
+    primary_image_url = serializers.CharField(read_only=True)
+    url = serializers.SerializerMethodField()
+    # Only on radius searches, which annotate it
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Property
+        fields = [
+            "id",
+            "title",
+            "property_type",
+            "status",
+            "price",
+            "location",
+            "primary_image_url",
+            "url",
+            "distance_km",
+        ]
+
+    def get_url(self, obj):
+        return reverse("property:property_detail", args=[obj.pk])
+
+
+class LocationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Location
+        fields = ["id", "name", "city", "state", "country", "latitude", "longitude"]
+
+
+class ImageSerializer(serializers.ModelSerializer):
+    url = serializers.CharField(source="image.url")
+
+    class Meta:
+        model = Image
+        fields = ["id", "url", "caption", "is_primary", "order"]
+
+
+class PropertyDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    price = serializers.CharField(source="formatted_price")
+    location = LocationSerializer(read_only=True)
+    images = ImageSerializer(many=True, read_only=True)
+    primary_image_url = serializers.CharField(read_only=True)
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Property
+        fields = [
+            "id",
+            "external_id",
+            "title",
+            "description",
+            "property_type",
+            "status",
+            "price",
+            "bedrooms",
+            "bathrooms",
+            "location",
+            "images",
+            "primary_image_url",
+            "url",
+            "created_at",
+            "updated_at",
+        ]
+
+    def get_url(self, obj):
+        return reverse("property:property_detail", args=[obj.pk])
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "property",
+            "filename",
+            "caption",
+            "size",
+            "received",
+            "complete",
+            "url",
+        ]
+        read_only_fields = ["received", "complete"]
+
+    def get_url(self, obj):
+        return reverse("upload_session", args=[obj.pk])
+
+    def validate_filename(self, value):
+        extension = PurePath(value).suffix[1:].lower()
+        if extension not in get_available_image_extensions():
+            raise serializers.ValidationError(f"“.{extension}” is not an image type.")
+        return value
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.PROPERTY_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Uploads are 1 to {settings.PROPERTY_UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
+
+
+class UploadBatchSerializer(serializers.Serializer):
+    uploads = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+    primary = serializers.UUIDField(required=False, allow_null=True)
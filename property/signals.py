@@ -0,0 +1,193 @@
+"""
+Signal handlers for Property app models
+Keep derived data (location counters, image file references, search and
+autocomplete indexes, feed cards, caches and image renditions) in sync with
+writes,
+inline or by queueing a background task
+"""
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .autocomplete import entry_for_location, location_index
+from .cache import PAGES, PROPERTIES, bump_namespace
+from .database import configure_sqlite
+from .models import FeedCard, Image, Location, MapCell, MediaBlob, Property
+from .models.image import gallery_saved
+from .profiling import install_query_recorder
+from .search import get_search_backend
+from .tasks import generate_image_renditions, rebuild_feed_cards
+
+TRACKED_FIELDS = ("location_id", "status")
+
+
+def _counter_deltas(location_id, status, sign):
+    if location_id is None:
+        return {}
+    return {location_id: (sign, sign if status == "available" else 0)}
+
+
+def _apply_counter_deltas(deltas):
+    for location_id, (total, available) in deltas.items():
+        if total or available:
+            Location.objects.filter(pk=location_id).update(
+                property_count=F("property_count") + total,
+                available_property_count=F("available_property_count") + available,
+            )
+            transaction.on_commit(
+                lambda location_id=location_id, total=total: (
+                    location_index.adjust_count(location_id, total)
+                )
+            )
+    changed = [location_id for location_id, (total, _) in deltas.items() if total]
+    if changed:
+        transaction.on_commit(lambda: MapCell.objects.refresh_locations(changed))
+
+
+def _refresh_feed_cards(property_ids):
+    # Before the caches are bumped on commit, so pages cached after that
+    # read the new cards
+    transaction.on_commit(lambda: FeedCard.objects.refresh(property_ids))
+
+
+def _invalidate_caches(*namespaces):
+    # Bumped right away and again on commit, so a concurrent request cannot
+    # cache data read before the commit under the new version
+    bump_namespace(*namespaces)
+    transaction.on_commit(lambda: bump_namespace(*namespaces))
+
+
+connection_created.connect(configure_sqlite)
+connection_created.connect(install_query_recorder)
+
+
+@receiver(setting_changed)
+def search_backend_changed(setting, **kwargs):
+    if setting == "PROPERTY_SEARCH_BACKEND":
+        get_search_backend.cache_clear()
+
+
+@receiver(post_save, sender=Location)
+def location_saved(sender, instance, created, **kwargs):
+    entry = entry_for_location(instance, instance.property_count)
+    transaction.on_commit(lambda: location_index.upsert_location(entry))
+    loaded = getattr(instance, "_loaded_geohash", None)
+    cells = {instance.geohash, loaded}
+    transaction.on_commit(lambda: MapCell.objects.refresh(cells - {None}))
+    instance._loaded_geohash = instance.geohash
+    if not created:
+        get_search_backend().index_location(instance.pk)
+        # A location can hold many listings: rebuild their cards in a worker,
+        # which invalidates the pages cached from the old cards meanwhile
+        # through the shared cache (run_workers requires one)
+        location_id = instance.pk
+        transaction.on_commit(
+            lambda: rebuild_feed_cards.enqueue(location_id=location_id)
+        )
+        if loaded != instance.geohash:
+            # The listings carry the coordinates for radius searches
+            instance.properties.update(
+                latitude=instance.latitude,
+                longitude=instance.longitude,
+                geohash=instance.geohash,
+            )
+            _invalidate_caches(PROPERTIES, PAGES)
+        else:
+            _invalidate_caches(PAGES)
+
+
+@receiver(post_delete, sender=Location)
+def location_deleted(sender, instance, **kwargs):
+    location_id = instance.pk
+    transaction.on_commit(lambda: location_index.remove_location(location_id))
+    transaction.on_commit(lambda: MapCell.objects.refresh([instance.geohash]))
+    _invalidate_caches(PAGES)
+
+
+@receiver(pre_save, sender=Property)
+def property_saving(sender, instance, **kwargs):
+    """Load the stored location/status when the instance did not bring them"""
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    if instance.pk is None or all(field in loaded for field in TRACKED_FIELDS):
+        return
+    stored = Property.objects.filter(pk=instance.pk).values(*TRACKED_FIELDS).first()
+    if stored is not None:
+        instance._loaded_values = {**stored, **loaded}
+
+
+@receiver(post_save, sender=Property)
+def property_saved(sender, instance, created, **kwargs):
+    deltas = {}
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    if not created and all(field in loaded for field in TRACKED_FIELDS):
+        deltas = _counter_deltas(loaded["location_id"], loaded["status"], -1)
+
+    for location_id, (total, available) in _counter_deltas(
+        instance.location_id, instance.status, 1
+    ).items():
+        old_total, old_available = deltas.get(location_id, (0, 0))
+        deltas[location_id] = (old_total + total, old_available + available)
+
+    _apply_counter_deltas(deltas)
+    get_search_backend().index_properties([instance.pk])
+    _refresh_feed_cards([instance.pk])
+    _invalidate_caches(PROPERTIES, PAGES)
+    instance._loaded_values = {
+        **loaded,
+        **{field: getattr(instance, field) for field in TRACKED_FIELDS},
+    }
+
+
+@receiver(post_delete, sender=Property)
+def property_deleted(sender, instance, **kwargs):
+    _apply_counter_deltas(_counter_deltas(instance.location_id, instance.status, -1))
+    get_search_backend().remove_properties([instance.pk])
+    _invalidate_caches(PROPERTIES, PAGES)
+
+
+def _touch_property(image):
+    """A gallery change is a change of the listing, e.g. for API validators"""
+    Property.objects.filter(pk=image.property_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, **kwargs):
+    _touch_property(instance)
+    loaded = getattr(instance, "_loaded_image_name", None)
+    if instance.image.name != loaded:
+        MediaBlob.objects.adjust({instance.image.name: 1, loaded: -1})
+    _refresh_feed_cards([instance.property_id])
+    _invalidate_caches(PAGES)
+    if (
+        settings.PROPERTY_IMAGE_RENDITIONS_ON_UPLOAD
+        and instance.image
+        and instance.renditions_generated_at is None
+    ):
+        image_id = instance.pk
+        transaction.on_commit(lambda: generate_image_renditions.enqueue(image_id))
+
+
+@receiver(gallery_saved, sender=Image)
+def gallery_changed(sender, property_ids, using, **kwargs):
+    Property.objects.using(using).filter(pk__in=property_ids).update(
+        updated_at=timezone.now()
+    )
+    _refresh_feed_cards(property_ids)
+    _invalidate_caches(PAGES)
+
+
+@receiver(post_delete, sender=Image)
+def image_deleted(sender, instance, origin=None, **kwargs):
+    deleted = origin.model if isinstance(origin, QuerySet) else type(origin)
+    # Not when the delete cascades from the listing or its location
+    if deleted is Image:
+        _touch_property(instance)
+        _refresh_feed_cards([instance.property_id])
+    MediaBlob.objects.adjust({instance.image.name: -1})
+    _invalidate_caches(PAGES)
@@ -0,0 +1,376 @@
+"""
+Similar listings
+Properties as feature vectors (price, rooms, type, coordinates and
+optionally description terms) and their nearest available neighbours,
+stored in ``PropertyNeighbours`` so the detail page reads them with the
+listing. Building needs NumPy (the ``similarity`` extra); reading does not.
+
+Neighbours are searched within blocks: listings whose location geohashes
+share a ``BLOCK_PRECISION`` prefix (about 5 km), or that share a location
+without coordinates. A block with too few available listings widens to
+its parent prefix, so sparse areas still get recommendations.
+"""
+
+import math
+import re
+import zlib
+from types import SimpleNamespace
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from . import geo
+from .models import Property, PropertyNeighbours
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BLOCK_PRECISION = 5
+
+# Fixed scales, so a listing's vector does not depend on the others and
+# unchanged listings keep theirs between builds: a price this many times
+# higher, one more room, or this far away each count as a distance of one
+PRICE_SCALE = 1.5
+ROOM_SCALE = 1
+LOCATION_SCALE_KM = 10
+
+# Weight of a different property type, and of description terms (hashed
+# into TEXT_DIMENSIONS TF-IDF buckets)
+TYPE_WEIGHT = 1.5
+TEXT_WEIGHT = 1.0
+TEXT_DIMENSIONS = 32
+
+# Distance matrix entries computed at once, bounding memory on big blocks
+CHUNK_ELEMENTS = 1 << 22
+
+# Rows written per INSERT
+BATCH_SIZE = 5000
+
+# Key past every prefix, for range ends in the sorted keys
+HIGHEST = "\uffff"
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class SimilarityUnavailable(Exception):
+    """Raised when building neighbours without NumPy installed"""
+
+
+def _require_numpy():
+    if np is None:
+        raise SimilarityUnavailable(
+            "Similar listings need NumPy: pip install '.[similarity]'"
+        )
+
+
+def _text_features(descriptions):
+    """
+    L2-normalised TF-IDF of description terms hashed into buckets. The
+    document frequencies come from the listings loaded, so incremental
+    updates drift from a full build until the next ``--full``.
+    """
+    counts = np.zeros((len(descriptions), TEXT_DIMENSIONS), dtype=np.float32)
+    for row, description in enumerate(descriptions):
+        for token in TOKEN.findall(description.lower()):
+            counts[row, zlib.crc32(token.encode()) % TEXT_DIMENSIONS] += 1
+    document_frequency = (counts > 0).sum(axis=0)
+    counts *= np.log((1 + len(counts)) / (1 + document_frequency)) + 1
+    norms = np.linalg.norm(counts, axis=1, keepdims=True)
+    return counts / np.where(norms > 0, norms, 1)
+
+
+def load(text=None):
+    """
+    Every listing's vector, availability and update time, ordered by block
+    key: the location geohash, or ``~`` and the location id when it has no
+    coordinates (``~none`` for listings without a location)
+    """
+    _require_numpy()
+    if text is None:
+        text = settings.PROPERTY_SIMILARITY_TEXT
+    fields = [
+        "pk",
+        "price",
+        "bedrooms",
+        "bathrooms",
+        "property_type",
+        "status",
+        "location_id",
+        "location__geohash",
+        "location__latitude",
+        "location__longitude",
+        "updated_at",
+    ]
+    if text:
+        fields.append("description")
+    rows = list(
+        Property.objects.order_by().values_list(*fields).iterator(chunk_size=10000)
+    )
+    columns = list(zip(*rows)) or [()] * len(fields)
+    del rows
+    (
+        ids,
+        prices,
+        bedrooms,
+        bathrooms,
+        types,
+        statuses,
+        location_ids,
+        geohashes,
+        latitudes,
+        longitudes,
+        updated,
+    ) = columns[:11]
+
+    keys = np.array(
+        [
+            geohash
+            or "~" + ("%010d" % location_id if location_id is not None else "none")
+            for geohash, location_id in zip(geohashes, location_ids)
+        ]
+    )
+    order = np.argsort(keys, kind="stable")
+
+    type_codes = [code for code, _ in Property.PROPERTY_TYPES]
+    type_index = np.array([type_codes.index(value) for value in types], dtype=int)
+    latitude = np.radians(np.array(latitudes, dtype=float))
+    longitude = np.radians(np.array(longitudes, dtype=float))
+    scale = geo.EARTH_RADIUS_KM / LOCATION_SCALE_KM
+    parts = [
+        np.log1p(np.array(prices, dtype=float))[:, None] / math.log(PRICE_SCALE),
+        np.array([bedrooms, bathrooms], dtype=float).T / ROOM_SCALE,
+        np.eye(len(type_codes))[type_index] * TYPE_WEIGHT,
+        np.nan_to_num(
+            np.column_stack(
+                [
+                    np.cos(latitude) * np.cos(longitude),
+                    np.cos(latitude) * np.sin(longitude),
+                    np.sin(latitude),
+                ]
+            )
+            * scale
+        ),
+    ]
+    if text:
+        parts.append(_text_features(columns[11]) * TEXT_WEIGHT)
+    vectors = np.hstack(parts).astype(np.float32)
+
+    keys = keys[order]
+    return SimpleNamespace(
+        ids=np.array(ids, dtype=np.int64)[order],
+        keys=keys,
+        blocks=np.array(
+            [key if key[0] == "~" else key[:BLOCK_PRECISION] for key in keys]
+        ),
+        vectors=vectors[order],
+        available=np.array([status == "available" for status in statuses])[order],
+        updated=np.array([value.timestamp() for value in updated])[order],
+    )
+
+
+def _parent(prefix):
+    if prefix.startswith("~") and len(prefix) > 1:
+        return "~"
+    return prefix[:-1]
+
+
+def candidate_range(keys, block, minimum):
+    """
+    ``(prefix, start, stop)``: the narrowest prefix of ``block`` whose range
+    in the sorted ``keys`` holds at least ``minimum`` of them (or all)
+    """
+    prefix = block
+    while True:
+        start = np.searchsorted(keys, prefix, "left")
+        stop = np.searchsorted(keys, prefix + HIGHEST, "left")
+        if stop - start >= minimum or not prefix:
+            return prefix, start, stop
+        prefix = _parent(prefix)
+
+
+def _blocks(data, positions):
+    """``(block, members)`` for sorted ``positions``, whose blocks are contiguous"""
+    blocks, starts = np.unique(data.blocks[positions], return_index=True)
+    for block, members in zip(blocks, np.split(positions, starts[1:])):
+        yield block, members
+
+
+def neighbours(data, positions, count):
+    """
+    ``{property id: (neighbour ids, radius)}`` for the listings at
+    ``positions`` (indexes into ``data``): their ``count`` nearest available
+    listings in their block
+    """
+    candidates = np.flatnonzero(data.available)
+    candidate_keys = data.keys[candidates]
+    results = {}
+    for block, members in _blocks(data, np.sort(positions)):
+        _, start, stop = candidate_range(candidate_keys, block, count + 1)
+        pool = candidates[start:stop]
+        if not len(pool):
+            results.update((data.ids[member], ([], math.inf)) for member in members)
+            continue
+        # Centred, so float32 keeps its precision in the norm expansion
+        centre = data.vectors[pool].mean(axis=0)
+        pool_vectors = data.vectors[pool] - centre
+        pool_norms = (pool_vectors**2).sum(axis=1)
+        rows = max(1, CHUNK_ELEMENTS // len(pool))
+        for offset in range(0, len(members), rows):
+            chunk = members[offset : offset + rows]
+            vectors = data.vectors[chunk] - centre
+            squared = (
+                (vectors**2).sum(axis=1)[:, None]
+                + pool_norms[None, :]
+                - 2 * vectors @ pool_vectors.T
+            )
+            # A listing is not its own neighbour
+            columns = np.searchsorted(pool, chunk)
+            own = (columns < len(pool)) & (
+                pool[np.minimum(columns, len(pool) - 1)] == chunk
+            )
+            squared[np.flatnonzero(own), columns[own]] = np.inf
+            kept = min(count, len(pool))
+            nearest = np.argpartition(squared, kept - 1, axis=1)[:, :kept]
+            distances = np.take_along_axis(squared, nearest, axis=1)
+            ranked = np.argsort(distances, axis=1, kind="stable")
+            nearest = np.take_along_axis(nearest, ranked, axis=1)
+            distances = np.take_along_axis(distances, ranked, axis=1)
+            # Unfound neighbours (infinite distances) sort last
+            found = np.isfinite(distances).sum(axis=1)
+            radius = np.where(
+                found == count, np.sqrt(np.maximum(distances[:, -1], 0)), np.inf
+            )
+            for pk, ids, length, farthest in zip(
+                data.ids[chunk].tolist(),
+                data.ids[pool[nearest]].tolist(),
+                found.tolist(),
+                radius.tolist(),
+            ):
+                results[pk] = (ids[:length], farthest)
+    return results
+
+
+def _save(results, built_at, replace=True):
+    """
+    Store ``results`` of ``neighbours()``. Rows go in with a plain
+    ``executemany``: building a model instance per listing costs more than
+    the neighbour search.
+    """
+    alias = router.db_for_write(PropertyNeighbours)
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    columns = ", ".join(
+        quote(PropertyNeighbours._meta.get_field(name).column)
+        for name in ["property", "ids", "radius", "built_at"]
+    )
+    sql = (
+        f"INSERT INTO {quote(PropertyNeighbours._meta.db_table)} ({columns}) "
+        "VALUES (%s, %s, %s, %s)"
+    )
+    built_at = connection.ops.adapt_datetimefield_value(built_at)
+    items = list(results.items())
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        for start in range(0, len(items), BATCH_SIZE):
+            batch = items[start : start + BATCH_SIZE]
+            if replace:
+                PropertyNeighbours.objects.using(alias).filter(
+                    pk__in=[pk for pk, _ in batch]
+                ).delete()
+            cursor.executemany(
+                sql,
+                [
+                    (pk, PropertyNeighbours.pack(ids), radius, built_at)
+                    for pk, (ids, radius) in batch
+                ],
+            )
+
+
+def rebuild(count=None, text=None):
+    """Recompute the neighbours of every listing; returns how many"""
+    count = count or settings.PROPERTY_SIMILARITY_NEIGHBOURS
+    built_at = timezone.now()
+    data = load(text)
+    results = neighbours(data, np.arange(len(data.ids)), count)
+    with transaction.atomic():
+        PropertyNeighbours.objects.all().delete()
+        _save(results, built_at, replace=False)
+    return len(results)
+
+
+def stale_positions(data, count):
+    """
+    Positions of the listings whose stored neighbours may be wrong: those
+    added or updated since their build, those whose list names a changed
+    or no longer available listing, and those a changed listing is now
+    closer to than their farthest neighbour
+    """
+    stored = list(
+        PropertyNeighbours.objects.order_by("pk").values_list(
+            "pk", "ids", "radius", "built_at"
+        )
+    )
+    stored_ids = np.array([row[0] for row in stored], dtype=np.int64)
+    built = np.array([row[3].timestamp() for row in stored])
+    radius = np.array([row[2] for row in stored])
+
+    index = np.searchsorted(stored_ids, data.ids)
+    index = np.minimum(index, max(len(stored_ids) - 1, 0))
+    has_row = (
+        stored_ids[index] == data.ids
+        if len(stored_ids)
+        else np.zeros(len(data.ids), bool)
+    )
+    changed = ~has_row
+    changed[has_row] = data.updated[has_row] > built[index[has_row]]
+
+    # Lists naming a changed listing, or one that is gone or unavailable
+    valid = data.ids[data.available & ~changed]
+    stale = changed.copy()
+    lists = [np.frombuffer(bytes(row[1]), dtype="<i8") for row in stored]
+    if lists:
+        lengths = np.array([len(ids) for ids in lists])
+        named = np.concatenate(lists)
+        invalid = ~np.isin(named, valid)
+        owners = np.repeat(np.arange(len(lists)), lengths)[invalid]
+        bad_rows = np.zeros(len(stored_ids), bool)
+        bad_rows[owners] = True
+        stale[has_row] |= bad_rows[index[has_row]]
+
+    # Changed listings closer than a listing's farthest neighbour
+    entering = np.flatnonzero(changed & data.available)
+    if len(entering):
+        entering_keys = data.keys[entering]
+        candidate_keys = data.keys[data.available]
+        listing_radius = np.full(len(data.ids), np.inf)
+        listing_radius[has_row] = radius[index[has_row]]
+        for block, members in _blocks(data, np.flatnonzero(~stale)):
+            prefix, _, _ = candidate_range(candidate_keys, block, count + 1)
+            start = np.searchsorted(entering_keys, prefix, "left")
+            stop = np.searchsorted(entering_keys, prefix + HIGHEST, "left")
+            if start == stop:
+                continue
+            centre = data.vectors[members].mean(axis=0)
+            vectors = data.vectors[members] - centre
+            others = data.vectors[entering[start:stop]] - centre
+            squared = (
+                (vectors**2).sum(axis=1)[:, None]
+                + (others**2).sum(axis=1)[None, :]
+                - 2 * vectors @ others.T
+            )
+            closest = np.sqrt(np.maximum(squared.min(axis=1), 0))
+            stale[members[closest < listing_radius[members]]] = True
+    return np.flatnonzero(stale)
+
+
+def update(count=None, text=None):
+    """
+    Recompute only the neighbours that listing changes since the last build
+    can have affected; returns how many
+    """
+    count = count or settings.PROPERTY_SIMILARITY_NEIGHBOURS
+    built_at = timezone.now()
+    data = load(text)
+    positions = stale_positions(data, count)
+    _save(neighbours(data, positions, count), built_at)
+    return len(positions)
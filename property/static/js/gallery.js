@@ -1,6 +1,8 @@
-function changeImage(imageUrl, thumbnail) {
-    // Update main image
-    document.getElementById('mainImage').src = imageUrl;
+function changeImage(imageUrl, thumbnail, srcset) {
+    // Update main image; srcset lists the image's renditions, if any
+    const mainImage = document.getElementById('mainImage');
+    mainImage.srcset = srcset || '';
+    mainImage.src = imageUrl;
     
     // Update active thumbnail
     document.querySelectorAll('.thumbnail').forEach(thumb => {
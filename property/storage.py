@@ -0,0 +1,224 @@
+"""
+Media Storage Module
+Content-addressed storage for property images: each upload is stored once
+under its SHA-256, however many listings use it, and unreferenced blobs are
+garbage-collected (property.models.MediaBlob counts the references)
+"""
+
+import hashlib
+import os
+import re
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path, PurePosixPath
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+from django.utils import timezone
+
+# Bytes read at a time when hashing files
+CHUNK_SIZE = 1024 * 1024
+
+# <upload dir>/ab/cd/abcd…(64 hex digits).ext
+BLOB_NAME = re.compile(r"(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.\w+$")
+
+# Prefix of files being written; they are renamed into place once hashed
+PARTIAL_PREFIX = ".upload-"
+
+
+def image_storage():
+    """Storage of ``Image.image``, the STORAGES "property_images" alias"""
+    return storages["property_images"]
+
+
+def rendition_storage(storage=None):
+    """
+    Plain storage the renditions of ``storage`` (default: the image storage)
+    are written to, read from and deleted through: rooted and served like it,
+    but keeping the names it is given
+    """
+    storage = storage or image_storage()
+    return FileSystemStorage(location=storage.location, base_url=storage.base_url)
+
+
+def is_blob_name(name):
+    return bool(name and BLOB_NAME.search(name))
+
+
+def blob_name(directory, digest, extension):
+    return str(
+        PurePosixPath(directory) / digest[:2] / digest[2:4] / f"{digest}{extension}"
+    )
+
+
+def hash_chunks(chunks):
+    sha256 = hashlib.sha256()
+    for chunk in chunks:
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def hash_file(path):
+    with open(path, "rb") as file:
+        return hash_chunks(iter(lambda: file.read(CHUNK_SIZE), b""))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Saves a file as ``<upload dir>/ab/cd/<sha256><ext>`` of its content. The
+    content is hashed while it streams to a partial file, chunk by chunk, and
+    the partial file is renamed into place, or dropped when the blob is
+    already stored. Uploads Django spooled to a temporary file are hashed
+    there and moved instead of copied.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # _save picks the name; equal names mean equal content
+        return name
+
+    def _save(self, name, content):
+        name = PurePosixPath(name)
+        directory = Path(self.path(str(name.parent)))
+        directory.mkdir(parents=True, exist_ok=True)
+
+        if hasattr(content, "temporary_file_path"):
+            source = content.temporary_file_path()
+            digest = hash_file(source)
+        else:
+            source = directory / f"{PARTIAL_PREFIX}{uuid.uuid4().hex}"
+            digest = self._write_partial(source, content)
+
+        stored = blob_name(name.parent, digest, name.suffix.lower())
+        path = Path(self.path(stored))
+        try:
+            if path.exists():
+                # Refresh it so a concurrent garbage collection keeps it
+                os.utime(path)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                file_move_safe(str(source), str(path), allow_overwrite=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        finally:
+            if not hasattr(content, "temporary_file_path"):
+                Path(source).unlink(missing_ok=True)
+        return stored
+
+    def _write_partial(self, path, content):
+        sha256 = hashlib.sha256()
+        with open(
+            os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), "wb"
+        ) as file:
+            for chunk in content.chunks(CHUNK_SIZE):
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                sha256.update(chunk)
+                file.write(chunk)
+        return sha256.hexdigest()
+
+    def delete_blob(self, name):
+        """Delete the blob ``name`` and its renditions; return bytes freed"""
+        freed = 0
+        path = Path(self.path(name))
+        paths = [path]
+        # Named by property.renditions.rendition_name
+        renditions = Path(
+            rendition_storage(self).path(str(PurePosixPath(name).parent / "renditions"))
+        )
+        if renditions.is_dir():
+            paths += renditions.glob(f"{path.stem}-*")
+        for path in paths:
+            try:
+                freed += path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        return freed
+
+
+def _modified_before(path, cutoff):
+    try:
+        return path.stat().st_mtime < cutoff.timestamp()
+    except FileNotFoundError:
+        return False
+
+
+def collect_garbage(grace=timedelta(hours=24), dry_run=False, storage=None):
+    """
+    Recount the references of every blob, then delete blobs no image has used
+    for ``grace``, their renditions, and blob or partial files that have no
+    row and are as old (left by failed uploads and rolled back saves).
+    Return ``{"blobs", "orphans", "bytes"}`` deleted, or that would be.
+    """
+    from .models import MediaBlob
+
+    storage = storage or image_storage()
+    cutoff = timezone.now() - grace
+    MediaBlob.objects.reconcile(storage)
+    stats = {"blobs": 0, "orphans": 0, "bytes": 0}
+
+    for blob in MediaBlob.objects.filter(ref_count=0, unreferenced_at__lt=cutoff):
+        # Skipped when an upload of the same bytes just reused it
+        if not _modified_before(Path(storage.path(blob.name)), cutoff):
+            continue
+        stats["blobs"] += 1
+        if dry_run:
+            stats["bytes"] += blob.size
+        elif MediaBlob.objects.filter(pk=blob.pk, ref_count=0).delete()[0]:
+            stats["bytes"] += storage.delete_blob(blob.name)
+
+    known = set(MediaBlob.objects.values_list("name", flat=True))
+    root = Path(storage.location)
+    for path in root.rglob("*") if root.is_dir() else []:
+        name = path.relative_to(root).as_posix()
+        orphan = is_blob_name(name) and name not in known
+        partial = path.name.startswith(PARTIAL_PREFIX)
+        if not (orphan or partial) or "renditions" in path.parts:
+            continue
+        if not path.is_file() or not _modified_before(path, cutoff):
+            continue
+        stats["orphans"] += 1
+        if dry_run:
+            stats["bytes"] += path.stat().st_size
+        else:
+            stats["bytes"] += storage.delete_blob(name)
+    return stats
+
+
+def dedup_report(root):
+    """
+    Duplicate content under the directory ``root`` (renditions excluded):
+    only files whose size another file shares are hashed. Adds the bytes the
+    content-addressed blobs already save, from their reference counts.
+    """
+    from .models import MediaBlob
+
+    by_size = defaultdict(list)
+    root = Path(root)
+    for path in root.rglob("*") if root.is_dir() else []:
+        if path.is_file() and "renditions" not in path.parts:
+            by_size[path.stat().st_size].append(path)
+
+    files = sum(len(paths) for paths in by_size.values())
+    total = sum(size * len(paths) for size, paths in by_size.items())
+    duplicate_files = duplicate_bytes = hashed = 0
+    for size, paths in by_size.items():
+        if len(paths) < 2:
+            continue
+        copies = defaultdict(int)
+        for path in paths:
+            copies[hash_file(path)] += 1
+            hashed += 1
+        for count in copies.values():
+            duplicate_files += count - 1
+            duplicate_bytes += size * (count - 1)
+
+    blobs = MediaBlob.objects.stats()
+    return {
+        "files": files,
+        "bytes": total,
+        "hashed": hashed,
+        "duplicate_files": duplicate_files,
+        "duplicate_bytes": duplicate_bytes,
+        **{f"blob_{key}": value for key, value in blobs.items()},
+    }
@@ -0,0 +1,106 @@
+"""
+Background tasks of the Property app
+Enqueued with ``<task>.enqueue(...)`` and run by ``python manage.py
+run_workers`` (property/queue.py); the immediate backend runs them in the
+calling process instead
+"""
+
+import logging
+from django.db import transaction
+from django.tasks import task
+from . import similarity
+from .autocomplete import location_index
+from .cache import LOCATIONS, PAGES, PROPERTIES, bump_namespace
+from .importers import (
+    DEFAULT_SHARD_SIZE,
+    BulkPropertyImporter,
+    RejectWriter,
+    read_csv_feed,
+)
+from .models import FeedCard, Location, Property
+from .renditions import generate_renditions_for
+
+logger = logging.getLogger(__name__)
+
+
+@task(queue_name="images")
+def generate_image_renditions(image_id):
+    """Render the sizes and formats of a new upload"""
+    generate_renditions_for(image_id)
+
+
+@task(queue_name="images")
+def generate_gallery_renditions(image_ids):
+    """Render the sizes and formats of a batch of uploads"""
+    for image_id in image_ids:
+        generate_renditions_for(image_id)
+
+
+@task
+def reconcile_location_counts(location_ids=None):
+    """Recompute location counters (all when ``location_ids`` is None)"""
+    locations = Location.objects.all()
+    if location_ids is not None:
+        locations = locations.filter(pk__in=location_ids)
+    with transaction.atomic():
+        updated = locations.reconcile_property_counts()
+    location_index.invalidate()
+    bump_namespace(PROPERTIES, PAGES, LOCATIONS)
+    return updated
+
+
+@task
+def rebuild_feed_cards(property_ids=None, location_id=None):
+    """
+    Rebuild the feed cards of listings, or of the listings at
+    ``location_id`` (all when both are None), then invalidate the pages
+    rendered from the old cards
+    """
+    if location_id is not None:
+        property_ids = Property.objects.filter(location_id=location_id).values_list(
+            "pk", flat=True
+        )
+    built = FeedCard.objects.refresh(property_ids)
+    bump_namespace(PAGES)
+    return built
+
+
+@task
+def update_similar_properties():
+    """Recompute the neighbours listing changes affected; None without NumPy"""
+    try:
+        updated = similarity.update()
+    except similarity.SimilarityUnavailable as error:
+        logger.warning("Similar listings not updated: %s", error)
+        return None
+    bump_namespace(PAGES)
+    return updated
+
+
+@task(queue_name="imports")
+def import_properties(
+    path, batch_size=1000, rejects=None, workers=1, shard_size=DEFAULT_SHARD_SIZE
+):
+    """
+    Bulk import the CSV feed at ``path``, as ``import_properties --bulk``
+    does
+    """
+    rejects_path = rejects or f"{path}.rejects.csv"
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        fieldnames, rows = read_csv_feed(file)
+        writer = RejectWriter(rejects_path, fieldnames)
+        importer = BulkPropertyImporter(batch_size=batch_size, rejects=writer)
+        try:
+            if workers > 1:
+                result = importer.run_parallel(path, workers, shard_size)
+            else:
+                result = importer.run(rows)
+        finally:
+            writer.close()
+    return {
+        "imported": result.imported,
+        "updated": result.updated,
+        "rejected": result.rejected,
+        "seconds": round(result.seconds, 3),
+        "rejects": rejects_path if result.rejected else None,
+    }
@@ -0,0 +1,70 @@
+"""
+Template tags rendering property fragments through the cache
+"""
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from ..cache import (
+    PAGES,
+    anamespaced_keys,
+    arecord_access,
+    namespaced_key,
+    record_access,
+)
+from ..models import FeedCard
+
+register = template.Library()
+
+
+def render_card(listing):
+    """The HTML of ``listing``'s card, a ``FeedCard`` or a ``Property``"""
+    if not isinstance(listing, FeedCard):
+        listing = FeedCard.for_property(listing)
+    return render_to_string("property/partials/property_card.html", {"card": listing})
+
+
+async def aprefetch_cards(listings):
+    """
+    ``{pk: html}`` of the cards of ``listings`` for async views, read with
+    one ``aget_many`` and rendered and stored when missing, so that
+    ``{% property_card %}`` renders them without touching the cache. Pass
+    the result as ``card_fragments`` in the template context.
+    """
+    listings = list(listings)
+    keys = await anamespaced_keys(PAGES, [("card", item.pk) for item in listings])
+    cached = await cache.aget_many(keys)
+    fragments = {}
+    missing = {}
+    for listing, key in zip(listings, keys):
+        if key in cached:
+            fragments[listing.pk] = cached[key]
+        else:
+            fragments[listing.pk] = missing[key] = render_card(listing)
+    if missing:
+        await cache.aset_many(missing, settings.PROPERTY_CARD_CACHE_TIMEOUT)
+    await arecord_access("card", hit=True, count=len(listings) - len(missing))
+    await arecord_access("card", hit=False, count=len(missing))
+    return fragments
+
+
+@register.simple_tag(takes_context=True)
+def property_card(context, listing):
+    """
+    Render ``property/partials/property_card.html`` for ``listing``, a
+    ``FeedCard`` or a ``Property`` made into one, cached per property under
+    the ``PAGES`` namespace. Cards prefetched into ``card_fragments`` (see
+    ``aprefetch_cards``) are used as they are.
+    """
+    prefetched = context.get("card_fragments")
+    if prefetched is not None and listing.pk in prefetched:
+        return mark_safe(prefetched[listing.pk])
+    key = namespaced_key(PAGES, "card", listing.pk)
+    html = cache.get(key)
+    record_access("card", hit=html is not None)
+    if html is None:
+        html = render_card(listing)
+        cache.set(key, html, settings.PROPERTY_CARD_CACHE_TIMEOUT)
+    return mark_safe(html)
@@ -1,3 +1,2403 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import os
+import random
+import sqlite3
+import tempfile
+from contextlib import ExitStack
+from contextvars import Context
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import (
+    IntegrityError,
+    OperationalError,
+    connection,
+    connections,
+    transaction,
+)
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.tasks import TaskResultStatus, task
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import URLResolver, get_resolver, resolve, reverse
+from PIL import Image as PILImage
+
+from . import geo, similarity
+from .autocomplete import location_index
+from .cache import LOCATIONS, bump_namespace, cache_stats
+from .importers import BulkPropertyImporter, RejectWriter, shard_ranges
+from .models import (
+    FeedCard,
+    Image,
+    Location,
+    MapCell,
+    MediaBlob,
+    Property,
+    PropertyNeighbours,
+    QueuedTask,
+    UploadSession,
+)
+from .profiling import profiles, view_budget
+from .queue import LeaseExpired, Worker, purge_finished, queue_stats
+from .renditions import render_image
+from . import routers
+from .routers import ReplicaPinningMiddleware, ReplicaRouter
+from .storage import ContentAddressedStorage
+
+
+def make_property(location=None, **kwargs):
+    defaults = {
+        "title": "Test Property",
+        "description": "A property used in tests",
+        "price": 100000,
+        "bedrooms": 2,
+        "bathrooms": 1,
+    }
+    defaults.update(kwargs)
+    return Property.objects.create(location=location, **defaults)
+
+
+def use_shared_cache(test):
+    """Give ``test`` a file cache, which ``run_workers`` requires"""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    test.enterContext(
+        override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory.name,
+                }
+            }
+        )
+    )
+
+
+@task
+def divide(dividend, divisor):
+    return dividend / divisor
+
+
+class LocationAutocompleteTests(TestCase):
+    def setUp(self):
+        location_index.invalidate()
+        self.addCleanup(location_index.invalidate)
+        self.gulshan = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        self.banani = Location.objects.create(
+            name="Banani", city="Dhaka", country="Bangladesh"
+        )
+        self.empty = Location.objects.create(
+            name="Gulistan", city="Dhaka", country="Bangladesh"
+        )
+        for _ in range(3):
+            make_property(self.banani)
+        make_property(self.gulshan)
+
+    def suggestions(self, query):
+        response = self.client.get(reverse("autocomplete"), {"q": query})
+        return [(s["name"], s["property_count"]) for s in response.json()["suggestions"]]
+
+    def test_index_matches_orm_results(self):
+        for query in ["dhaka", "DHA", "gul", "a", "ban", "bangladesh", "xyz", ""]:
+            with override_settings(PROPERTY_AUTOCOMPLETE_INDEX=False):
+                expected = self.suggestions(query)
+            self.assertEqual(self.suggestions(query), expected, query)
+
+    def test_index_answers_without_queries_once_built(self):
+        self.suggestions("dhaka")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.suggestions("dhaka"), [("Banani", 3), ("Gulshan", 1)]
+            )
+
+    def test_index_follows_property_writes(self):
+        location_index.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_property(self.empty)
+            moved = Property.objects.filter(location=self.banani).first()
+            moved.location = self.gulshan
+            moved.save()
+        self.assertEqual(
+            self.suggestions("dhaka"),
+            [("Banani", 2), ("Gulshan", 2), ("Gulistan", 1)],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Property.objects.get(location=self.empty).delete()
+        self.assertEqual(self.suggestions("gulis"), [])
+
+    def test_index_follows_location_writes(self):
+        location_index.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.banani.name = "Baridhara"
+            self.banani.save()
+        self.assertEqual(self.suggestions("barid"), [("Baridhara", 3)])
+        self.assertEqual(self.suggestions("banani"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.banani.delete()
+        self.assertEqual(self.suggestions("dhaka"), [("Gulshan", 1)])
+
+    def test_index_reloads_after_writes_in_other_processes(self):
+        location_index.build()
+        # Another process's import: this process's signals never see it
+        Location.objects.filter(pk=self.gulshan.pk).update(property_count=7)
+        Location.objects.filter(pk=self.banani.pk).update(name="Baridhara")
+        bump_namespace(LOCATIONS)
+
+        # A fresh index keeps answering until the refresh interval
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.suggestions("dhaka"), [("Banani", 3), ("Gulshan", 1)]
+            )
+        with override_settings(PROPERTY_AUTOCOMPLETE_REFRESH_SECONDS=0):
+            self.assertEqual(
+                self.suggestions("dhaka"), [("Gulshan", 7), ("Baridhara", 3)]
+            )
+            # Writes in this process keep it current without reloading
+            with self.captureOnCommitCallbacks(execute=True):
+                make_property(self.gulshan)
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    self.suggestions("gulshan"), [("Gulshan", 8)]
+                )
+
+
+class LocationCounterTests(TestCase):
+    def setUp(self):
+        self.gulshan = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        self.banani = Location.objects.create(
+            name="Banani", city="Dhaka", country="Bangladesh"
+        )
+
+    def assertCounts(self, location, total, available):
+        location.refresh_from_db()
+        self.assertEqual(
+            (location.property_count, location.available_property_count),
+            (total, available),
+        )
+
+    def test_counters_follow_property_lifecycle(self):
+        listing = make_property(self.gulshan)
+        make_property(self.gulshan, status="rented")
+        self.assertCounts(self.gulshan, 2, 1)
+
+        listing.status = "rented"
+        listing.save()
+        self.assertCounts(self.gulshan, 2, 0)
+
+        listing.location = self.banani
+        listing.status = "available"
+        listing.save()
+        self.assertCounts(self.gulshan, 1, 0)
+        self.assertCounts(self.banani, 1, 1)
+
+        listing.delete()
+        self.assertCounts(self.banani, 0, 0)
+
+    def test_counters_follow_saves_of_deferred_instances(self):
+        make_property(self.gulshan)
+        listing = Property.objects.only("title").get()
+        listing.location = self.banani
+        listing.save()
+        self.assertCounts(self.gulshan, 0, 0)
+        self.assertCounts(self.banani, 1, 1)
+
+    def test_reconcile_repairs_bulk_writes(self):
+        Property.objects.bulk_create(
+            [
+                Property(title="A", description="", price=1, location=self.gulshan),
+                Property(
+                    title="B",
+                    description="",
+                    price=1,
+                    location=self.gulshan,
+                    status="rented",
+                ),
+            ]
+        )
+        self.assertCounts(self.gulshan, 0, 0)
+        self.assertEqual(Location.objects.reconcile_property_counts(), 2)
+        self.assertCounts(self.gulshan, 2, 1)
+        self.assertCounts(self.banani, 0, 0)
+
+
+class PrimaryImageTests(TestCase):
+    def setUp(self):
+        self.listing = make_property()
+        Image.objects.create(property=self.listing, image="property_images/b.jpg", order=2)
+        Image.objects.create(
+            property=self.listing, image="property_images/p.jpg", order=3, is_primary=True
+        )
+        Image.objects.create(property=self.listing, image="property_images/a.jpg", order=1)
+
+    def test_primary_image_resolution_agrees_across_paths(self):
+        plain = Property.objects.get()
+        prefetched = Property.objects.prefetch_related("images").get()
+        annotated = Property.objects.with_primary_image().get()
+        with self.assertNumQueries(0):
+            self.assertEqual(prefetched.primary_image.image.name, "property_images/p.jpg")
+            self.assertEqual(annotated.primary_image_url, "/media/property_images/p.jpg")
+        self.assertEqual(plain.primary_image_url, "/media/property_images/p.jpg")
+
+    def test_falls_back_to_display_order(self):
+        Image.objects.filter(is_primary=True).update(is_primary=False)
+        self.assertEqual(
+            Property.objects.with_primary_image().get().primary_image_url,
+            "/media/property_images/a.jpg",
+        )
+        self.assertEqual(
+            Property.objects.get().primary_image.image.name, "property_images/a.jpg"
+        )
+
+    def test_no_images(self):
+        Image.objects.all().delete()
+        self.assertIsNone(Property.objects.with_primary_image().get().primary_image_url)
+        self.assertIsNone(Property.objects.prefetch_related("images").get().primary_image)
+
+    def test_one_primary_per_property(self):
+        first = Image.objects.get(order=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Image.objects.filter(pk=first.pk).update(is_primary=True)
+        first.is_primary = True
+        first.save()
+        self.assertEqual(
+            list(Image.objects.filter(is_primary=True).values_list("order", flat=True)),
+            [1],
+        )
+
+    def test_saving_a_stale_primary_demotes_the_current_one(self):
+        stale = Image.objects.get(is_primary=True)
+        first = Image.objects.get(order=1)
+        first.is_primary = True
+        first.save()
+
+        stale.caption = "Front"
+        stale.save()
+        self.assertEqual(Image.objects.get(is_primary=True).pk, stale.pk)
+
+    def test_reorder_sets_order_and_primary(self):
+        ids = list(Image.objects.order_by("-order").values_list("pk", flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            Image.objects.reorder(self.listing, ids, primary_id=ids[-1])
+        self.assertEqual(
+            list(Image.objects.values_list("pk", "order", "is_primary")),
+            [(ids[0], 0, False), (ids[1], 1, False), (ids[2], 2, True)],
+        )
+        with self.assertRaises(ValueError):
+            Image.objects.reorder(self.listing, ids[:2])
+        images = list(Image.objects.all())
+        for image in images:
+            image.is_primary = True
+        with self.assertRaises(ValueError):
+            Image.objects.save_gallery(images)
+
+    def test_gallery_queries_do_not_grow_with_its_size(self):
+        def reorder(count):
+            listing = make_property()
+            Image.objects.bulk_create(
+                Image(property=listing, image=f"property_images/{n}.jpg", order=n)
+                for n in range(count)
+            )
+            ids = list(listing.images.values_list("pk", flat=True))[::-1]
+            with CaptureQueriesContext(connection) as queries:
+                Image.objects.reorder(listing, ids, primary_id=ids[0])
+            self.assertEqual(listing.images.filter(is_primary=True).get().pk, ids[0])
+            return len(queries)
+
+        self.assertEqual(reorder(3), reorder(30))
+
+    def test_admin_changelist_saves_edits_in_one_batch(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "", "password")
+        )
+        images = list(Image.objects.order_by("order"))
+        data = {
+            "form-TOTAL_FORMS": "3",
+            "form-INITIAL_FORMS": "3",
+            "_save": "Save",
+        }
+        for index, image in enumerate(images):
+            data[f"form-{index}-id"] = str(image.pk)
+            data[f"form-{index}-order"] = str(10 - index)
+        data["form-0-is_primary"] = "on"
+        url = reverse("admin:property_image_changelist") + "?o=4"
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(Image.objects.values_list("pk", "is_primary")),
+            [(images[2].pk, False), (images[1].pk, False), (images[0].pk, True)],
+        )
+
+        data["form-1-is_primary"] = "on"
+        response = self.client.post(url, data)
+        self.assertContains(response, "A property can only have one primary image.")
+
+
+class QueryCountTests(TestCase):
+    """
+    Page and admin changelist query counts must not grow with the number of
+    rows rendered.
+    """
+
+    def setUp(self):
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        self.admin = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+
+    def add_listings(self, count):
+        # On commit: the feed cards
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(count):
+                listing = make_property(self.location, title=f"Listing {number}")
+                for order in range(3):
+                    Image.objects.create(
+                        property=listing,
+                        image=f"property_images/{number}-{order}.jpg",
+                        order=order,
+                        is_primary=order == 1,
+                    )
+        return listing
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, expected=None):
+        self.add_listings(1)
+        few = self.count_queries(url)
+        self.add_listings(8)
+        many = self.count_queries(url)
+        self.assertEqual(few, many, f"{url} issues queries per row")
+        if expected is not None:
+            self.assertEqual(many, expected)
+
+    def test_home(self):
+        self.assertConstantQueries(reverse("home"), expected=1)
+
+    def test_property_list(self):
+        self.assertConstantQueries(reverse("property:property_list"), expected=5)
+
+    def test_property_list_filtered_by_location(self):
+        url = reverse("property:property_list") + f"?location={self.location.pk}"
+        self.assertConstantQueries(url, expected=6)
+
+    def test_property_detail(self):
+        listing = self.add_listings(9)
+        url = reverse("property:property_detail", args=[listing.pk])
+        self.assertEqual(self.count_queries(url), 5)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin)
+        for model in ["property", "location", "image"]:
+            with self.subTest(model=model):
+                self.assertConstantQueries(
+                    reverse(f"admin:property_{model}_changelist")
+                )
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        for property_type, status, price, bedrooms in [
+            ("house", "available", 80_000, 3),
+            ("house", "rented", 300_000, 4),
+            ("apartment", "available", 120_000, 1),
+            ("apartment", "available", 600_000, 2),
+            ("commercial", "rented", 2_000_000, 0),
+        ]:
+            make_property(
+                self.location,
+                property_type=property_type,
+                status=status,
+                price=price,
+                bedrooms=bedrooms,
+            )
+
+    def get_api(self, **params):
+        return self.client.get(reverse("property_api"), params).json()
+
+    def test_filters_and_facet_counts(self):
+        data = self.get_api(type="house")
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(len(data["results"]), 2)
+        facets = data["facets"]
+        # A facet ignores its own filter, so the other types stay countable
+        self.assertEqual(
+            facets["property_type"], {"house": 2, "apartment": 2, "commercial": 1}
+        )
+        self.assertEqual(facets["status"], {"available": 1, "rented": 1})
+        self.assertEqual(facets["bedrooms"], {"1": 2, "2": 2, "3": 2, "4": 1})
+
+        data = self.get_api(min_price="100000", max_price="500000", min_bedrooms=1)
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(data["facets"]["price"]["100000-250000"], 1)
+        self.assertEqual(data["facets"]["price"]["-100000"], 1)
+
+        # Invalid values are ignored rather than failing the request
+        self.assertEqual(self.get_api(type="castle", min_price="cheap")["count"], 5)
+
+    def test_facets_are_cached_and_invalidated_by_writes(self):
+        url = reverse("property:property_list")
+        params = {
+            "location": self.location.pk,
+            "type": "apartment",
+            "status": "available",
+            "min_price": 100_000,
+            "min_bedrooms": 1,
+        }
+        # location, page, one aggregate per active filter and one shared, and
+        # the page validators
+        with self.assertNumQueries(10):
+            response = self.client.get(url, params)
+        self.assertEqual(response.context["count"], 2)
+        # Another page of the same combination reuses the facets
+        with self.assertNumQueries(2):
+            self.client.get(url, {**params, "page": 1})
+
+        make_property(self.location, property_type="apartment", price=150_000)
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {"location": self.location.pk})
+        self.assertEqual(response.context["count"], 6)
+        self.assertContains(response, "Apartment")
+
+    @override_settings(PROPERTY_PAGE_CACHE_TIMEOUT=0)
+    def test_location_page_totals_come_from_the_location_counters(self):
+        url = reverse("property:property_list")
+        self.assertEqual(
+            self.client.get(url, {"location": self.location.pk}).context["count"], 5
+        )
+        # Counters moved by writes that leave the cached facets alone
+        Location.objects.filter(pk=self.location.pk).update(
+            property_count=7, available_property_count=4
+        )
+        response = self.client.get(url, {"location": self.location.pk})
+        self.assertEqual(response.context["count"], 7)
+        status = dict(response.context["facets"])["Status"]
+        self.assertEqual([item["count"] for item in status], [4, 3])
+        # With a facet filter the aggregates count the page
+        response = self.client.get(url, {"location": self.location.pk, "type": "house"})
+        self.assertEqual(response.context["count"], 2)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        self.listing = make_property(self.location, title="Lakeside Villa")
+        self.detail_url = reverse("property:property_detail", args=[self.listing.pk])
+
+    def test_anonymous_pages_are_cached_until_a_write(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        for write in [
+            lambda: Image.objects.create(
+                property=self.listing, image="property_images/new.jpg"
+            ),
+            lambda: Location.objects.filter(pk=self.location.pk).get().save(),
+            lambda: make_property(self.location),
+        ]:
+            write()
+            self.assertEqual(self.client.get(self.detail_url)["X-Cache"], "MISS")
+
+        stats = cache_stats()["page"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 4))
+
+    def test_staff_bypass_the_page_cache(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "a@example.com", "pw")
+        )
+        self.client.get(self.detail_url)
+        response = self.client.get(self.detail_url)
+        self.assertNotIn("X-Cache", response)
+        self.assertEqual(
+            self.client.get(reverse("cache_stats")).json()["page"]["hits"], 0
+        )
+
+    def test_property_cards_are_cached_across_pages(self):
+        list_url = reverse("property:property_list")
+        self.client.get(list_url)
+        response = self.client.get(list_url, {"location": self.location.pk})
+        self.assertContains(response, "Lakeside Villa")
+        self.assertEqual(
+            cache_stats()["card"], {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+        )
+
+        self.listing.title = "Hillside Villa"
+        self.listing.save()
+        self.assertContains(self.client.get(list_url), "Hillside Villa")
+
+
+class FeedCardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+
+    def add_listing(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = make_property(self.location, price=1250000, **kwargs)
+            Image.objects.create(
+                property=listing, image="property_images/front.jpg", is_primary=True
+            )
+        return listing
+
+    def test_cards_follow_listing_location_and_image_writes(self):
+        use_shared_cache(self)
+        listing = self.add_listing(title="Lakeside Villa")
+        card = FeedCard.objects.get()
+        self.assertEqual(
+            (card.property_id, card.title, card.price, card.location),
+            (
+                listing.pk,
+                "Lakeside Villa",
+                "$1,250,000.00",
+                "Gulshan, Dhaka, Bangladesh",
+            ),
+        )
+        self.assertEqual(card.picture["src"], "/media/property_images/front.jpg")
+
+        # A location's cards are rebuilt by a worker, not in the request
+        with self.captureOnCommitCallbacks(execute=True):
+            self.location.name = "Banani"
+            self.location.save()
+        card.refresh_from_db()
+        self.assertEqual(card.location, "Gulshan, Dhaka, Bangladesh")
+        # The home page is cached again from the old card meanwhile...
+        home = self.client.get(reverse("home"))
+        self.assertEqual(home["X-Cache"], "MISS")
+        self.assertContains(home, "Gulshan, Dhaka, Bangladesh")
+        task = QueuedTask.objects.get(task_path="property.tasks.rebuild_feed_cards")
+        self.assertEqual(task.kwargs, {"location_id": self.location.pk})
+        call_command(
+            "run_workers", queues=["default"], burst=True, verbosity=0, stdout=StringIO()
+        )
+        card.refresh_from_db()
+        self.assertEqual(card.location, "Banani, Dhaka, Bangladesh")
+        # ...and invalidated by the worker through the shared cache
+        home = self.client.get(reverse("home"))
+        self.assertEqual(home["X-Cache"], "MISS")
+        self.assertContains(home, "Banani, Dhaka, Bangladesh")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.images.get().delete()
+        card.refresh_from_db()
+        self.assertIsNone(card.picture)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.status = "rented"
+            listing.save()
+        self.assertEqual(list(FeedCard.objects.recent(6)), [])
+        listing.delete()
+        self.assertFalse(FeedCard.objects.exists())
+
+    def test_home_renders_the_newest_available_cards(self):
+        self.add_listing(title="Older Flat")
+        self.add_listing(title="Rented House", status="rented")
+        self.add_listing(title="Newest Loft")
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("home"))
+        titles = [card.title for card in response.context["recent_properties"]]
+        self.assertEqual(titles, ["Newest Loft", "Older Flat"])
+        self.assertContains(response, "$1,250,000.00")
+        self.assertNotContains(response, "Rented House")
+
+    def test_rebuild_after_writes_that_bypass_signals(self):
+        Property.objects.bulk_create(
+            [
+                Property(
+                    title="Imported", description="", price=900, location=self.location
+                )
+            ]
+        )
+        self.assertFalse(FeedCard.objects.exists())
+        out = StringIO()
+        call_command("rebuild_feed_cards", stdout=out)
+        self.assertIn("Rebuilt 1 feed cards", out.getvalue())
+        self.assertEqual(FeedCard.objects.get().price, "$900.00")
+
+    def test_migration_fills_the_cards(self):
+        listing = self.add_listing(title="Lakeside Villa")
+        expected = FeedCard.objects.values().get()
+        FeedCard.objects.all().delete()
+
+        migration = import_module("property.migrations.0021_fill_feed_cards")
+        migration.fill_feed_cards(django_apps, connection.schema_editor())
+        self.assertEqual(FeedCard.objects.values().get(), expected)
+        self.assertEqual(expected["property_id"], listing.pk)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        self.listing = make_property(self.location, title="Lakeside Villa")
+        self.neighbour = make_property(self.location, title="Hillside Villa")
+        self.detail_url = reverse("property:property_detail", args=[self.listing.pk])
+        self.list_url = reverse("property:property_list")
+
+    def assertRevalidates(self, url, writes, params=None):
+        """
+        A repeated request is answered with 304, and again after each
+        write with the new page and validators
+        """
+        etag = self.client.get(url, params)["ETag"]
+        for write in [None, *writes]:
+            if write is not None:
+                write()
+            response = self.client.get(url, params, headers={"if-none-match": etag})
+            self.assertEqual(response.status_code, 304 if write is None else 200)
+            if write is not None:
+                self.assertNotEqual(response["ETag"], etag)
+                etag = response["ETag"]
+
+    def test_pages_send_validators_and_cache_headers(self):
+        for urlconf in ["core.urls", "core.async_urls"]:
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                cache.clear()
+                response = self.client.get(self.detail_url)
+                self.assertTrue(response["ETag"].startswith('W/"'))
+                self.assertIn("Last-Modified", response)
+                self.assertEqual(response["Cache-Control"], "public, max-age=60")
+                self.assertIn("Cookie", response["Vary"])
+
+                # From the cached page, then from the validators alone
+                headers = {"if-none-match": response["ETag"]}
+                with self.assertNumQueries(0):
+                    response = self.client.get(self.detail_url, headers=headers)
+                self.assertEqual(response.status_code, 304)
+                cache.clear()
+                with self.assertNumQueries(2):
+                    response = self.client.get(self.detail_url, headers=headers)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], headers["if-none-match"])
+
+                response = self.client.get(
+                    self.detail_url,
+                    headers={"if-modified-since": response["Last-Modified"]},
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_detail_page_revalidates_after_writes_it_shows(self):
+        self.assertRevalidates(
+            self.detail_url,
+            [
+                lambda: Image.objects.create(
+                    property=self.listing, image="property_images/new.jpg"
+                ),
+                lambda: Location.objects.get().save(),
+                # A similar listing shown on the page
+                lambda: Property.objects.get(pk=self.neighbour.pk).save(),
+            ],
+        )
+
+    def test_list_page_revalidates_after_writes_to_its_listings(self):
+        apartment = make_property(self.location, property_type="apartment")
+        self.assertRevalidates(
+            self.list_url,
+            [
+                # Counted in the type facet, though not on the filtered page
+                lambda: Property.objects.get(pk=apartment.pk).save(),
+                lambda: Property.objects.filter(pk=apartment.pk).delete(),
+            ],
+            {"location": self.location.pk, "type": "house"},
+        )
+
+    def test_signed_in_pages_are_private(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "a@example.com", "pw")
+        )
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        response = self.client.get(
+            self.detail_url, headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_autocomplete_is_publicly_cacheable(self):
+        for urlconf in ["core.urls", "core.async_urls"]:
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                response = self.client.get(reverse("autocomplete"), {"q": "gul"})
+                self.assertEqual(response["Cache-Control"], "public, max-age=300")
+                self.assertNotIn("Cookie", response.get("Vary", ""))
+
+
+@override_settings(ROOT_URLCONF="core.async_urls")
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        location_index.invalidate()
+        self.addCleanup(location_index.invalidate)
+        self.gulshan = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        banani = Location.objects.create(
+            name="Banani", city="Dhaka", country="Bangladesh"
+        )
+        for number in range(12):
+            make_property(
+                self.gulshan if number % 3 else banani,
+                title=f"Garden Villa {number}" if number % 4 else f"Flat {number}",
+                property_type="house" if number % 2 else "apartment",
+                bedrooms=number % 5,
+                price=50_000 * (number + 1),
+            )
+
+    def get(self, url, params=None):
+        return async_to_sync(self.async_client.get)(url, params or {})
+
+    def listings(self, page):
+        return [listing.pk for listing in page]
+
+    def test_routes_resolve_to_coroutines(self):
+        for url in [
+            reverse("autocomplete"),
+            reverse("property:property_list"),
+            reverse("property:property_detail", args=[1]),
+        ]:
+            self.assertTrue(iscoroutinefunction(resolve(url).func), url)
+
+    @override_settings(PROPERTY_PAGE_CACHE_TIMEOUT=0)
+    def test_list_pages_match_the_sync_view(self):
+        url = reverse("property:property_list")
+        for params in [
+            {},
+            {"page": 2},
+            {"location": self.gulshan.pk},
+            {"type": "house", "min_bedrooms": 2},
+            {"q": "villa"},
+            {"cursor": ""},
+        ]:
+            with self.subTest(params=params):
+                response = self.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                with override_settings(ROOT_URLCONF="core.urls"):
+                    expected = self.client.get(url, params)
+                for key in ["count", "facets", "cursor_mode"]:
+                    self.assertEqual(response.context[key], expected.context[key])
+                self.assertEqual(
+                    self.listings(response.context["page_obj"]),
+                    self.listings(expected.context["page_obj"]),
+                )
+        self.assertEqual(self.get(url, {"location": 999}).status_code, 404)
+
+    def test_cache_is_not_used_synchronously_on_the_event_loop(self):
+        blocking = []
+
+        def guarded(method):
+            def call(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    pass
+                else:
+                    blocking.append(method.__name__)
+                return method(*args, **kwargs)
+
+            return call
+
+        with ExitStack() as stack:
+            for name in ["get", "get_many", "add", "incr", "set", "set_many"]:
+                stack.enter_context(
+                    mock.patch.object(cache, name, guarded(getattr(cache, name)))
+                )
+            listing = Property.objects.first()
+            for url in [
+                reverse("property:property_list"),
+                reverse("property:property_detail", args=[listing.pk]),
+            ]:
+                self.assertEqual(self.get(url)["X-Cache"], "MISS")
+                self.assertEqual(self.get(url)["X-Cache"], "HIT")
+        self.assertEqual(blocking, [])
+        self.assertEqual(cache_stats()["card"]["misses"], 9)
+
+    def test_cursor_pages_walk_the_whole_list(self):
+        url = reverse("property:property_list")
+        page = self.get(url, {"cursor": ""}).context["page_obj"]
+        seen = self.listings(page)
+        while page.has_next():
+            page = self.get(url, {"cursor": page.next_cursor}).context["page_obj"]
+            seen += self.listings(page)
+        self.assertEqual(
+            seen,
+            list(
+                Property.objects.order_by("-created_at", "-pk").values_list(
+                    "pk", flat=True
+                )
+            ),
+        )
+        page = self.get(url, {"cursor": page.previous_cursor}).context["page_obj"]
+        self.assertEqual(self.listings(page), seen[:9])
+
+    def test_detail_page_is_cached(self):
+        listing = Property.objects.first()
+        url = reverse("property:property_detail", args=[listing.pk])
+        response = self.get(url)
+        self.assertContains(response, listing.title)
+        self.assertEqual(response["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(url)["X-Cache"], "HIT")
+        self.assertEqual(
+            self.get(reverse("property:property_detail", args=[999])).status_code, 404
+        )
+
+    def test_autocomplete_matches_the_api_view(self):
+        url = reverse("autocomplete")
+        for query in ["dhaka", "gul", "a", "xyz", ""]:
+            for index in [True, False]:
+                with (
+                    self.subTest(query=query, index=index),
+                    override_settings(PROPERTY_AUTOCOMPLETE_INDEX=index),
+                ):
+                    response = self.get(url, {"q": query})
+                    with override_settings(ROOT_URLCONF="core.urls"):
+                        expected = self.client.get(url, {"q": query})
+                    self.assertEqual(response.json(), expected.json())
+        with self.assertNumQueries(0):
+            self.get(url, {"q": "dhaka"})
+
+
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.listing = make_property(title="Lakeside Villa")
+
+    def upload(self, size=(800, 600), **kwargs):
+        buffer = BytesIO()
+        PILImage.new("RGB", size, "teal").save(buffer, "JPEG")
+        return Image.objects.create(
+            property=self.listing,
+            image=SimpleUploadedFile("photo.jpg", buffer.getvalue()),
+            **kwargs,
+        )
+
+    def test_upload_queues_renditions_after_commit(self):
+        use_shared_cache(self)
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.upload(is_primary=True)
+        task = QueuedTask.objects.get()
+        self.assertEqual(
+            (task.task_path, task.queue_name, task.args),
+            ("property.tasks.generate_image_renditions", "images", [image.pk]),
+        )
+        image.refresh_from_db()
+        self.assertIsNone(image.renditions_generated_at)
+
+        call_command(
+            "run_workers", queues=["images"], burst=True, verbosity=0, stdout=StringIO()
+        )
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (800, 600))
+        sizes = {(item["width"], item["height"]) for item in image.renditions}
+        self.assertEqual(sizes, {(320, 240), (640, 480), (800, 600)})
+        for item in image.renditions:
+            self.assertTrue(default_storage.exists(item["name"]))
+        self.assertIn("-320w.jpg", image.thumbnail_url)
+
+        # Renditions sit next to the content-addressed original
+        directory = image.image.name.rsplit("/", 1)[0]
+        response = self.client.get(reverse("property:property_list"))
+        self.assertContains(response, f'srcset="/media/{directory}/renditions/')
+        self.assertContains(response, "640w")
+
+    def test_command_renders_pending_images_only(self):
+        with override_settings(PROPERTY_IMAGE_RENDITIONS_ON_UPLOAD=False):
+            first, second = self.upload(), self.upload(size=(200, 100))
+        self.assertEqual(first.thumbnail_url, first.image.url)
+
+        call_command("generate_renditions", workers=1, limit=1, stdout=StringIO())
+        first.refresh_from_db()
+        self.assertIsNotNone(first.renditions_generated_at)
+        generated_at = first.renditions_generated_at
+
+        # A second run resumes with the remaining image
+        call_command("generate_renditions", workers=1, stdout=StringIO())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.renditions_generated_at, generated_at)
+        self.assertEqual({item["width"] for item in second.renditions}, {200})
+
+        # Replacing the file invalidates the renditions
+        second.image = first.image.name
+        second.save()
+        self.assertEqual(second.renditions, [])
+        self.assertIsNone(second.renditions_generated_at)
+
+
+class MediaStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(
+            override_settings(
+                MEDIA_ROOT=media_root.name, PROPERTY_IMAGE_RENDITIONS_ON_UPLOAD=False
+            )
+        )
+        self.media_root = Path(media_root.name)
+
+    def upload(self, content, name="photo.jpg"):
+        return Image.objects.create(
+            property=make_property(), image=SimpleUploadedFile(name, content)
+        )
+
+    def stored_files(self):
+        return sorted(
+            path.relative_to(self.media_root).as_posix()
+            for path in self.media_root.rglob("*")
+            if path.is_file()
+        )
+
+    def test_equal_uploads_share_one_counted_file(self):
+        first, second = self.upload(b"same bytes"), self.upload(b"same bytes", "b.JPG")
+        other = self.upload(b"other bytes")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r"^property_images/(\w\w)/(\w\w)/\1\2\w{60}\.jpg$"
+        )
+        self.assertEqual(len(self.stored_files()), 2)
+        with first.image.open("rb") as file:
+            self.assertEqual(file.read(), b"same bytes")
+
+        replaced = other.image.name
+        other.image = first.image.name
+        other.save()
+        second.delete()
+        self.assertEqual(
+            dict(MediaBlob.objects.values_list("name", "ref_count")),
+            {first.image.name: 2, replaced: 0},
+        )
+
+    def test_gc_deletes_unreferenced_files_after_the_grace_period(self):
+        kept, dropped = self.upload(b"kept"), self.upload(b"dropped")
+        renditions = self.media_root / dropped.image.name.rsplit("/", 1)[0]
+        (renditions / "renditions").mkdir()
+        rendition = (
+            renditions / "renditions" / f"{Path(dropped.image.name).stem}-320w.jpg"
+        )
+        rendition.write_bytes(b"rendition")
+        partial = self.media_root / "property_images" / ".upload-stale"
+        partial.write_bytes(b"partial")
+        dropped.delete()
+        # Written by a bulk insert, which skips the reference counting
+        Image.objects.bulk_create(
+            [Image(property=kept.property, image=kept.image.name)]
+        )
+
+        call_command("gc_media", stdout=StringIO())
+        self.assertTrue(rendition.exists())
+        MediaBlob.objects.filter(ref_count=0).update(
+            unreferenced_at=timezone.now() - timedelta(days=2)
+        )
+        stale = (timezone.now() - timedelta(days=2)).timestamp()
+        for path in self.media_root.rglob("*"):
+            os.utime(path, (stale, stale))
+
+        out = StringIO()
+        call_command("gc_media", dry_run=True, stdout=out)
+        self.assertIn(
+            "Would delete 1 unreferenced and 1 orphaned files", out.getvalue()
+        )
+        call_command("gc_media", stdout=StringIO())
+        self.assertEqual(self.stored_files(), [kept.image.name])
+        self.assertEqual(
+            list(MediaBlob.objects.values_list("name", "ref_count")),
+            [(kept.image.name, 2)],
+        )
+
+    def test_gc_times_the_grace_period_from_the_last_reference(self):
+        old, shared = self.upload(b"old photo"), self.upload(b"shared")
+        reused = self.upload(b"shared")
+        MediaBlob.objects.update(created_at=timezone.now() - timedelta(days=30))
+        stale = (timezone.now() - timedelta(days=30)).timestamp()
+        for path in self.media_root.rglob("*"):
+            os.utime(path, (stale, stale))
+
+        # A month-old blob whose last image was just deleted is kept
+        old.delete()
+        shared.delete()
+        blobs = {blob.name: blob for blob in MediaBlob.objects.all()}
+        self.assertIsNotNone(blobs[old.image.name].unreferenced_at)
+        self.assertIsNone(blobs[reused.image.name].unreferenced_at)
+        call_command("gc_media", stdout=StringIO())
+        self.assertIn(old.image.name, self.stored_files())
+
+        # Referenced again, it loses the stamp
+        reused.image = old.image.name
+        reused.save()
+        self.assertIsNone(MediaBlob.objects.get(name=old.image.name).unreferenced_at)
+        self.assertIsNotNone(
+            MediaBlob.objects.get(name=shared.image.name).unreferenced_at
+        )
+
+    def test_renditions_are_written_and_deleted_under_the_image_root(self):
+        image_root = tempfile.TemporaryDirectory()
+        self.addCleanup(image_root.cleanup)
+        storage = ContentAddressedStorage(location=image_root.name)
+        buffer = BytesIO()
+        PILImage.new("RGB", (400, 300), "teal").save(buffer, "JPEG")
+        name = storage.save("property_images/photo.jpg", ContentFile(buffer.getvalue()))
+
+        with override_settings(PROPERTY_IMAGE_RENDITION_FORMATS=["jpeg"]):
+            _, _, renditions = render_image(name, storage)
+        self.assertTrue(renditions)
+        for item in renditions:
+            self.assertTrue(storage.exists(item["name"]))
+        self.assertEqual(self.stored_files(), [])
+
+        storage.delete_blob(name)
+        self.assertEqual(list(Path(image_root.name).rglob("*.jpg")), [])
+
+    def test_report_counts_duplicate_bytes(self):
+        legacy = self.media_root / "property_images"
+        legacy.mkdir()
+        for name, content in [("a.jpg", b"x" * 100), ("b.jpg", b"x" * 100)]:
+            (legacy / name).write_bytes(content)
+        (legacy / "c.jpg").write_bytes(b"y" * 100)
+        self.upload(b"z" * 10)
+        self.upload(b"z" * 10)
+
+        out = StringIO()
+        call_command("media_report", stdout=out)
+        self.assertIn("4 files, 310 bytes; hashed 3", out.getvalue())
+        self.assertIn("Duplicates: 1 files, 100 bytes (32.3%)", out.getvalue())
+        self.assertIn(
+            "10 bytes stored for 20 referenced, 10 bytes saved", out.getvalue()
+        )
+
+
+class ResumableUploadTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.upload_dir = Path(directory.name) / "uploads"
+        self.enterContext(
+            override_settings(
+                MEDIA_ROOT=directory.name,
+                PROPERTY_UPLOAD_DIR=self.upload_dir,
+                PROPERTY_UPLOAD_MAX_CHUNK=4096,
+            )
+        )
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "", "password")
+        )
+        self.listing = make_property()
+        self.existing = Image.objects.create(
+            property=self.listing, image="property_images/old.jpg", is_primary=True
+        )
+
+    def photo(self):
+        buffer = BytesIO()
+        PILImage.effect_noise((48, 48), 64).convert("RGB").save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def start(self, content, filename="photo.png"):
+        response = self.client.post(
+            reverse("upload_sessions"),
+            {"property": self.listing.pk, "filename": filename, "size": len(content)},
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def put(self, upload, content, first, total=None):
+        last = first + len(content) - 1
+        return self.client.put(
+            upload["url"],
+            content,
+            content_type="application/octet-stream",
+            headers={
+                "content-range": f"bytes {first}-{last}/{total or upload['size']}"
+            },
+        )
+
+    def commit(self, ids, primary=None):
+        return self.client.post(
+            reverse("property_images_api", args=[self.listing.pk]),
+            {"uploads": ids, "primary": primary},
+            content_type="application/json",
+        )
+
+    def test_chunks_resume_and_commit_in_one_insert(self):
+        first, second = self.photo(), self.photo()
+        raw, multipart = self.start(first), self.start(second, "second.png")
+
+        self.assertEqual(self.put(raw, first[:4000], 0).status_code, 200)
+        # A gap is refused; the client asks where to resume
+        self.assertEqual(self.put(raw, first[5000:6000], 5000).status_code, 409)
+        response = self.client.get(raw["url"])
+        self.assertEqual(response.json()["received"], 4000)
+        self.assertEqual(response["Range"], "bytes=0-3999")
+        # A retried chunk may overlap what was received
+        for offset in range(3000, len(first), 4000):
+            response = self.put(raw, first[offset : offset + 4000], offset)
+        self.assertTrue(response.json()["complete"])
+
+        response = self.commit([raw["id"], multipart["id"]])
+        self.assertEqual(response.status_code, 409)
+        for offset in range(0, len(second), 4000):
+            chunk = second[offset : offset + 4000]
+            response = self.client.put(
+                multipart["url"],
+                encode_multipart(
+                    BOUNDARY, {"chunk": SimpleUploadedFile("blob", chunk)}
+                ),
+                content_type=MULTIPART_CONTENT,
+                headers={
+                    "content-range": (
+                        f"bytes {offset}-{offset + len(chunk) - 1}/{len(second)}"
+                    )
+                },
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+
+        with (
+            CaptureQueriesContext(connection) as queries,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            response = self.commit([multipart["id"], raw["id"]], multipart["id"])
+        self.assertEqual(response.status_code, 201, response.content)
+        inserts = [
+            query
+            for query in queries
+            if query["sql"].startswith('INSERT INTO "property_image"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+        images = list(self.listing.images.order_by("order"))
+        self.assertEqual(
+            [(image.order, image.is_primary) for image in images],
+            [(0, False), (1, True), (2, False)],
+        )
+        for image, content in zip(images[1:], [second, first]):
+            with image.image.open("rb") as file:
+                self.assertEqual(file.read(), content)
+            self.assertEqual(MediaBlob.objects.get(name=image.image.name).ref_count, 1)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(list(self.upload_dir.iterdir()), [])
+        task = QueuedTask.objects.get()
+        self.assertEqual(task.task_path, "property.tasks.generate_gallery_renditions")
+        self.assertEqual(task.args, [[images[1].pk, images[2].pk]])
+
+    def test_invalid_chunks_and_batches_are_refused(self):
+        content = b"not an image" * 500
+        upload = self.start(content)
+        self.assertEqual(self.put(upload, content[:10], 0, total=99).status_code, 400)
+        self.assertEqual(self.put(upload, content[:4097], 0).status_code, 413)
+        response = self.client.put(
+            upload["url"], b"x", headers={"content-range": "bytes 0-1"}
+        )
+        self.assertEqual(response.status_code, 400)
+        for offset in range(0, len(content), 4000):
+            self.put(upload, content[offset : offset + 4000], offset)
+        response = self.commit([upload["id"]])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Not images: photo.png", response.json()["detail"])
+
+        response = self.client.post(
+            reverse("upload_sessions"),
+            {"property": self.listing.pk, "filename": "notes.txt", "size": 10},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(upload["url"]).status_code, 403)
+
+    def test_abandoned_uploads_expire(self):
+        upload = self.start(self.photo())
+        self.put(upload, b"partial", 0)
+        UploadSession.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        out = StringIO()
+        call_command("gc_media", stdout=out)
+        self.assertIn("Deleted 1 expired upload sessions", out.getvalue())
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(list(self.upload_dir.iterdir()), [])
+
+
+@override_settings(
+    TASKS={
+        "default": {
+            "BACKEND": "property.queue.DatabaseBackend",
+            "OPTIONS": {"MAX_ATTEMPTS": 2, "RETRY_DELAY": 0},
+        }
+    }
+)
+class TaskQueueTests(TestCase):
+    def test_failed_attempts_are_retried_then_fail(self):
+        quotient, failing = divide.enqueue(6, 3), divide.enqueue(1, 0)
+        self.assertEqual(quotient.status, TaskResultStatus.READY)
+
+        with self.assertLogs("property.queue", "WARNING") as logs:
+            self.assertEqual(Worker().run(burst=True), 3)
+        self.assertEqual(len(logs.records), 2)
+        quotient.refresh()
+        failing.refresh()
+        self.assertEqual(quotient.return_value, 2)
+        self.assertEqual(quotient.attempts, 1)
+        self.assertEqual(failing.status, TaskResultStatus.FAILED)
+        self.assertEqual(failing.attempts, 2)
+        self.assertEqual(
+            [error.exception_class for error in failing.errors],
+            [ZeroDivisionError, ZeroDivisionError],
+        )
+        self.assertEqual(divide.get_result(failing.id).errors, failing.errors)
+
+    def test_expired_lease_is_taken_over(self):
+        result = divide.enqueue(6, 3)
+        first, second = Worker(), Worker()
+        stale = first.claim()
+        self.assertIsNone(second.claim())
+
+        QueuedTask.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(second.run(burst=True), 1)
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.SUCCESSFUL)
+        self.assertEqual(result.worker_ids, [first.id, second.id])
+
+        # The first worker's late outcome is dropped
+        with self.assertLogs("property.queue", "WARNING"):
+            first.execute(stale)
+        result.refresh()
+        self.assertEqual(result.worker_ids, [first.id, second.id])
+
+        # Once the attempts are used up, an expired lease fails the task
+        result = divide.enqueue(6, 3)
+        QueuedTask.objects.filter(pk=result.id).update(
+            status=TaskResultStatus.RUNNING,
+            attempts=2,
+            worker_ids=["gone", "gone"],
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(second.run(burst=True), 0)
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.FAILED)
+        self.assertEqual([e.exception_class for e in result.errors], [LeaseExpired])
+
+    def test_workers_need_a_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, "Set CACHE_DIR or REDIS_URL"):
+            call_command("run_workers", burst=True, stdout=StringIO())
+        use_shared_cache(self)
+        call_command("run_workers", burst=True, verbosity=0, stdout=StringIO())
+
+    def test_stats_report_depth_and_latency(self):
+        use_shared_cache(self)
+        divide.enqueue(6, 3)
+        later = divide.using(run_after=timezone.now() + timedelta(hours=1))
+        later.enqueue(6, 3)
+        self.assertEqual(queue_stats()["default"]["due"], 1)
+
+        output = StringIO()
+        call_command("run_workers", burst=True, stdout=output)
+        self.assertIn("property.tests.divide", output.getvalue())
+        stats = queue_stats()["default"]
+        self.assertEqual(
+            (stats["due"], stats["scheduled"], stats["successful"], stats["finished"]),
+            (0, 1, 1, 1),
+        )
+        self.assertIsNone(stats["oldest_due_s"])
+        self.assertGreaterEqual(stats["wait_p95_ms"], stats["wait_p50_ms"])
+
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "a@example.com", "pw")
+        )
+        response = self.client.get(reverse("task_stats"))
+        self.assertEqual(response.json()["default"]["scheduled"], 1)
+        output = StringIO()
+        call_command("task_stats", stdout=output)
+        self.assertIn("scheduled=1", output.getvalue())
+        self.assertEqual(purge_finished(timedelta(0)), 1)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        profiles.reset()
+        self.addCleanup(profiles.reset)
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        for number in range(12):
+            listing = make_property(self.location, title=f"Lakeside {number}")
+            for order in range(2):
+                Image.objects.create(
+                    property=listing,
+                    image=f"property_images/{number}-{order}.jpg",
+                    order=order,
+                )
+        self.listing = listing
+        self.admin = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+
+    @override_settings(PROPERTY_SERVER_TIMING=True)
+    def test_server_timing_header_and_rolling_percentiles(self):
+        url = reverse("property:property_list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        # The query log is cleared when the next request starts
+        query_count = len(queries)
+        self.assertRegex(
+            response["Server-Timing"],
+            rf'^db;dur=[\d.]+;desc="{query_count} queries", '
+            r"tpl;dur=[\d.]+, total;dur=[\d.]+$",
+        )
+        self.client.get(url, {"page": 2})
+
+        row = profiles.summary()["property:property_list"]
+        self.assertEqual(row["requests"], 2)
+        self.assertEqual(row["queries_max"], query_count)
+        self.assertEqual(row["budget_queries"], 10)
+        self.assertGreater(row["template_p95_ms"], 0)
+        self.assertGreaterEqual(row["p99_ms"], row["p50_ms"])
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("profiling"))
+        self.assertContains(response, "property:property_list")
+        self.client.post(reverse("profiling"))
+        self.assertNotIn("property:property_list", profiles.summary())
+
+    def test_views_stay_within_budgets(self):
+        anonymous = [
+            (reverse("home"), {}),
+            (reverse("property:property_list"), {}),
+            (
+                reverse("property:property_list"),
+                {
+                    "location": self.location.pk,
+                    "q": "lakeside",
+                    "type": "house",
+                    "status": "available",
+                    "min_price": 1,
+                    "min_bedrooms": 1,
+                    "page": 2,
+                },
+            ),
+            (reverse("property:property_list"), {"location": "gul", "q": "lake"}),
+            (reverse("property:property_detail", args=[self.listing.pk]), {}),
+            (reverse("autocomplete"), {"q": "gul"}),
+            (reverse("search"), {"q": "lakeside"}),
+            (
+                reverse("property_api"),
+                {"q": "lake", "type": "house", "status": "available", "page": 2},
+            ),
+        ]
+        staff = [
+            (reverse("cache_stats"), {}),
+            (reverse("task_stats"), {}),
+            (reverse("profiling"), {}),
+        ]
+        for urls, user in [(anonymous, None), (staff, self.admin)]:
+            if user:
+                self.client.force_login(user)
+            for url, params in urls:
+                with self.subTest(url=url, params=params):
+                    limits = view_budget(resolve(url).func)
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertLessEqual(len(queries), limits.queries)
+
+    def test_every_route_declares_a_budget(self):
+        def callbacks(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    if pattern.app_name != "admin":
+                        yield from callbacks(pattern.url_patterns)
+                else:
+                    yield pattern.name, pattern.callback
+
+        for urlconf in ["core.urls", "core.async_urls"]:
+            for name, callback in callbacks(get_resolver(urlconf).url_patterns):
+                with self.subTest(urlconf=urlconf, name=name):
+                    self.assertIsNotNone(view_budget(callback))
+
+
+class SQLiteProfileTests(TestCase):
+    databases = {"default", "readonly"}
+
+    def connect(self, path, alias):
+        """A new raw connection to ``path``, set up like ``alias``'s"""
+        settings_dict = {
+            **connections["default"].settings_dict,
+            "NAME": str(path),
+            "OPTIONS": {"timeout": 0.05},
+        }
+        wrapper = type(connections["default"])(settings_dict, alias)
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper.connection
+
+    def test_wal_profile_lets_writers_commit_under_open_reads(self):
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        for tuning in [False, True]:
+            path = directory / f"tuning-{tuning}.sqlite3"
+            with override_settings(PROPERTY_SQLITE_TUNING=tuning):
+                writer = self.connect(path, "default")
+                reader = self.connect(path, "readonly")
+            writer.execute("CREATE TABLE item (id INTEGER PRIMARY KEY)")
+            with self.assertRaisesMessage(sqlite3.OperationalError, "readonly"):
+                reader.execute("INSERT INTO item DEFAULT VALUES")
+
+            # A long read, e.g. a slow list page, holds its snapshot open
+            reader.execute("BEGIN")
+            reader.execute("SELECT count(*) FROM item").fetchone()
+            writer.execute("BEGIN IMMEDIATE")
+            writer.execute("INSERT INTO item DEFAULT VALUES")
+            if tuning:
+                writer.execute("COMMIT")
+                self.assertEqual(
+                    reader.execute("SELECT count(*) FROM item").fetchone(), (0,)
+                )
+                reader.execute("COMMIT")
+                self.assertEqual(
+                    reader.execute("SELECT count(*) FROM item").fetchone(), (1,)
+                )
+                self.assertEqual(
+                    writer.execute("PRAGMA journal_mode").fetchone(), ("wal",)
+                )
+                self.assertEqual(writer.execute("PRAGMA synchronous").fetchone(), (1,))
+            else:
+                with self.assertRaisesMessage(sqlite3.OperationalError, "locked"):
+                    writer.execute("COMMIT")
+                writer.execute("ROLLBACK")
+                reader.execute("COMMIT")
+
+
+class ReplicaRouterTests(TestCase):
+    databases = {"default", "readonly"}
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.addCleanup(routers._unavailable_until.clear)
+        # Outside TestCase's transaction, as in a request
+        patcher = mock.patch.object(connections["default"], "in_atomic_block", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self):
+        # A fresh context, unpinned by writes the test itself made
+        return Context().run(self.router.db_for_read, Property)
+
+    def test_listing_reads_go_to_replicas(self):
+        self.assertEqual(self.read(), "readonly")
+        self.assertEqual(self.router.db_for_read(get_user_model()), "default")
+        with override_settings(PROPERTY_READ_DATABASES=[]):
+            self.assertEqual(self.read(), "default")
+        self.assertEqual(Context().run(self.router.db_for_write, Property), "default")
+        self.assertFalse(self.router.allow_migrate("readonly", "property"))
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        with mock.patch.object(
+            connections["readonly"],
+            "ensure_connection",
+            side_effect=OperationalError("unable to open database file"),
+        ) as ensure_connection:
+            self.assertEqual(self.read(), "default")
+            self.assertEqual(self.read(), "default")
+        # Not retried until PROPERTY_REPLICA_RETRY_SECONDS have passed
+        self.assertEqual(ensure_connection.call_count, 1)
+        with mock.patch("property.routers.time.monotonic", return_value=1e12):
+            self.assertEqual(self.read(), "readonly")
+
+    @override_settings(PROPERTY_READ_DATABASES=["readonly", "replica2"])
+    def test_a_request_reads_from_one_replica(self):
+        reads = []
+
+        def view(request):
+            reads.append([self.router.db_for_read(Property) for _ in range(5)])
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(view)
+        with mock.patch(
+            "property.routers.replica_available", return_value=True
+        ) as available:
+            for _ in range(20):
+                Context().run(middleware, RequestFactory().get("/"))
+        # Checked once per request, and each request sticks to its choice
+        self.assertEqual(available.call_count, 20)
+        self.assertTrue(all(len(set(request)) == 1 for request in reads))
+        self.assertEqual({request[0] for request in reads}, {"readonly", "replica2"})
+
+    def test_requests_read_their_own_writes(self):
+        reads = []
+
+        def view(request):
+            if request.method == "POST":
+                self.router.db_for_write(Location)
+            reads.append(self.router.db_for_read(Location))
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(view)
+        factory = RequestFactory()
+        post = Context().run(middleware, factory.post("/"))
+        self.assertEqual(post.cookies["primary_db"]["max-age"], 15)
+
+        # The redirected-to page reads from the primary, others from replicas
+        factory.cookies["primary_db"] = "1"
+        pinned = Context().run(middleware, factory.get("/"))
+        del factory.cookies["primary_db"]
+        Context().run(middleware, factory.get("/"))
+        self.assertEqual(reads, ["default", "default", "readonly"])
+        self.assertNotIn("primary_db", pinned.cookies)
+
+
+@override_settings(
+    PROPERTY_PAGE_CACHE_TIMEOUT=0,
+    PROPERTY_CARD_CACHE_TIMEOUT=0,
+    PROPERTY_AUTOCOMPLETE_INDEX=False,
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    # The replica mirrors the test database, so it sees committed rows
+    databases = {"default", "readonly"}
+
+    def setUp(self):
+        cache.clear()
+        self.location = Location.objects.create(name="Gulshan", city="Dhaka")
+        self.listing = make_property(self.location, title="Lake view flat")
+
+    def queries(self, url, data=None):
+        with (
+            CaptureQueriesContext(connections["default"]) as primary,
+            CaptureQueriesContext(connections["readonly"]) as replica,
+        ):
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return primary.captured_queries, replica.captured_queries
+
+    def test_listing_pages_and_autocomplete_read_from_the_replica(self):
+        for url, data in [
+            (reverse("property:property_list"), {"location": self.location.pk}),
+            (reverse("property:property_list"), {"q": "lake"}),
+            (reverse("property_api"), None),
+            (reverse("property:property_detail", args=[self.listing.pk]), None),
+            (reverse("autocomplete"), {"q": "gul"}),
+        ]:
+            with self.subTest(url=url, data=data):
+                primary, replica = self.queries(url, data)
+                self.assertEqual(primary, [])
+                self.assertTrue(replica)
+
+    def test_writes_and_the_next_request_use_the_primary(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "a@example.com", "pw")
+        )
+        response = self.client.post(
+            reverse("admin:property_location_change", args=[self.location.pk]),
+            {"name": "Gulshan 2", "city": "Dhaka", "state": "", "country": "BD"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("primary_db", response.cookies)
+
+        primary, replica = self.queries(reverse("property:property_list"))
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+
+class BulkImportTests(TestCase):
+    header = (
+        "external_id,title,description,property_type,status,price,bedrooms,"
+        "bathrooms,location,city,country\n"
+    )
+
+    def import_csv(self, body, **options):
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        path = directory / "feed.csv"
+        path.write_text(self.header + body, encoding="utf-8")
+        call_command(
+            "import_properties", str(path), bulk=True, stdout=StringIO(), **options
+        )
+        return path
+
+    def test_bulk_import_creates_locations_and_rejects_bad_rows(self):
+        Location.objects.create(name="Gulshan", city="Dhaka", country="Bangladesh")
+        path = self.import_csv(
+            ",Flat,Nice,apartment,available,1000,2,1,Gulshan,Dhaka,Bangladesh\n"
+            ",Shop,Busy,commercial,rented,2000,0,1,Motijheel,Dhaka,Bangladesh\n"
+            ",Castle,Old,castle,available,abc,2,1,Gulshan,Dhaka,Bangladesh\n"
+            ",House,Big,house,available,3000,4,2,,,\n",
+            batch_size=2,
+        )
+
+        self.assertEqual(Property.objects.count(), 3)
+        self.assertEqual(
+            dict(Location.objects.values_list("name", "property_count")),
+            {"Gulshan": 1, "Motijheel": 1},
+        )
+        self.assertIsNone(Property.objects.get(title="House").location)
+
+        with open(f"{path}.rejects.csv", encoding="utf-8") as rejects:
+            (rejected,) = list(csv.DictReader(rejects))
+        self.assertEqual(rejected["title"], "Castle")
+        self.assertEqual(rejected["line"], "4")
+        self.assertIn("property_type", rejected["error"])
+        self.assertIn("price", rejected["error"])
+
+    def test_reimport_upserts_by_external_id(self):
+        self.import_csv(
+            "A-1,Flat,Nice,apartment,available,1000,2,1,Gulshan,Dhaka,Bangladesh\n"
+            "A-2,Shop,Busy,commercial,rented,2000,0,1,Gulshan,Dhaka,Bangladesh\n"
+        )
+        flat = Property.objects.get(external_id="A-1")
+        self.import_csv(
+            "A-1,Flat,Nicer,apartment,rented,1100,2,1,Banani,Dhaka,Bangladesh\n"
+            "A-3,Plot,Empty,house,available,500,0,0,Banani,Dhaka,Bangladesh\n"
+            "A-3,Plot,Last row wins,house,available,600,0,0,Banani,Dhaka,Bangladesh\n"
+        )
+
+        self.assertEqual(Property.objects.count(), 3)
+        updated = Property.objects.select_related("location").get(external_id="A-1")
+        self.assertEqual(updated.pk, flat.pk)
+        self.assertEqual(updated.created_at, flat.created_at)
+        self.assertEqual(
+            (updated.description, updated.status, updated.location.name),
+            ("Nicer", "rented", "Banani"),
+        )
+        self.assertEqual(
+            Property.objects.get(external_id="A-3").description, "Last row wins"
+        )
+        self.assertEqual(
+            dict(Location.objects.values_list("name", "property_count")),
+            {"Gulshan": 1, "Banani": 2},
+        )
+
+    def test_enqueued_import_runs_in_a_worker(self):
+        use_shared_cache(self)
+        path = self.import_csv(
+            ",Flat,Nice,apartment,available,1000,2,1,Gulshan,Dhaka,Bangladesh\n"
+            ",Castle,Old,castle,available,abc,2,1,Gulshan,Dhaka,Bangladesh\n",
+            enqueue=True,
+        )
+        self.assertFalse(Property.objects.exists())
+
+        call_command("run_workers", burst=True, verbosity=0, stdout=StringIO())
+        self.assertEqual(Location.objects.get().property_count, 1)
+        task = QueuedTask.objects.get()
+        self.assertEqual(task.queue_name, "imports")
+        self.assertEqual(
+            task.return_value,
+            {
+                "imported": 1,
+                "updated": 0,
+                "rejected": 1,
+                "seconds": task.return_value["seconds"],
+                "rejects": f"{path}.rejects.csv",
+            },
+        )
+
+    def test_parallel_import_matches_serial_import(self):
+        body = "".join(
+            f"P-{n % 40},Listing {n},Row {n},house,available,{1000 + n},2,1,"
+            f"Area {n % 7},Dhaka,Bangladesh\n"
+            for n in range(100)
+        )
+        body += "P-bad,Broken,Row,house,available,oops,2,1,,,\n"
+        path = self.import_csv(body)
+        serial = dict(Property.objects.values_list("external_id", "description"))
+        Property.objects.all().delete()
+
+        _, shards = shard_ranges(path, 512)
+        self.assertGreater(len(shards), 3)
+        rejects = RejectWriter(
+            path.with_suffix(".parallel.csv"), self.header.strip().split(",")
+        )
+        BulkPropertyImporter(batch_size=30, rejects=rejects).run_parallel(
+            path, workers=2, shard_size=512
+        )
+        rejects.close()
+        parallel = dict(Property.objects.values_list("external_id", "description"))
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(parallel), 40)
+        self.assertEqual(parallel["P-0"], "Row 80")
+        with open(rejects.path, encoding="utf-8") as rejected:
+            self.assertEqual([row["line"] for row in csv.DictReader(rejected)], ["102"])
+
+
+@override_settings(PROPERTY_LIST_PAGINATION="cursor")
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        # Pairs of listings share a timestamp to exercise the id tie-breaker
+        for number in range(20):
+            make_property(self.location, title=f"Listing {number}")
+        for number, listing in enumerate(Property.objects.order_by("pk")):
+            Property.objects.filter(pk=listing.pk).update(
+                created_at=listing.created_at.replace(microsecond=0)
+                + timedelta(minutes=number // 2)
+            )
+        self.expected = list(
+            Property.objects.order_by("-created_at", "-pk").values_list("pk", flat=True)
+        )
+
+    def get_page(self, **params):
+        response = self.client.get(reverse("property:property_list"), params)
+        return response.context["page_obj"], response
+
+    def test_walks_forward_and_back_without_gaps(self):
+        pages = []
+        page, _ = self.get_page()
+        pages.append([listing.pk for listing in page])
+        while page.has_next():
+            page, _ = self.get_page(cursor=page.next_cursor)
+            pages.append([listing.pk for listing in page])
+        self.assertEqual([pk for chunk in pages for pk in chunk], self.expected)
+        self.assertEqual([len(chunk) for chunk in pages], [9, 9, 2])
+
+        while page.has_previous():
+            page, _ = self.get_page(cursor=page.previous_cursor)
+            self.assertEqual([listing.pk for listing in page], pages.pop(-2))
+        self.assertEqual(len(pages), 1)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        for cursor in ["", "garbage", "W10", "WyJ4IiwxLDJd"]:
+            page, response = self.get_page(cursor=cursor)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([listing.pk for listing in page], self.expected[:9])
+            self.assertFalse(page.has_previous())
+
+    def test_each_page_is_one_query_with_counter_or_cached_total(self):
+        page, _ = self.get_page(location=self.location.pk)
+        with self.assertNumQueries(2):
+            _, response = self.get_page(
+                location=self.location.pk, cursor=page.next_cursor
+            )
+        self.assertEqual(response.context["count"], 20)
+
+        self.get_page()
+        with self.assertNumQueries(1):
+            _, response = self.get_page(cursor=page.next_cursor)
+        self.assertEqual(response.context["count"], 20)
+        self.assertContains(response, "cursor=")
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        self.villa = make_property(
+            self.location, title="Lakeside Villa", description="Quiet garden"
+        )
+        self.flat = make_property(
+            title="City Flat", description="Walk to the lakeside promenade"
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse("search"), {"q": query})
+        return [result["id"] for result in response.json()["results"]]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search("lakeside"), [self.villa.pk, self.flat.pk])
+        self.assertEqual(self.search("lake vil"), [self.villa.pk])
+        self.assertEqual(self.search('"villa" gard*'), [self.villa.pk])
+        self.assertEqual(self.search(""), [])
+
+    def test_index_follows_property_and_location_writes(self):
+        self.assertEqual(self.search("dhaka"), [self.villa.pk])
+        self.flat.location = self.location
+        self.flat.save()
+        self.assertCountEqual(self.search("dhaka"), [self.villa.pk, self.flat.pk])
+
+        self.location.city = "Chittagong"
+        self.location.save()
+        self.assertEqual(self.search("dhaka"), [])
+        self.assertEqual(len(self.search("chittagong")), 2)
+
+        self.villa.delete()
+        self.assertEqual(self.search("chittagong"), [self.flat.pk])
+
+    def test_list_page_free_text_search(self):
+        response = self.client.get(reverse("property:property_list"), {"q": "garden"})
+        self.assertEqual(
+            [listing.pk for listing in response.context["page_obj"]], [self.villa.pk]
+        )
+        response = self.client.get(reverse("property:property_list"), {"q": "moat"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["count"], 0)
+
+    def test_list_and_admin_searches_keep_every_match(self):
+        Property.objects.bulk_create(
+            Property(title=f"Harbour Loft {number}", description="", price=1)
+            for number in range(1200)
+        )
+        call_command("rebuild_search_index", stdout=StringIO())
+        response = self.client.get(reverse("property:property_list"), {"q": "harbour"})
+        self.assertEqual(response.context["count"], 1200)
+        self.assertEqual(len(response.context["page_obj"]), 9)
+        # The ranked API keeps its cap
+        self.assertEqual(len(self.search("harbour")), 20)
+
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "a@example.com", "pw")
+        )
+        response = self.client.get(
+            reverse("admin:property_property_changelist"), {"q": "harbour"}
+        )
+        self.assertEqual(response.context["cl"].result_count, 1200)
+
+    def test_list_page_matches_partial_location_names(self):
+        response = self.client.get(
+            reverse("property:property_list"), {"location": "haka"}
+        )
+        self.assertEqual(response.context["count"], 1)
+        self.assertEqual(
+            [listing.pk for listing in response.context["page_obj"]], [self.villa.pk]
+        )
+
+    def test_rebuild_command_restores_bulk_writes(self):
+        Property.objects.bulk_create([Property(title="Harbour Loft", price=1)])
+        self.assertEqual(self.search("harbour"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(len(self.search("harbour")), 1)
+
+
+class GeoSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        rng = random.Random(0)
+        self.locations = [
+            Location.objects.create(
+                name=f"Block {number}",
+                city="Dhaka",
+                latitude=23.8 + rng.uniform(-0.3, 0.3),
+                longitude=90.4 + rng.uniform(-0.3, 0.3),
+            )
+            for number in range(150)
+        ]
+
+    def distance(self, location, latitude, longitude):
+        return geo.haversine_km(
+            latitude, longitude, location.latitude, location.longitude
+        )
+
+    def test_geohash(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        location = self.locations[0]
+        self.assertEqual(
+            location.geohash, geo.encode(location.latitude, location.longitude)
+        )
+        location.latitude = 51.5
+        location.save(update_fields=["latitude", "longitude"])
+        location.refresh_from_db()
+        self.assertEqual(location.geohash, geo.encode(51.5, location.longitude))
+
+    def test_bounding_box_matches_a_scan(self):
+        rng = random.Random(1)
+        for _ in range(25):
+            south, west = 23.5 + rng.uniform(0, 0.5), 90.1 + rng.uniform(0, 0.5)
+            north = south + rng.uniform(0.001, 0.2)
+            east = west + rng.uniform(0.001, 0.2)
+            expected = {
+                location.pk
+                for location in self.locations
+                if south <= location.latitude <= north
+                and west <= location.longitude <= east
+            }
+            found = Location.objects.within_bbox(south, west, north, east)
+            self.assertEqual(set(found.values_list("pk", flat=True)), expected)
+
+    def test_radius_search_is_sorted_by_distance(self):
+        for radius in [2, 10, 40]:
+            found = list(Location.objects.near(23.8, 90.4, radius))
+            distances = [location.distance_km for location in found]
+            self.assertEqual(distances, sorted(distances))
+            self.assertTrue(all(distance <= radius for distance in distances))
+            inside = [
+                location
+                for location in self.locations
+                if self.distance(location, 23.8, 90.4) <= radius * 0.99
+            ]
+            self.assertTrue(set(inside) <= set(found))
+            for location in found:
+                self.assertAlmostEqual(
+                    location.distance_km, self.distance(location, 23.8, 90.4), delta=0.1
+                )
+
+    def test_listings_carry_their_location_coordinates(self):
+        first, second = self.locations[:2]
+        listing = make_property(first)
+        self.assertEqual(
+            (listing.latitude, listing.longitude, listing.geohash),
+            (first.latitude, first.longitude, first.geohash),
+        )
+        found = Property.objects.within_radius(first.latitude, first.longitude, 1)
+        self.assertNotIn("property_location", str(found.query))
+        self.assertEqual(list(found), [listing])
+
+        # The listing follows its location, and a move to another location
+        listing = Property.objects.get()
+        listing.location = second
+        listing.save(update_fields=["location"])
+        listing.refresh_from_db()
+        self.assertEqual(listing.geohash, second.geohash)
+        second.latitude, second.longitude = 51.5, -0.12
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        listing.refresh_from_db()
+        self.assertEqual((listing.latitude, listing.longitude), (51.5, -0.12))
+        self.assertEqual(
+            list(Property.objects.within_radius(51.5, -0.12, 1)), [listing]
+        )
+
+        # Bulk writes copy them explicitly
+        Property.objects.bulk_create([Property(title="Bulk", price=1, location=first)])
+        Property.objects.filter(geohash="").sync_coordinates()
+        self.assertEqual(Property.objects.get(title="Bulk").geohash, first.geohash)
+
+    def test_migration_fills_map_cells(self):
+        for location in self.locations[:20]:
+            make_property(location)
+        MapCell.objects.refresh()
+        expected = set(MapCell.objects.values_list("geohash", "listings", "locations"))
+        MapCell.objects.all().delete()
+        Property.objects.update(latitude=None, longitude=None, geohash="")
+
+        migration = import_module("property.migrations.0019_property_coordinates")
+        migration.copy_location_coordinates(django_apps, connection.schema_editor())
+        migration.fill_map_cells(django_apps, connection.schema_editor())
+        self.assertEqual(
+            set(MapCell.objects.values_list("geohash", "listings", "locations")),
+            expected,
+        )
+        self.assertFalse(Property.objects.filter(geohash="").exists())
+
+    def test_listing_near_parameter(self):
+        near = sorted(self.locations, key=lambda l: self.distance(l, 23.8, 90.4))
+        listings = [make_property(location) for location in near[:12]]
+        make_property(near[-1])
+
+        response = self.client.get(
+            reverse("property:property_list"), {"near": "23.8,90.4", "radius": "100"}
+        )
+        self.assertEqual(response.context["near"]["radius_km"], 100)
+        self.assertEqual(
+            [listing.pk for listing in response.context["page_obj"]],
+            [listing.pk for listing in listings[:9]],
+        )
+
+        radius = self.distance(near[11], 23.8, 90.4) + 0.01
+        data = self.client.get(
+            reverse("property_api"), {"near": "23.8,90.4", "radius": radius}
+        ).json()
+        self.assertEqual(data["count"], 12)
+        self.assertEqual(data["results"][0]["id"], listings[0].pk)
+        self.assertLess(data["results"][0]["distance_km"], radius)
+
+        # Invalid points are ignored rather than failing the page
+        response = self.client.get(reverse("property:property_list"), {"near": "x,1"})
+        self.assertIsNone(response.context["near"])
+        self.assertEqual(response.context["count"], 13)
+
+    def test_map_clusters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for location in self.locations:
+                make_property(location)
+            make_property(self.locations[0])
+        url = reverse("property_map")
+        self.assertEqual(self.client.get(url, {"bbox": "1,2,3"}).status_code, 400)
+
+        # Cells kept up to date by the signal handlers match a full rebuild
+        cells = set(MapCell.objects.values_list("geohash", "listings", "locations"))
+        MapCell.objects.refresh()
+        self.assertEqual(
+            cells, set(MapCell.objects.values_list("geohash", "listings", "locations"))
+        )
+
+        # From map cells, then from locations once zoomed in
+        for bbox in ["-90,-180,90,180", "23,89,25,91", "23.78,90.38,23.82,90.42"]:
+            with self.subTest(bbox=bbox):
+                data = self.client.get(url, {"bbox": bbox}).json()
+                south, west, north, east = map(float, bbox.split(","))
+                inside = Location.objects.within_bbox(south, west, north, east)
+                self.assertLessEqual(len(data["clusters"]), 256)
+                self.assertEqual(
+                    sum(cluster[2] for cluster in data["clusters"]),
+                    sum(inside.values_list("property_count", flat=True)),
+                )
+
+        # Zoomed in on one location, its cluster links to it
+        location = self.locations[0]
+        bbox = (
+            f"{location.latitude - 0.0001},{location.longitude - 0.0001},"
+            f"{location.latitude + 0.0001},{location.longitude + 0.0001}"
+        )
+        data = self.client.get(url, {"bbox": bbox}).json()
+        self.assertEqual(data["clusters"][0][2:], [2, location.pk])
+
+
+@skipUnless(similarity.np, "NumPy is not installed")
+class SimilarityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        rng = random.Random(0)
+        self.locations = [
+            Location.objects.create(
+                name=f"Road {number}",
+                city="Dhaka",
+                latitude=23.79 + number * 0.002,
+                longitude=90.41,
+            )
+            for number in range(3)
+        ]
+        self.listings = [
+            make_property(
+                rng.choice(self.locations),
+                title=f"Listing {number}",
+                price=rng.randrange(50_000, 500_000),
+                bedrooms=rng.randint(1, 4),
+                bathrooms=rng.randint(1, 3),
+                property_type=rng.choice(Property.PROPERTY_TYPES)[0],
+                status="available" if number % 5 else "rented",
+            )
+            for number in range(30)
+        ]
+
+    def assertNearest(self, count=3):
+        """Stored neighbours are the nearest available listings by brute force"""
+        np = similarity.np
+        data = similarity.load()
+        self.assertEqual(len(set(data.blocks)), 1)
+        positions = {pk: index for index, pk in enumerate(data.ids.tolist())}
+        stored = {row.pk: row.neighbour_ids for row in PropertyNeighbours.objects.all()}
+        self.assertEqual(set(stored), set(positions))
+        for pk, index in positions.items():
+            distances = np.sqrt(((data.vectors - data.vectors[index]) ** 2).sum(axis=1))
+            distances[index] = np.inf
+            distances[~data.available] = np.inf
+            expected = np.sort(distances)[:count]
+            found = [positions[neighbour] for neighbour in stored[pk]]
+            np.testing.assert_allclose(
+                distances[found], expected[np.isfinite(expected)], rtol=1e-4
+            )
+
+    def test_rebuild_stores_nearest_available_listings(self):
+        out = StringIO()
+        call_command(
+            "rebuild_similar_properties", "--full", "--neighbours=3", stdout=out
+        )
+        self.assertIn("Computed neighbours of 30 properties", out.getvalue())
+        self.assertNearest()
+
+    def test_update_recomputes_only_affected_listings(self):
+        similarity.rebuild(3)
+        listing = self.listings[1]
+        listing.price = self.listings[2].price
+        listing.save()
+        self.listings[3].delete()
+        rented = self.listings[4]
+        rented.status = "rented"
+        rented.save()
+        make_property(self.locations[0], price=self.listings[6].price, bedrooms=2)
+
+        updated = similarity.update(3)
+        self.assertLess(updated, Property.objects.count())
+        self.assertNearest()
+        self.assertEqual(similarity.update(3), 0)
+
+    def test_sparse_listings_borrow_neighbours_from_wider_areas(self):
+        remote = make_property(
+            Location.objects.create(name="Zindabazar", latitude=24.89, longitude=91.87)
+        )
+        unmapped = make_property(Location.objects.create(name="Unmapped"))
+        similarity.rebuild(3)
+        for listing in [remote, unmapped]:
+            self.assertEqual(len(listing.neighbours.neighbour_ids), 3)
+
+    def test_listings_without_a_location_get_neighbours(self):
+        unlocated = [make_property(title=f"Feed row {number}") for number in range(2)]
+        similarity.rebuild(3)
+        for listing in unlocated:
+            self.assertEqual(len(listing.neighbours.neighbour_ids), 3)
+        unlocated[0].price = 1
+        unlocated[0].save()
+        self.assertGreater(similarity.update(3), 0)
+
+    def test_detail_page_reads_stored_neighbours(self):
+        similarity.rebuild(4)
+        listing = self.listings[1]
+        stored = PropertyNeighbours.objects.get(pk=listing.pk).neighbour_ids
+        Property.objects.filter(pk=stored[0]).update(status="rented")
+        url = reverse("property:property_detail", args=[listing.pk])
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(
+            [similar.pk for similar in response.context["similar_properties"]],
+            stored[1:],
+        )
+        self.assertContains(response, "Similar properties")
+
+        # Before the first build, other listings at the same location
+        PropertyNeighbours.objects.all().delete()
+        cache.clear()
+        response = self.client.get(url)
+        for similar in response.context["similar_properties"]:
+            self.assertEqual(similar.location_id, listing.location_id)
+            self.assertEqual(similar.status, "available")
+
+    def test_build_needs_numpy(self):
+        with mock.patch.object(similarity, "np", None):
+            with self.assertRaisesMessage(CommandError, "NumPy"):
+                call_command("rebuild_similar_properties", stdout=StringIO())
+
+
+class PropertyAPITests(TestCase):
+    def setUp(self):
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh", latitude=23.79
+        )
+        self.listing = make_property(self.location, title="Lake view", price=1500)
+        for order in range(3):
+            Image.objects.create(
+                property=self.listing,
+                image=f"property_images/{order}.jpg",
+                order=order,
+                is_primary=order == 1,
+            )
+        self.url = reverse("property_detail_api", args=[self.listing.pk])
+
+    def test_detail_payload_and_sparse_fieldsets(self):
+        with self.assertNumQueries(3):
+            data = self.client.get(self.url).json()
+        self.assertEqual(data["price"], "$1,500.00")
+        self.assertEqual(data["location"]["name"], "Gulshan")
+        self.assertEqual(data["location"]["latitude"], 23.79)
+        self.assertEqual(
+            [image["url"] for image in data["images"]],
+            [f"/media/property_images/{order}.jpg" for order in range(3)],
+        )
+        self.assertEqual(data["primary_image_url"], "/media/property_images/1.jpg")
+
+        # Left-out relations are neither joined nor prefetched
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"fields": "id,title"})
+        self.assertEqual(response.json(), {"id": self.listing.pk, "title": "Lake view"})
+
+        response = self.client.get(self.url, {"fields": "title,secret"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()["fields"])
+        response = self.client.get(reverse("property_detail_api", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+        results = self.client.get(
+            reverse("property_api"), {"fields": "id,primary_image_url"}
+        ).json()["results"]
+        self.assertEqual(
+            results,
+            [
+                {
+                    "id": self.listing.pk,
+                    "primary_image_url": "/media/property_images/1.jpg",
+                }
+            ],
+        )
+
+    def test_conditional_requests_answered_from_updated_at(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        response = self.client.get(
+            self.url, headers={"if-modified-since": response["Last-Modified"]}
+        )
+        self.assertEqual(response.status_code, 304)
+        # Each fieldset is its own representation
+        sparse = self.client.get(self.url, {"fields": "id"})["ETag"]
+        self.assertNotEqual(sparse, etag)
+
+        changes = [
+            lambda: Image.objects.create(
+                property=self.listing, image="property_images/new.jpg", order=9
+            ),
+            lambda: Image.objects.filter(order=9).delete(),
+            lambda: Location.objects.get().save(),
+            lambda: Property.objects.get().save(),
+        ]
+        for change in changes:
+            change()
+            response = self.client.get(self.url, headers={"if-none-match": etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.location = Location.objects.create(
+            name="Gulshan", city="Dhaka", country="Bangladesh"
+        )
+        for number in range(5):
+            listing = make_property(
+                self.location,
+                title=f"Flat {number}",
+                description='Says "hi",\nover two lines',
+                price=1000 * (number + 1),
+                property_type="house" if number % 2 else "apartment",
+                status="rented" if number == 4 else "available",
+                external_id=f"E-{number}",
+            )
+            Image.objects.create(
+                property=listing, image=f"property_images/{number}.jpg", order=0
+            )
+        self.staff = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+
+    def test_csv_export_round_trips_through_import(self):
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        path = directory / "export.csv"
+        stderr = StringIO()
+        call_command(
+            "export_properties",
+            output=str(path),
+            status="available",
+            min_price="2000",
+            stderr=stderr,
+        )
+        self.assertIn("Exported 3 properties", stderr.getvalue())
+
+        with open(path, newline="", encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual([row["title"] for row in rows], ["Flat 1", "Flat 2", "Flat 3"])
+        self.assertEqual(rows[0]["description"], 'Says "hi",\nover two lines')
+        self.assertEqual(rows[0]["primary_image"], "/media/property_images/1.jpg")
+        self.assertEqual(rows[0]["location"], "Gulshan")
+
+        Property.objects.all().delete()
+        call_command("import_properties", str(path), bulk=True, stdout=StringIO())
+        self.assertEqual(
+            list(
+                Property.objects.order_by("external_id").values_list(
+                    "external_id", "price", "location__name"
+                )
+            ),
+            [
+                ("E-1", 2000, "Gulshan"),
+                ("E-2", 3000, "Gulshan"),
+                ("E-3", 4000, "Gulshan"),
+            ],
+        )
+
+    def test_staff_endpoint_streams_gzipped_ndjson(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse("property_export"),
+            {"format": "ndjson", "gzip": "1", "type": "house"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn("properties.ndjson.gz", response["Content-Disposition"])
+
+        body = gzip.decompress(b"".join(response.streaming_content))
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row["title"] for row in rows], ["Flat 1", "Flat 3"])
+        self.assertEqual(rows[0]["city"], "Dhaka")
+
+    def test_endpoint_rejects_bad_requests_and_non_staff(self):
+        url = reverse("property_export")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        for params in [{"format": "xml"}, {"type": "castle"}, {"min_price": "abc"}]:
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("errors", response.json())
+
+        with self.assertRaisesMessage(CommandError, "--type"):
+            call_command("export_properties", type="castle", stdout=StringIO())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def export_queries():
+            with CaptureQueriesContext(connection) as queries:
+                call_command(
+                    "export_properties",
+                    chunk_size=2,
+                    stdout=StringIO(),
+                    stderr=StringIO(),
+                )
+            return len(queries)
+
+        before = export_queries()
+        for number in range(20):
+            make_property(self.location, title=f"More {number}")
+        # SQLite streams from a single cursor, whatever the chunk size
+        self.assertEqual(export_queries(), before)
+
+
+class BenchmarkReplayTests(TestCase):
+    def test_trace_of_generated_catalogue_replays_cleanly(self):
+        from .benchmarks.data import create_catalogue
+        from .benchmarks.replay import WSGIClient, report
+        from .benchmarks.trace import read_trace, sample_entries, write_trace
+
+        create_catalogue(60, seed=1, batch_size=25)
+        self.assertEqual(Property.objects.count(), 60)
+        self.assertEqual(
+            Image.objects.filter(is_primary=True).count(),
+            Property.objects.filter(images__isnull=False).distinct().count(),
+        )
+
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / "trace.jsonl"
+        write_trace(path, sample_entries(80, seed=1))
+        entries = list(read_trace(path))
+        self.assertEqual(len(entries), 80)
+        self.assertEqual(entries, list(sample_entries(80, seed=1)))
+
+        client = WSGIClient("testserver")
+        results = report(entries, [client.request(entry) for entry in entries], 1.0)
+        self.assertEqual(results["statuses"], {"200": 80})
+        self.assertEqual(
+            set(results["endpoints"]), {"home", "list", "detail", "autocomplete"}
+        )
+        self.assertEqual(results["total"]["requests_per_second"], 80.0)
@@ -0,0 +1,254 @@
+"""
+Resumable Uploads Module
+Chunked bulk image uploads: each chunk request streams into its upload
+session's partial file through SessionUploadHandler, 64 KB at a time, and a
+batch of complete sessions becomes Image rows with one bulk_create
+"""
+
+import re
+import time
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.db import router, transaction
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from .models import Image, MediaBlob, UploadSession
+from .models.image import gallery_saved
+from .tasks import generate_gallery_renditions
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadError(Exception):
+    """A chunk or batch that cannot be accepted, with the HTTP status to send"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_content_range(header):
+    """``(start, end, total)`` of ``bytes <first>-<last>/<total>``, end exclusive"""
+    match = CONTENT_RANGE.match(header or "")
+    if match is None:
+        return None
+    first, last, total = map(int, match.groups())
+    if first > last or last >= total:
+        return None
+    return first, last + 1, total
+
+
+class SessionUploadHandler(FileUploadHandler):
+    """
+    Writes the bytes of a chunk request into an upload session's partial file
+    from ``start``, ``chunk_size`` bytes at a time, refusing more than the
+    ``end - start`` the request declared. The only upload handler of
+    multipart chunk requests; ``receive`` feeds it a raw request body.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, session, start, end, request=None):
+        super().__init__(request)
+        self.session = session
+        self.start, self.end = start, end
+        self.written = 0
+        self.file = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.file is not None:
+            # One file per chunk request
+            raise StopUpload(connection_reset=True)
+        path = self.session.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, "r+b" if path.exists() else "wb")
+        self.file.seek(self.start)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.written + len(raw_data) > self.end - self.start:
+            raise StopUpload(connection_reset=True)
+        self.file.write(raw_data)
+        self.written += len(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.close()
+        return None
+
+    def upload_interrupted(self):
+        self.close()
+
+    def close(self):
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+
+    def receive(self, stream):
+        """Store a raw request body"""
+        length = self.end - self.start
+        self.new_file("chunk", self.session.filename, None, length)
+        try:
+            while self.written < length:
+                data = stream.read(min(self.chunk_size, length - self.written))
+                if not data:
+                    break
+                self.receive_data_chunk(data, self.start + self.written)
+        finally:
+            self.close()
+
+
+def receive_chunk(session, start, end, total, request):
+    """
+    Store the chunk ``[start, end)`` of ``session`` from a DRF request, raw
+    or as a multipart file, and return the session with its new
+    ``received``. A chunk may repeat bytes already received (a retry whose
+    response was lost) but not leave a gap; of a body cut short the bytes
+    that arrived are kept, so the client resumes after them.
+    """
+    if total != session.size:
+        raise UploadError(f"The upload is {session.size} bytes, not {total}.")
+    if end - start > settings.PROPERTY_UPLOAD_MAX_CHUNK:
+        raise UploadError(
+            f"Chunks are at most {settings.PROPERTY_UPLOAD_MAX_CHUNK} bytes.", 413
+        )
+    if start > session.received:
+        raise UploadError(f"The next chunk starts at byte {session.received}.", 409)
+    if start > 0 and not session.path.exists():
+        raise UploadError("The received bytes were lost; start again.", 409)
+
+    handler = SessionUploadHandler(session, start, end, request)
+    try:
+        if request.content_type.startswith("multipart/form-data"):
+            request.upload_handlers = [handler]
+            # Parsing the body runs it through the handler
+            request.data
+        elif request.META.get("CONTENT_LENGTH") == str(end - start):
+            handler.receive(request.stream)
+        else:
+            raise UploadError("Content-Length does not match Content-Range.")
+    finally:
+        handler.close()
+
+    received = start + handler.written
+    if received > session.received:
+        UploadSession.objects.filter(pk=session.pk).update(
+            received=Greatest(F("received"), received), updated_at=timezone.now()
+        )
+        session.received = received
+    return session
+
+
+def discard(session):
+    session.path.unlink(missing_ok=True)
+    session.delete()
+
+
+def is_image(path):
+    try:
+        with PILImage.open(path) as image:
+            image.verify()
+    except (OSError, SyntaxError, ValueError, PILImage.DecompressionBombError):
+        return False
+    return True
+
+
+def commit_uploads(listing, session_ids, primary_id=None):
+    """
+    Add the complete upload sessions ``session_ids`` to the gallery of
+    ``listing`` in that order, after its last image, with one
+    ``bulk_create``. The files are copied into the image storage as the rows
+    are inserted; the partial files go once the transaction commits.
+    ``primary_id``, one of the sessions, becomes the primary image.
+    """
+    if len(session_ids) > settings.PROPERTY_UPLOAD_MAX_BATCH:
+        raise UploadError(
+            f"At most {settings.PROPERTY_UPLOAD_MAX_BATCH} uploads per batch."
+        )
+    if len(set(session_ids)) != len(session_ids):
+        raise UploadError("An upload is listed twice.")
+    sessions = UploadSession.objects.filter(property=listing).in_bulk(session_ids)
+    missing = [str(pk) for pk in session_ids if pk not in sessions]
+    if missing:
+        raise UploadError(f"Unknown uploads: {', '.join(missing)}", 404)
+    if primary_id is not None and primary_id not in sessions:
+        raise UploadError("The primary image must be one of the uploads.")
+    sessions = [sessions[pk] for pk in session_ids]
+    incomplete = [str(session.pk) for session in sessions if not session.complete]
+    if incomplete:
+        raise UploadError(f"Incomplete uploads: {', '.join(incomplete)}", 409)
+    broken = [session.filename for session in sessions if not is_image(session.path)]
+    if broken:
+        raise UploadError(f"Not images: {', '.join(broken)}")
+
+    files = [File(open(session.path, "rb"), session.filename) for session in sessions]
+    try:
+        with transaction.atomic():
+            last = listing.images.aggregate(last=Max("order"))["last"]
+            first = 0 if last is None else last + 1
+            if primary_id is not None:
+                listing.images.filter(is_primary=True).update(is_primary=False)
+            images = Image.objects.bulk_create(
+                Image(
+                    property=listing,
+                    image=file,
+                    caption=session.caption,
+                    order=first + index,
+                    is_primary=session.pk == primary_id,
+                )
+                for index, (session, file) in enumerate(zip(sessions, files))
+            )
+            # bulk_create sends no signals: count the references, touch the
+            # listing and queue the renditions here
+            MediaBlob.objects.adjust(Counter(image.image.name for image in images))
+            UploadSession.objects.filter(pk__in=session_ids).delete()
+            gallery_saved.send(
+                sender=Image,
+                property_ids={listing.pk},
+                using=router.db_for_write(Image),
+            )
+            paths = [session.path for session in sessions]
+            transaction.on_commit(lambda: _unlink(paths))
+            if settings.PROPERTY_IMAGE_RENDITIONS_ON_UPLOAD:
+                image_ids = [image.pk for image in images]
+                transaction.on_commit(
+                    lambda: generate_gallery_renditions.enqueue(image_ids)
+                )
+    finally:
+        for file in files:
+            file.close()
+    return images
+
+
+def _unlink(paths):
+    for path in paths:
+        Path(path).unlink(missing_ok=True)
+
+
+def purge_expired():
+    """
+    Delete upload sessions untouched for PROPERTY_UPLOAD_EXPIRY_SECONDS and
+    partial files without a session as old. Returns the sessions deleted.
+    """
+    expiry = settings.PROPERTY_UPLOAD_EXPIRY_SECONDS
+    expired = UploadSession.objects.filter(
+        updated_at__lt=timezone.now() - timedelta(seconds=expiry)
+    )
+    sessions = list(expired)
+    _unlink(session.path for session in sessions)
+    UploadSession.objects.filter(pk__in=[session.pk for session in sessions]).delete()
+
+    directory = Path(settings.PROPERTY_UPLOAD_DIR)
+    known = {
+        f"{pk.hex}.part" for pk in UploadSession.objects.values_list("pk", flat=True)
+    }
+    for path in directory.glob("*.part") if directory.is_dir() else []:
+        if path.name not in known and path.stat().st_mtime < time.time() - expiry:
+            path.unlink(missing_ok=True)
+    return len(sessions)
@@ -15,3 +15,9 @@ urlpatterns = [
     path("", views.property_list, name="property_list"),
     path("<int:pk>", views.property_detail, name="property_detail"),
 ]
+
+# The same pages as native async views, served by core.async_urls
+async_urlpatterns = [
+    path("", views.async_property_list, name="property_list"),
+    path("<int:pk>", views.async_property_detail, name="property_detail"),
+]
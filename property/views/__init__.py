@@ -1,2 +1,4 @@
 from .pages import *
 from .api import *
+from .asynchronous import *
+from .reports import *
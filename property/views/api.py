@@ -1,12 +1,50 @@
+from calendar import timegm
+from hashlib import md5
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import GenericAPIView
-from django.db.models import Q, Count
-from ..models import Location
+from rest_framework.permissions import IsAdminUser
+from rest_framework import status
+from django.db.models import Avg, Count, F, FloatField, Min, Prefetch, Q, Sum
+from django.db.models.functions import Substr
+from .. import geo
+from ..autocomplete import location_index
+from ..cache import cache_publicly, cache_stats
+from ..filters import PropertyFilterForm, cached_facets
+from .. import uploads
+from ..models import Image, Location, MapCell, Property, UploadSession
+from ..models.map_cell import CELL_PRECISION
+from ..pagination import CountedPaginator
+from ..profiling import Budget
+from ..queue import queue_stats
 from rest_framework.response import Response
-from ..serializers import LocationAutocompleteSerializer
+from ..search import search_properties
+from ..serializers import (
+    ImageSerializer,
+    LocationAutocompleteSerializer,
+    PropertyCardSerializer,
+    PropertyDetailSerializer,
+    UploadBatchSerializer,
+    UploadSessionSerializer,
+)
+
+
+def _wants(fields, *names):
+    """Whether a sparse fieldset (None for all fields) includes any of ``names``"""
+    return fields is None or any(name in fields for name in names)
 
 
 class LocationAutocompleteAPIView(GenericAPIView):
     serializer_class = LocationAutocompleteSerializer
+    limit = 5
+    budget = Budget(queries=1)
+    # Suggestions are the same for everyone; without authentication the
+    # session is never read, so responses do not vary on Cookie and shared
+    # caches can keep them per ``q``
+    authentication_classes = []
 
     def get_queryset(self):
         query = self.request.GET.get("q", "").strip()
@@ -20,11 +58,374 @@ class LocationAutocompleteAPIView(GenericAPIView):
                 | Q(city__icontains=query)
                 | Q(country__icontains=query)
             )
-            .annotate(property_count=Count("properties"))
             .filter(property_count__gt=0)
-            .order_by("-property_count")[:5]
+            .order_by("-property_count")[: self.limit]
+        )
+
+    def get_suggestions(self):
+        """
+        Answer from the in-memory index unless it is disabled in settings
+        """
+        if settings.PROPERTY_AUTOCOMPLETE_INDEX:
+            return location_index.search(self.request.GET.get("q", ""), self.limit)
+        return self.get_queryset()
+
+    def get(self, request):
+        serializer = self.get_serializer(self.get_suggestions(), many=True)
+        return cache_publicly(
+            Response({"suggestions": serializer.data}),
+            settings.PROPERTY_AUTOCOMPLETE_MAX_AGE,
+        )
+
+
+class PropertySearchAPIView(GenericAPIView):
+    """
+    Ranked full-text search over property title, description and location
+    """
+
+    serializer_class = PropertyCardSerializer
+    default_limit = 20
+    max_limit = 100
+    budget = Budget(queries=2)
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.GET.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def get_queryset(self, fields=None):
+        query = self.request.GET.get("q", "").strip()
+        if not query:
+            return Property.objects.none()
+        limit = self.get_limit()
+        properties = Property.objects.all()
+        if _wants(fields, "location"):
+            properties = properties.select_related("location")
+        if _wants(fields, "primary_image_url"):
+            properties = properties.with_primary_image()
+        return search_properties(properties, query, limit=limit)[:limit]
+
+    def get(self, request):
+        fields = self.serializer_class.requested_fields(request.GET.get("fields"))
+        serializer = self.get_serializer(
+            self.get_queryset(fields), many=True, fields=fields
+        )
+        return Response({"results": serializer.data})
+
+
+class PropertyListAPIView(GenericAPIView):
+    """
+    Filtered property listings with facet counts per type, status, bedroom
+    and price bucket. ``?fields=id,title`` limits the listing fields.
+    """
+
+    serializer_class = PropertyCardSerializer
+    page_size = 20
+    # Up to five facet aggregates and the page, searching in subqueries
+    budget = Budget(queries=6)
+
+    def get(self, request):
+        fields = self.serializer_class.requested_fields(request.GET.get("fields"))
+        filter_form = PropertyFilterForm(request.GET)
+        location_id = request.GET.get("location", "").strip()
+        query = request.GET.get("q", "").strip()
+
+        near = geo.parse_near(
+            request.GET,
+            settings.PROPERTY_GEO_DEFAULT_RADIUS_KM,
+            settings.PROPERTY_GEO_MAX_RADIUS_KM,
+        )
+
+        properties = Property.objects.all()
+        if location_id.isdigit():
+            properties = properties.filter(location_id=location_id)
+        if query:
+            properties = search_properties(properties, query)
+        elif not near:
+            properties = properties.order_by("-created_at")
+        if near:
+            properties = properties.within_radius(*near)
+
+        conditions = filter_form.conditions()
+        facets = cached_facets(properties, conditions)
+        properties = filter_form.filter(properties)
+        if _wants(fields, "location"):
+            properties = properties.select_related("location")
+        if _wants(fields, "primary_image_url"):
+            properties = properties.with_primary_image()
+        if near:
+            properties = properties.nearest_first(*near[:2])
+        page = CountedPaginator(properties, self.page_size, count=facets["total"])
+        page_obj = page.get_page(request.GET.get("page"))
+        serializer = self.get_serializer(page_obj.object_list, many=True, fields=fields)
+        return Response(
+            {
+                "count": facets["total"],
+                "page": page_obj.number,
+                "num_pages": page.num_pages,
+                "results": serializer.data,
+                "facets": facets["counts"],
+            }
+        )
+
+
+class PropertyDetailAPIView(GenericAPIView):
+    """
+    One listing with its location and images; ``?fields=`` limits the fields
+    and skips the joins of the ones left out. Responses carry a weak ETag and
+    Last-Modified taken from ``updated_at`` of the listing and its location
+    (image changes touch the listing), so conditional requests are answered
+    with 304 from a single-row lookup, without loading or serializing.
+    """
+
+    serializer_class = PropertyDetailSerializer
+    # Validators, the listing with its location, and its images
+    budget = Budget(queries=3)
+
+    def get_queryset(self, fields=None):
+        properties = Property.objects.all()
+        if _wants(fields, "location"):
+            properties = properties.select_related("location")
+        if _wants(fields, "images", "primary_image_url"):
+            # primary_image_url picks from the prefetched gallery
+            images = Image.objects.only(
+                "property", "image", "caption", "is_primary", "order", "uploaded_at"
+            )
+            properties = properties.prefetch_related(Prefetch("images", images))
+        return properties
+
+    def get_validators(self, pk, fields):
+        """``(etag, last_modified)`` of a listing's representation"""
+        stamps = (
+            Property.objects.filter(pk=pk)
+            .values_list("updated_at", "location__updated_at")
+            .first()
+        )
+        if stamps is None:
+            raise NotFound()
+        last_modified = timegm(max(filter(None, stamps)).utctimetuple())
+        digest = md5(repr((pk, stamps, fields)).encode(), usedforsecurity=False)
+        return f'W/"{digest.hexdigest()}"', last_modified
+
+    def get(self, request, pk):
+        fields = self.serializer_class.requested_fields(request.GET.get("fields"))
+        etag, last_modified = self.get_validators(pk, fields)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            listing = get_object_or_404(self.get_queryset(fields), pk=pk)
+            response = Response(self.get_serializer(listing, fields=fields).data)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class PropertyMapAPIView(GenericAPIView):
+    """
+    Listings inside ``bbox=south,west,north,east`` as map clusters: locations
+    grouped by geohash prefix, each ``[latitude, longitude, listings,
+    location_id]`` with ``location_id`` set when the cluster is one location.
+    Wide areas are clustered from the pre-aggregated ``MapCell`` table.
+    """
+
+    budget = Budget(queries=1)
+
+    def get_precision(self, south, west, north, east):
+        """The finest geohash precision giving at most the allowed clusters"""
+        cells = geo.covering(
+            south, west, north, east, settings.PROPERTY_MAP_MAX_CLUSTERS
+        )
+        return len(cells[0])
+
+    def location_clusters(self, bbox, precision):
+        return (
+            Location.objects.within_bbox(*bbox)
+            .filter(property_count__gt=0)
+            .annotate(cell=Substr("geohash", 1, precision))
+            .values("cell")
+            .annotate(
+                listings=Sum("property_count"),
+                latitude=Avg("latitude"),
+                longitude=Avg("longitude"),
+                locations=Count("pk"),
+                location=Min("pk"),
+            )
+            .order_by()
+        )
+
+    def cell_clusters(self, bbox, precision):
+        def mean(field):
+            weighted = Sum(F(field) * F("locations"), output_field=FloatField())
+            return weighted / Sum("locations")
+
+        return (
+            MapCell.objects.filter(geo.bbox_condition(*bbox))
+            .annotate(cell=Substr("geohash", 1, precision))
+            .values("cell")
+            .annotate(
+                listings=Sum("listings"),
+                latitude=mean("latitude"),
+                longitude=mean("longitude"),
+                locations=Sum("locations"),
+                location=Min("location"),
+            )
+            .order_by()
         )
 
     def get(self, request):
-        serializer = self.get_serializer(self.get_queryset(), many=True)
-        return Response({"suggestions": serializer.data})
+        bbox = geo.parse_bbox(request.GET.get("bbox"))
+        if bbox is None:
+            raise ValidationError(
+                {"bbox": "Expected south,west,north,east in degrees."}
+            )
+        precision = self.get_precision(*bbox)
+        if precision <= CELL_PRECISION:
+            clusters = self.cell_clusters(bbox, precision)
+        else:
+            clusters = self.location_clusters(bbox, precision)
+        return Response(
+            {
+                "precision": precision,
+                "clusters": [
+                    [
+                        round(cluster["latitude"], 5),
+                        round(cluster["longitude"], 5),
+                        cluster["listings"],
+                        cluster["location"] if cluster["locations"] == 1 else None,
+                    ]
+                    for cluster in clusters
+                ],
+            }
+        )
+
+
+class CacheStatsAPIView(GenericAPIView):
+    """
+    Hit/miss counters of the page, card and facet caches (staff only)
+    """
+
+    permission_classes = [IsAdminUser]
+    # Session and user lookups
+    budget = Budget(queries=2)
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+class TaskStatsAPIView(GenericAPIView):
+    """
+    Depth and latency of the background task queues (staff only)
+    """
+
+    permission_classes = [IsAdminUser]
+    # Session and user lookups, then counts, scheduled, oldest due and the
+    # finished tasks of the window
+    budget = Budget(queries=6)
+
+    def get(self, request):
+        return Response(queue_stats())
+
+
+def _upload_error(error):
+    return Response({"detail": str(error)}, status=error.status)
+
+
+class UploadSessionListAPIView(GenericAPIView):
+    """
+    Start a resumable image upload (staff only): POST ``property``,
+    ``filename``, ``size`` and optionally ``caption``, then PUT the bytes to
+    the returned ``url`` in chunks
+    """
+
+    permission_classes = [IsAdminUser]
+    serializer_class = UploadSessionSerializer
+    # Session and user lookups, the listing and the insert
+    budget = Budget(queries=4)
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(created_by=request.user)
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED,
+            headers={"Location": serializer.data["url"]},
+        )
+
+
+class UploadSessionAPIView(GenericAPIView):
+    """
+    One resumable upload (staff only). PUT stores the chunk named by
+    ``Content-Range: bytes <first>-<last>/<size>``, sent as the raw body or
+    as a multipart file, streaming it to disk 64 KB at a time; GET reports
+    the bytes received (also as a ``Range`` header) to resume from after an
+    interruption; DELETE abandons the upload.
+    """
+
+    permission_classes = [IsAdminUser]
+    serializer_class = UploadSessionSerializer
+    queryset = UploadSession.objects.all()
+    # Session and user lookups, the upload and its update
+    budget = Budget(queries=4)
+
+    def session_response(self, session):
+        response = Response(self.get_serializer(session).data)
+        if session.received:
+            response["Range"] = f"bytes=0-{session.received - 1}"
+        return response
+
+    def get(self, request, pk):
+        return self.session_response(self.get_object())
+
+    def put(self, request, pk):
+        session = self.get_object()
+        content_range = uploads.parse_content_range(
+            request.headers.get("Content-Range")
+        )
+        if content_range is None:
+            raise ValidationError(
+                {"Content-Range": "Expected bytes <first>-<last>/<size>."}
+            )
+        try:
+            session = uploads.receive_chunk(session, *content_range, request)
+        except uploads.UploadError as error:
+            return _upload_error(error)
+        return self.session_response(session)
+
+    def delete(self, request, pk):
+        uploads.discard(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PropertyImagesAPIView(GenericAPIView):
+    """
+    Add complete uploads to a listing's gallery (staff only): POST
+    ``uploads``, upload ids in gallery order, and optionally ``primary``.
+    The images follow the existing ones and are inserted in one batch.
+    """
+
+    permission_classes = [IsAdminUser]
+    serializer_class = UploadBatchSerializer
+    # Session and user lookups, the listing and uploads, then in a
+    # transaction the last order, the primary, the images, their file
+    # references, the uploads and the listing's timestamp, then the task
+    budget = Budget(queries=14)
+
+    def post(self, request, pk):
+        listing = get_object_or_404(Property, pk=pk)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            images = uploads.commit_uploads(
+                listing,
+                serializer.validated_data["uploads"],
+                serializer.validated_data.get("primary"),
+            )
+        except uploads.UploadError as error:
+            return _upload_error(error)
+        return Response(
+            ImageSerializer(images, many=True).data, status=status.HTTP_201_CREATED
+        )
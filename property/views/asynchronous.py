@@ -0,0 +1,196 @@
+"""
+Native async views for ASGI deployments
+Autocomplete, listing and detail pages with the async ORM; routed by
+``core.async_urls`` when ``PROPERTY_ASYNC_VIEWS`` is on
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, render
+from ..autocomplete import location_index
+from ..cache import (
+    LOCATIONS,
+    anamespace_version,
+    cache_anonymous_page,
+    cache_publicly,
+    conditional_page,
+)
+from ..filters import (
+    PropertyFilterForm,
+    acached_facets,
+    acached_stamps,
+    with_location_counts,
+)
+from ..models import Location, Property
+from ..pagination import CountedPaginator, KeysetPaginator
+from ..profiling import budget
+from ..search import asearch_properties
+from ..serializers import LocationAutocompleteSerializer
+from ..templatetags.property_cache import aprefetch_cards
+from .api import LocationAutocompleteAPIView
+from .pages import (
+    SIMILAR_LISTINGS,
+    _cursor_mode,
+    _detail_page_stamps,
+    _list_context,
+    _location_only,
+    _near,
+    _similar_stamps,
+    _stamped_listing,
+)
+
+
+@budget(queries=1)
+async def async_autocomplete(request):
+    """
+    ``LocationAutocompleteAPIView`` without the sync adapter: once the
+    in-memory index is built, keystrokes never leave the event loop
+    """
+    query = request.GET.get("q", "").strip()
+    limit = LocationAutocompleteAPIView.limit
+    if settings.PROPERTY_AUTOCOMPLETE_INDEX:
+        version = await anamespace_version(LOCATIONS)
+        if location_index.is_current(version):
+            suggestions = location_index.search(query, limit, version)
+        else:
+            # Loading the index from the database
+            suggestions = await sync_to_async(location_index.search)(
+                query, limit, version
+            )
+    elif query:
+        suggestions = [
+            location
+            async for location in Location.objects.filter(
+                Q(name__icontains=query)
+                | Q(city__icontains=query)
+                | Q(country__icontains=query)
+            )
+            .filter(property_count__gt=0)
+            .order_by("-property_count")[:limit]
+        ]
+    else:
+        suggestions = []
+    serializer = LocationAutocompleteSerializer(suggestions, many=True)
+    return cache_publicly(
+        JsonResponse({"suggestions": serializer.data}),
+        settings.PROPERTY_AUTOCOMPLETE_MAX_AGE,
+    )
+
+
+async def _alistings(request):
+    """``pages._listings`` with the async ORM"""
+    location_id = request.GET.get("location", "").strip()
+    query = request.GET.get("q", "").strip()
+    properties = Property.objects.all()
+    if location_id.isdigit():
+        properties = properties.filter(location_id=location_id)
+    elif location_id:
+        properties = properties.at_location_named(location_id)
+    if query:
+        properties = await asearch_properties(properties, query)
+    near = _near(request)
+    if near:
+        properties = properties.within_radius(*near)
+    return properties
+
+
+async def _alist_stamps(request):
+    return await acached_stamps(await _alistings(request))
+
+
+async def _adetail_stamps(request, pk):
+    listing = await _stamped_listing(pk).afirst()
+    if listing is None:
+        return None
+    similar = [row async for row in _similar_stamps(listing)]
+    return _detail_page_stamps(listing, similar)
+
+
+# Up to five facet aggregates, the location and the page (searches are
+# subqueries of them); on a validator miss three more aggregates
+@budget(queries=10)
+@cache_anonymous_page
+@conditional_page(_alist_stamps)
+async def async_property_list(request):
+    """
+    ``property_list`` with the async ORM
+    """
+    location_id = request.GET.get("location", "").strip()
+    query = request.GET.get("q", "").strip()
+    filter_form = PropertyFilterForm(request.GET)
+
+    properties = await _alistings(request)
+    selected_location = None
+    if location_id.isdigit():
+        selected_location = await aget_object_or_404(Location, id=location_id)
+    near = _near(request)
+
+    conditions = filter_form.conditions()
+    facets = await acached_facets(properties, conditions)
+    if _location_only(request, selected_location, near):
+        facets = with_location_counts(facets, selected_location, conditions)
+    count = facets["total"]
+    properties = (
+        filter_form.filter(properties).select_related("location").with_primary_image()
+    )
+
+    searching = bool(query)
+    cursor_mode = _cursor_mode(request, searching or near)
+    if cursor_mode:
+        paginator = KeysetPaginator(properties, 9)
+        page_obj = await paginator.aget_page(request.GET.get("cursor"))
+    else:
+        if near:
+            properties = properties.nearest_first(*near[:2])
+        elif not searching:
+            properties = properties.order_by("-created_at")
+        paginator = CountedPaginator(properties, 9, count=count)
+        page_obj = await paginator.aget_page(request.GET.get("page"))
+
+    # Every queryset is evaluated by now, so rendering never queries, and
+    # the cards are read from the cache before it
+    context = _list_context(
+        request,
+        page_obj,
+        cursor_mode,
+        selected_location,
+        count,
+        facets,
+        filter_form,
+        near,
+    )
+    context["card_fragments"] = await aprefetch_cards(page_obj)
+    return render(request, "property/property_list.html", context)
+
+
+# Listing with its stored neighbours, its images and the similar listings,
+# all fetched before rendering, since templates rendered from async views
+# must not query; after the validators of the listing and the similar ones.
+# Signed-in users add the session and user lookups
+@budget(queries=7)
+@cache_anonymous_page
+@conditional_page(_adetail_stamps)
+async def async_property_detail(request, pk):
+    """
+    ``property_detail`` with the async ORM
+    """
+    property_obj = await aget_object_or_404(
+        Property.objects.select_related("location", "neighbours").prefetch_related(
+            "images"
+        ),
+        pk=pk,
+    )
+    similar_properties = (
+        await Property.objects.select_related("location")
+        .with_primary_image()
+        .asimilar_to(property_obj, SIMILAR_LISTINGS)
+    )
+
+    context = {
+        "property": property_obj,
+        "similar_properties": similar_properties,
+        "card_fragments": await aprefetch_cards(similar_properties),
+    }
+    return render(request, "property/property_detail.html", context)
@@ -4,22 +4,35 @@ from django.shortcuts import render
 """
 Views for Property app
 """
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from ..models import Property, Location
-from django.core.paginator import Paginator
+from ..models import FeedCard, Property, Location
+from ..cache import cache_anonymous_page, conditional_page
+from .. import geo
+from ..filters import (
+    PropertyFilterForm,
+    cached_facets,
+    cached_stamps,
+    facet_links,
+    with_location_counts,
+)
+from ..pagination import CountedPaginator, KeysetPaginator
+from ..profiling import budget
 from ..models import Location
-from django.db.models import Q
+from ..search import search_properties
 
+# Newest available listings shown on the home page
+RECENT_LISTINGS = 6
 
+
+# The newest feed cards, one index range scan
+@budget(queries=1)
+@cache_anonymous_page
 def home(request):
     """
     Home page with search input and recent properties
     """
-    recent_properties = (
-        Property.objects.filter(status="available")
-        .select_related("location")
-        .prefetch_related("images")[:6]
-    )
+    recent_properties = FeedCard.objects.recent(RECENT_LISTINGS)
 
     context = {
         "recent_properties": recent_properties,
@@ -27,58 +40,203 @@ def home(request):
     return render(request, "property/home.html", context)
 
 
+def _listings(request):
+    """
+    Listings of the list page before the facet filters: at the location
+    (an id, or free text to search), matching the search query and within
+    the ``near`` radius
+    """
+    location_id = request.GET.get("location", "").strip()
+    query = request.GET.get("q", "").strip()
+    properties = Property.objects.all()
+    if location_id.isdigit():
+        properties = properties.filter(location_id=location_id)
+    elif location_id:
+        # Substring matches, so partial names find their location
+        properties = properties.at_location_named(location_id)
+    if query:
+        properties = search_properties(properties, query)
+    near = _near(request)
+    if near:
+        properties = properties.within_radius(*near)
+    return properties
+
+
+def _list_stamps(request):
+    # The facets count listings outside the filtered page too
+    return cached_stamps(_listings(request))
+
+
+# Up to five facet aggregates, the location and the page (searches are
+# subqueries of them); on a validator miss three more aggregates
+@budget(queries=10)
+@cache_anonymous_page
+@conditional_page(_list_stamps)
 def property_list(request):
     """
-    Display list of properties filtered by location
+    Display list of properties filtered by location, search query and facets
     """
     location_id = request.GET.get("location", "").strip()
-    location_text = request.GET.get("location_text", "").strip()
+    query = request.GET.get("q", "").strip()
+    filter_form = PropertyFilterForm(request.GET)
 
-    properties = Property.objects.select_related("location").prefetch_related("images")
+    properties = _listings(request)
     selected_location = None
+    if location_id.isdigit():
+        selected_location = get_object_or_404(Location, id=location_id)
+    near = _near(request)
 
-    if location_id:
-        if location_id.isdigit():
-            selected_location = get_object_or_404(Location, id=location_id)
-            properties = properties.filter(location=selected_location)
-        else:
-            # Free text search if not digit
-            properties = properties.filter(
-                Q(location__name__icontains=location_id)
-                | Q(location__city__icontains=location_id)
-                | Q(location__country__icontains=location_id)
-            )
-
-    properties = properties.order_by("-created_at")
-    paginator = Paginator(properties, 9)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    # Facet counts also provide the total, so no separate COUNT(*) is needed;
+    # a location's own page takes it from the location's counters
+    conditions = filter_form.conditions()
+    facets = cached_facets(properties, conditions)
+    if _location_only(request, selected_location, near):
+        facets = with_location_counts(facets, selected_location, conditions)
+    count = facets["total"]
+    properties = (
+        filter_form.filter(properties).select_related("location").with_primary_image()
+    )
 
-    context = {
+    searching = bool(query)
+    cursor_mode = _cursor_mode(request, searching or near)
+    if cursor_mode:
+        page_obj = KeysetPaginator(properties, 9).get_page(request.GET.get("cursor"))
+    else:
+        if near:
+            properties = properties.nearest_first(*near[:2])
+        elif not searching:
+            properties = properties.order_by("-created_at")
+        paginator = CountedPaginator(properties, 9, count=count)
+        page_number = request.GET.get("page")
+        page_obj = paginator.get_page(page_number)
+
+    context = _list_context(
+        request,
+        page_obj,
+        cursor_mode,
+        selected_location,
+        count,
+        facets,
+        filter_form,
+        near,
+    )
+    return render(request, "property/property_list.html", context)
+
+
+def _location_only(request, location, near):
+    return location is not None and not near and not request.GET.get("q", "").strip()
+
+
+def _cursor_mode(request, searching):
+    # Search results keep their rank (or distance) order, which keyset pages
+    # cannot follow
+    return not searching and (
+        settings.PROPERTY_LIST_PAGINATION == "cursor" or "cursor" in request.GET
+    )
+
+
+def _near(request):
+    """``(latitude, longitude, radius_km)`` of a ``near=lat,lng`` search"""
+    return geo.parse_near(
+        request.GET,
+        settings.PROPERTY_GEO_DEFAULT_RADIUS_KM,
+        settings.PROPERTY_GEO_MAX_RADIUS_KM,
+    )
+
+
+def _list_context(
+    request,
+    page_obj,
+    cursor_mode,
+    selected_location,
+    count,
+    facets,
+    filter_form,
+    near=None,
+):
+    location_id = request.GET.get("location", "").strip()
+    location_text = request.GET.get("location_text", "").strip()
+    return {
         "properties": page_obj,
         "page_obj": page_obj,
+        "cursor_mode": cursor_mode,
         "selected_location": selected_location,
         "property_types": Property.PROPERTY_TYPES,
         "search_query": location_text or location_id,
-        "count": properties.count,
+        "query": request.GET.get("q", "").strip(),
+        "count": count,
+        "filter_form": filter_form,
+        "facets": facet_links(facets, filter_form),
+        "filtered": bool(filter_form.conditions()),
+        "near": near and dict(zip(["latitude", "longitude", "radius_km"], near)),
     }
-    return render(request, "property/property_list.html", context)
 
 
+# Similar listings shown on the detail page
+SIMILAR_LISTINGS = 3
+
+
+def _stamped_listing(pk):
+    return (
+        Property.objects.select_related("location", "neighbours")
+        .only(
+            "updated_at",
+            "location__updated_at",
+            "neighbours__ids",
+            "neighbours__built_at",
+        )
+        .filter(pk=pk)
+    )
+
+
+def _detail_page_stamps(listing, similar):
+    neighbours = getattr(listing, "neighbours", None)
+    return (
+        listing.updated_at,
+        listing.location and listing.location.updated_at,
+        neighbours and neighbours.built_at,
+        *(stamp for row in similar for stamp in row),
+    )
+
+
+def _similar_stamps(listing):
+    _, similar = Property.objects.all()._similar(listing, SIMILAR_LISTINGS)
+    return similar.values_list("pk", "updated_at", "location__updated_at")
+
+
+def _detail_stamps(request, pk):
+    """
+    Stamps of the detail page: the listing and its location, its neighbours
+    and the listings they point to (or those shown until they are built)
+    """
+    listing = _stamped_listing(pk).first()
+    if listing is None:
+        return None
+    return _detail_page_stamps(listing, list(_similar_stamps(listing)))
+
+
+# Listing with its stored neighbours, its images and the similar listings,
+# after the validators of the listing and of the similar listings; signed-in
+# users add the session and user lookups
+@budget(queries=7)
+@cache_anonymous_page
+@conditional_page(_detail_stamps)
 def property_detail(request, pk):
     """
     Display detailed information about a single property
     """
     property_obj = get_object_or_404(
-        Property.objects.select_related("location").prefetch_related("images"), pk=pk
+        Property.objects.select_related("location", "neighbours").prefetch_related(
+            "images"
+        ),
+        pk=pk,
     )
 
-    # Get similar properties in the same location
+    # Precomputed neighbours (property/similarity.py), looked up by id
     similar_properties = (
-        Property.objects.filter(location=property_obj.location, status="available")
-        .exclude(pk=property_obj.pk)
-        .select_related("location")
-        .prefetch_related("images")[:3]
+        Property.objects.select_related("location")
+        .with_primary_image()
+        .similar_to(property_obj, SIMILAR_LISTINGS)
     )
 
     context = {
@@ -0,0 +1,72 @@
+"""
+Staff-only reports, served under the admin
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from ..exporters import FORMATS, PropertyExport, filtered_properties
+from ..profiling import budget, profiles
+
+
+@budget(queries=2)
+@staff_member_required
+def profiling_report(request):
+    """
+    Rolling latency percentiles and query counts per URL name, as recorded
+    by ``ProfilingMiddleware`` in this process
+    """
+    if request.method == "POST":
+        profiles.reset()
+        return redirect("profiling")
+
+    summary = profiles.summary()
+    if request.GET.get("format") == "json":
+        return JsonResponse(summary)
+
+    context = {
+        **admin.site.each_context(request),
+        "title": "Request profiles",
+        "rows": sorted(summary.items()),
+    }
+    return render(request, "admin/property/profiling.html", context)
+
+
+async def _aiterate(blocks):
+    """
+    ``blocks`` as an async iterator, advanced in the thread that owns the
+    database connection. ASGI reads a sync iterator whole before sending it.
+    """
+    next_block = sync_to_async(next, thread_sensitive=True)
+    while (block := await next_block(blocks, None)) is not None:
+        yield block
+
+
+@budget(queries=2)
+@staff_member_required
+def property_export(request):
+    """
+    Stream the properties matching the list filters as CSV, or NDJSON with
+    ``?format=ndjson``; ``?gzip=1`` compresses on the fly
+    """
+    export_format = request.GET.get("format", "csv")
+    try:
+        if export_format not in FORMATS:
+            raise ValidationError({"format": [f"Use one of: {', '.join(FORMATS)}."]})
+        properties = filtered_properties(request.GET)
+    except ValidationError as error:
+        return JsonResponse({"errors": error.message_dict}, status=400)
+
+    export = PropertyExport(
+        properties, export_format, compress=request.GET.get("gzip") == "1"
+    )
+    blocks = iter(export)
+    if settings.PROPERTY_ASYNC_VIEWS:
+        blocks = _aiterate(blocks)
+    response = StreamingHttpResponse(blocks, content_type=export.content_type)
+    response["Content-Disposition"] = f'attachment; filename="{export.filename}"'
+    return response